@@ -4,13 +4,15 @@ The model in the model-view-controller design pattern.
 from ListenedObject import *
 from AbstractListener import *
 
+from collections import OrderedDict
+
 class ModelListener(AbstractListener):
 	"""
 	An L{AbstractListener} that receives notifications from an L{AbstractModel} that it has changed.
 	"""
 	def onModelChange(self, model):
 		"""
-		Called by the L{AbstractModel} whenever it has changed. Subclass this method to handle what to do when the model changes.
+		Called by the L{AbstractModel} whenever it has changed. Subclass this method to handle what to do when the model changes. If the model's changes were batched (see L{AbstractModel.beginChanges}), this is called once for all of them, and L{AbstractModel.getChanges} returns a description of each change so that the listener may update incrementally rather than re-reading the whole model.
 
 		@param model: The modified model.
 		@type model: L{AbstractModel}
@@ -20,13 +22,35 @@ class ModelListener(AbstractListener):
 class AbstractModel(ListenedObject):
 	"""
 	The model in the model-view-controller design pattern. Information should be stored in here.
+
+	By default, listeners are notified as soon as L{didChange} is called. Changes may instead be batched, either explicitly (between L{beginChanges} and L{endChanges}) or for a whole frame (see L{setCoalescingChanges}), so that many changes result in a single L{ModelListener.onModelChange} per listener.
 	"""
-	def didChange(self):
+	def __init__(self):
+		ListenedObject.__init__(self)
+		self._batchDepth = 0	# the number of beginChanges calls without a matching endChanges
+		self._isCoalescingChanges = False
+		self._hasPendingChanges = False
+		self._pendingChanges = []	# the change descriptors passed to didChange since listeners were last notified
+		self._changes = ()	# the change descriptors for the notification in progress
+
+#{ Change notification methods.
+	def didChange(self, change=None):
 		"""
-		Notifies all registered L{ModelListener}s that the model has changed. All subclasses are responsible for calling this method whenever the model changes.
+		Notifies all registered L{ModelListener}s that the model has changed. All subclasses are responsible for calling this method whenever the model changes. If changes are being batched, the listeners are instead notified once the batch ends.
+
+		@param change: An optional description of what changed (e.g. a tuple such as C{("playerLocation", oldLocation, newLocation)}), which listeners may retrieve via L{getChanges}. Default is C{None}.
+		@type change: C{object}
 		"""
-		for listener in self.getListeners():
-			self.notifyListener(listener)
+		if change is not None:
+			self._pendingChanges.append(change)
+		if self._batchDepth > 0:
+			self._hasPendingChanges = True
+		elif self._isCoalescingChanges:
+			if not self._hasPendingChanges:
+				self._hasPendingChanges = True
+				_modelsWithPendingChanges[self] = None
+		else:
+			self._notifyListeners()
 
 	def notifyListener(self, listener):
 		"""
@@ -36,3 +60,83 @@ class AbstractModel(ListenedObject):
 		@type listener: L{ModelListener}
 		"""
 		listener.onModelChange(self)
+
+	def getChanges(self):
+		"""
+		Returns the descriptions of the changes which the listeners are currently being notified of, in the order in which they were made. Changes made without a description are not included, so an empty tuple means that the listener should re-read whatever it needs from the model. This should be called from within L{ModelListener.onModelChange}.
+
+		@return: The change descriptions.
+		@rtype: C{tuple}
+		"""
+		return self._changes
+
+	changes = property(getChanges, doc="Read-only access to the descriptions of the changes which the listeners are currently being notified of.")
+
+	def beginChanges(self):
+		"""
+		Starts a batch of changes. Until the matching call to L{endChanges}, calls to L{didChange} only record the change, and the listeners are notified once when the batch ends. Batches may be nested, in which case the listeners are notified when the outermost batch ends.
+		"""
+		self._batchDepth += 1
+
+	def endChanges(self):
+		"""
+		Ends a batch of changes started by L{beginChanges}. If this ends the outermost batch and the model changed during it, the listeners are notified (or, if the model is coalescing changes, they will be notified at the end of the frame).
+		"""
+		if self._batchDepth < 1:
+			return
+		self._batchDepth -= 1
+		if self._batchDepth > 0 or not self._hasPendingChanges:
+			return
+		if self._isCoalescingChanges:
+			_modelsWithPendingChanges[self] = None
+		else:
+			self._notifyListeners()
+
+	def isCoalescingChanges(self):
+		"""
+		Returns whether or not changes are coalesced until the end of the frame. Default is C{False}.
+
+		@return: Whether or not changes are coalesced.
+		@rtype: C{bool}
+		"""
+		return self._isCoalescingChanges
+
+	def setCoalescingChanges(self, isCoalescingChanges):
+		"""
+		Sets whether or not changes are coalesced until the end of the frame. If so, the listeners are notified once per frame of all of the changes made during it, after the L{Scheduler} has ticked and before the Scene is redrawn (see L{flushModelChanges}). If coalescing is turned off, any pending changes are delivered immediately.
+
+		@param isCoalescingChanges: Whether or not changes are coalesced.
+		@type isCoalescingChanges: C{bool}
+		"""
+		self._isCoalescingChanges = isCoalescingChanges
+		if not isCoalescingChanges and self._batchDepth < 1 and self._hasPendingChanges:
+			self._notifyListeners()
+
+	coalescingChanges = property(isCoalescingChanges, setCoalescingChanges, doc="Whether or not changes are coalesced until the end of the frame.")
+#}
+
+
+#{ Private methods.
+	def _notifyListeners(self):
+		"""
+		Private method. Notifies every listener once of all of the pending changes.
+		"""
+		if self in _modelsWithPendingChanges:
+			del _modelsWithPendingChanges[self]
+		self._hasPendingChanges = False
+		self._changes = tuple(self._pendingChanges)
+		self._pendingChanges = []
+		for listener in self.getListeners():
+			self.notifyListener(listener)
+		self._changes = ()
+#}
+
+_modelsWithPendingChanges = OrderedDict()	# the coalescing models which have changed since the last flush; the values are unused
+
+def flushModelChanges():
+	"""
+	Notifies the listeners of every model which is coalescing changes (see L{AbstractModel.setCoalescingChanges}) and which has changed since the last flush. This is called by the L{Director} once per frame, after the L{Scheduler} ticks and before the Scene is redrawn, so it should not usually need to be called manually. Models which are in the middle of a batch (see L{AbstractModel.beginChanges}) are skipped.
+	"""
+	for model in _modelsWithPendingChanges.keys():
+		if model in _modelsWithPendingChanges and model._batchDepth < 1:
+			model._notifyListeners()
@@ -6,11 +6,15 @@ from Scheduler import *
 from Timer import *
 from Action import *
 
+from collections import OrderedDict
+
 class ActionManager(object):
 	"""
 	Manages all L{AbstractAction}C{s} for the application. It is responsible for updating Actions whenever the L{Scheduler} ticks.
 
-	It is owned by the Director. cocosCairo was designed to have one ActionManager per Director (and one Director per application), so this method should be indirectly accessed through the L{Director}.
+	The main ActionManager is owned by the Director, so it should be indirectly accessed through the L{Director}. A L{Node} may also own one along with its own L{Scheduler} (see L{Node.setUsingOwnScheduler}); L{Node.getActionManager} returns the one which runs the Node's Actions.
+
+	Actions are indexed by their original owner, so pausing, resuming or removing the Actions of one owner (e.g. when a L{Node} enters or exits the running Scene) only touches that owner's Actions.
 
 	Note that it is possible that an Action's current owner may not be its original owner (it is possible, but discouraged, for someone to manually call L{AbstractAction.setOwner} after the Action has already begun). Thus, methods like L{removeAllActions} may not necessarily perform as expected.
 	"""
@@ -18,13 +22,13 @@ class ActionManager(object):
 		"""
 		Initialization method.
 
-		@param scheduler: The application's Scheduler.
+		@param scheduler: The Scheduler which ticks the ActionManager.
 		@type scheduler: L{Scheduler}
 		"""
 		timer = Timer(self.tick)
 		self._scheduler = scheduler
 		self._scheduler.schedule(timer)
-		self._dict = {}	# each key is of the form (action, owner), and each value is isPaused.
+		self._actionsByOwner = OrderedDict()	# each key is an original owner, and each value is an OrderedDict whose keys are the owner's Actions and whose values are isPaused
 
 #{ Adding and removing Actions.
 	def addAction(self, action, owner, isPaused):
@@ -38,10 +42,32 @@ class ActionManager(object):
 		@param isPaused: Whether or not the Action should currently be paused.
 		@type isPaused: C{bool}
 		"""
-		if (action, owner) not in self._dict:
-			self._dict[(action,owner)] = isPaused
+		actions = self._actionsByOwner.get(owner)
+		if actions is None:
+			actions = OrderedDict()
+			self._actionsByOwner[owner] = actions
+		if action not in actions:
+			actions[action] = isPaused
 			action.start(owner)
 
+	def transferAllActions(self, owner, actionManager):
+		"""
+		Moves all L{AbstractAction}C{s} whose original owner matches the one provided to another ActionManager, keeping their progress and pause states. This is used when a L{Node} is moved into a subtree with a different ActionManager (see L{Node.setUsingOwnScheduler}).
+
+		@param owner: The original owner of the Actions.
+		@type owner: C{Defined by Action subclass}
+		@param actionManager: The ActionManager to which the Actions are moved.
+		@type actionManager: L{ActionManager}
+		"""
+		if actionManager is self or owner not in self._actionsByOwner:
+			return
+		actions = self._actionsByOwner.pop(owner)
+		otherActions = actionManager._actionsByOwner.get(owner)
+		if otherActions is None:
+			actionManager._actionsByOwner[owner] = actions
+		else:
+			otherActions.update(actions)
+
 	def removeAllActions(self, owner):
 		"""
 		Removes all L{AbstractAction}C{s} whose original owner matches the one provided.
@@ -49,8 +75,8 @@ class ActionManager(object):
 		@param owner: The original owner of the Action.
 		@type owner: C{Defined by Action subclass}
 		"""
-		for key in [x for x in self._dict if x[1] is owner]:
-			del self._dict[key]
+		if owner in self._actionsByOwner:
+			del self._actionsByOwner[owner]
 
 	def removeAction(self, action):
 		"""
@@ -59,9 +85,12 @@ class ActionManager(object):
 		@param action: The Action to remove.
 		@type action: L{AbstractAction}
 		"""
-		key = (action, action.getOriginalOwner())
-		if key in self._dict:
-			del self._dict[key]
+		owner = action.getOriginalOwner()
+		actions = self._actionsByOwner.get(owner)
+		if actions is not None and action in actions:
+			del actions[action]
+			if len(actions) < 1:
+				del self._actionsByOwner[owner]
 
 	def removeActionByTag(self, tag, owner):
 		"""
@@ -72,8 +101,13 @@ class ActionManager(object):
 		@param owner: The original owner of the Action.
 		@type owner: C{Defined by Action subclass}
 		"""
-		for key in [x for x in self._dict if x[0].getTag() is tag and x[1] is owner]:
-			del self._dict[key]
+		actions = self._actionsByOwner.get(owner)
+		if actions is None:
+			return
+		for action in [x for x in actions if x.getTag() is tag]:
+			del actions[action]
+		if len(actions) < 1:
+			del self._actionsByOwner[owner]
 #}
 
 
@@ -89,11 +123,10 @@ class ActionManager(object):
 		@return: The Action, if it exists.
 		@rtype: L{AbstractAction} (or C{None} if not found)
 		"""
-		keys = [x for x in self._dict if x[0].getTag() is tag and x[1] is owner]
-		if len(keys) <= 0 or len(keys) > 1:
+		actions = [x for x in self._actionsByOwner.get(owner, ()) if x.getTag() is tag]
+		if len(actions) <= 0 or len(actions) > 1:
 			return None
-		key = keys[0]	# keys should be a list with only one item
-		return key[0]
+		return actions[0]	# actions should be a list with only one item
 
 	def getNumberOfRunningActions(self, owner):
 		"""
@@ -102,8 +135,7 @@ class ActionManager(object):
 		@param owner: The Action's original owner.
 		@type owner: C{Defined by Action subclass}
 		"""
-		keys = [x for x in self._dict if x[1] is owner]
-		return len(keys)
+		return len(self._actionsByOwner.get(owner, ()))
 #}
 
 
@@ -115,8 +147,10 @@ class ActionManager(object):
 		@param owner: The Action's original owner.
 		@type owner: C{Defined by Action subclass}
 		"""
-		for key in [x for x in self._dict if x[1] is owner]:
-			self._dict[key] = False	# not paused
+		actions = self._actionsByOwner.get(owner)
+		if actions is not None:
+			for action in actions:
+				actions[action] = False	# not paused
 
 	def pauseAllActions(self, owner):
 		"""
@@ -125,8 +159,10 @@ class ActionManager(object):
 		@param owner: The Action's original owner.
 		@type owner: C{Defined by Action subclass}
 		"""
-		for key in [x for x in self._dict if x[1] is owner]:
-			self._dict[key] = True	# is paused
+		actions = self._actionsByOwner.get(owner)
+		if actions is not None:
+			for action in actions:
+				actions[action] = True	# is paused
 #}
 
 
@@ -138,13 +174,12 @@ class ActionManager(object):
 		@param dt: The amount of time that has passed since the last tick.
 		@type dt: C{float}
 		"""
-		actionsToRemove = []
-		for key in self._dict.copy():
-			if key not in self._dict:
-				continue
-			isPaused = self._dict[key]
-			if not isPaused:
-				action = key[0]
+		for owner, actions in self._actionsByOwner.items():	# items() is a copy, so Actions may be added and removed while stepping
+			for action in actions.keys():
+				if self._actionsByOwner.get(owner) is not actions:	# an earlier Action removed or transferred all of the owner's Actions
+					break
+				if actions.get(action, True):	# skip Actions which are paused or which were removed by an earlier Action
+					continue
 				action.step(dt)
 				if action.isDone():
 					action.stop()
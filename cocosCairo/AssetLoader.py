@@ -0,0 +1,175 @@
+"""
+Loads images and SVG files on background threads.
+"""
+
+from ImageCache import *
+from SVGSprite import *
+from Timer import *
+
+from threading import Thread
+import Queue
+import warnings
+
+class AssetLoader(object):
+	"""
+	Decodes images and parses SVG files on a pool of worker threads so that loading them does not freeze the application. Once an asset has been loaded, it is added to the L{SharedImageCache} (or the L{SharedSVGDocumentCache} for SVG files), so any L{Sprite} or L{SVGSprite} created from it afterwards does not have to touch the disk.
+
+	Loaded assets are handed over to the caches on the main thread whenever the L{Scheduler} ticks, so progress callbacks are also called on the main thread.
+
+	It is owned by the Director. A L{Scene} may declare the assets it needs via L{Scene.setAssetNames}, in which case L{Director.replaceScene} will load them before replacing the running Scene. L{Director.preloadScene} may also be used to load them ahead of time.
+	"""
+	def __init__(self, scheduler, numberOfWorkers=2):
+		"""
+		Initialization method.
+
+		@param scheduler: The application's Scheduler.
+		@type scheduler: L{Scheduler}
+		@param numberOfWorkers: The number of worker threads. They are started the first time assets are loaded.
+		@type numberOfWorkers: Positive C{int}
+		"""
+		timer = Timer(self.tick)
+		self._scheduler = scheduler
+		self._scheduler.schedule(timer)
+		self._numberOfWorkers = numberOfWorkers
+		self._workers = []
+		self._jobs = Queue.Queue()		# asset names waiting for a worker
+		self._results = Queue.Queue()	# (assetName, result, error) tuples waiting to be added to a cache
+		self._batches = []				# each item is of the form [pendingAssetNames, total, callback, progressCallback]
+		self._pendingAssetNames = set()	# asset names which have been queued but not yet added to a cache
+
+#{ Loading methods.
+	def loadAssets(self, assetNames, callback=None, progressCallback=None):
+		"""
+		Starts loading a set of assets in the background. Assets which are already cached are skipped.
+
+		@param assetNames: The filepaths of the images and SVG files (which are recognized by the C{".svg"} extension).
+		@type assetNames: C{list of strings}
+		@param callback: Called with no arguments once every asset in the set has been loaded (immediately, if they are all already cached).
+		@type callback: C{function} (or C{None})
+		@param progressCallback: Called with the number of assets loaded so far and the total number of assets in the set whenever an asset in the set is loaded.
+		@type progressCallback: C{function} (or C{None})
+		"""
+		assetNames = [assetName for assetName in set(assetNames) if not self.isAssetLoaded(assetName)]
+		if len(assetNames) < 1:
+			if callback is not None:
+				callback()
+			return
+		self._startWorkers()
+		for assetName in assetNames:
+			if assetName not in self._pendingAssetNames:
+				self._pendingAssetNames.add(assetName)
+				self._jobs.put(assetName)
+		self._batches.append([set(assetNames), len(assetNames), callback, progressCallback])
+
+	def isAssetLoaded(self, assetName):
+		"""
+		Returns whether or not an asset is already in its cache.
+
+		@param assetName: The filepath of the image or SVG file.
+		@type assetName: C{string}
+		@return: Whether or not the asset has been loaded.
+		@rtype: C{bool}
+		"""
+		if _isSVGName(assetName):
+			return SharedSVGDocumentCache().hasDocument(assetName)
+		return SharedImageCache().hasSurface(assetName)
+
+	def areAssetsLoaded(self, assetNames):
+		"""
+		Returns whether or not all of the given assets are already in their caches.
+
+		@param assetNames: The filepaths of the images and SVG files.
+		@type assetNames: C{list of strings}
+		@return: Whether or not all of the assets have been loaded.
+		@rtype: C{bool}
+		"""
+		for assetName in assetNames:
+			if not self.isAssetLoaded(assetName):
+				return False
+		return True
+
+	def isLoading(self):
+		"""
+		Returns whether or not any assets are still being loaded.
+
+		@return: Whether or not any assets are still being loaded.
+		@rtype: C{bool}
+		"""
+		return len(self._pendingAssetNames) > 0
+
+	def getProgress(self):
+		"""
+		Returns how much of all of the currently-loading sets of assets has been loaded, from C{0.0} to C{1.0}. If nothing is loading, this is C{1.0}.
+
+		@return: The fraction of assets loaded.
+		@rtype: C{float}
+		"""
+		total = sum([batch[1] for batch in self._batches])
+		if total == 0:
+			return 1.0
+		remaining = sum([len(batch[0]) for batch in self._batches])
+		return float(total - remaining) / total
+
+	progress = property(getProgress, doc="Read-only access to how much of the currently-loading assets have been loaded.")
+#}
+
+
+#{ Private methods.
+	def tick(self, dt):
+		"""
+		Private method which is called by the L{Scheduler} whenever it ticks. Adds any assets loaded by the workers to their caches and calls the callbacks. This should generally never be called manually.
+
+		@param dt: The amount of time that has passed since the last tick.
+		@type dt: C{float}
+		"""
+		while True:
+			try:
+				assetName, result, error = self._results.get_nowait()
+			except Queue.Empty:
+				break
+			self._pendingAssetNames.discard(assetName)
+			if error is not None:
+				warnings.warn("Failed to load " + assetName + ": " + str(error))
+			elif _isSVGName(assetName):
+				SharedSVGDocumentCache().addDocument(assetName, result[0], result[1])
+			else:
+				SharedImageCache().addSurface(assetName, result)
+			for batch in self._batches[:]:
+				if assetName not in batch[0]:
+					continue
+				batch[0].remove(assetName)
+				if batch[3] is not None:
+					batch[3](batch[1] - len(batch[0]), batch[1])
+				if len(batch[0]) < 1:
+					self._batches.remove(batch)
+					if batch[2] is not None:
+						batch[2]()
+
+	def _startWorkers(self):
+		"""
+		Private method. Starts the worker threads if they have not been started yet.
+		"""
+		while len(self._workers) < self._numberOfWorkers:
+			worker = Thread(target=self._work)
+			worker.setDaemon(True)	# don't keep the application alive
+			worker.start()
+			self._workers.append(worker)
+
+	def _work(self):
+		"""
+		Private method which is run by each worker thread. Loads queued assets forever.
+		"""
+		while True:
+			assetName = self._jobs.get()
+			try:
+				if _isSVGName(assetName):
+					result = parseSVGDocument(assetName)
+				else:
+					result = loadImageSurface(assetName)
+				self._results.put((assetName, result, None))
+			except Exception, e:
+				self._results.put((assetName, None, e))
+#}
+
+def _isSVGName(assetName):
+	return assetName.lower().endswith(".svg")
@@ -0,0 +1,356 @@
+"""
+A Node which renders text to the screen from a pre-rendered bitmap font.
+"""
+
+from Node import *
+from Color import *
+from ImageCache import *
+
+import cairo
+
+import os
+import math
+import shlex
+
+_DEFAULT_CHARACTERS = u"".join([unichr(i) for i in range(32, 127)])	# printable ASCII
+
+class BitmapFont(object):
+	"""
+	A set of characters which have been rendered once into one or more atlas surfaces, along with where each character is located and how far it advances the text. L{BitmapFontLabel}C{s} draw text by copying characters out of the atlas, so changing their text does not require any font shaping.
+
+	Bitmap fonts are usually created with L{MakeSystemBitmapFont} (which renders a font installed on the system via cairo) or L{MakeBitmapFontFromFile} (which loads a font generated by a BMFont-compatible tool).
+	"""
+	def __init__(self, surfaces, glyphs, lineHeight, base, isColored=False):
+		"""
+		Initialization method.
+
+		@param surfaces: The atlas surfaces (the "pages" of the font).
+		@type surfaces: C{list of cairo.ImageSurfaces}
+		@param glyphs: A dictionary whose keys are characters and whose values are tuples of the form C{(pageIndex, rect, xOffset, yOffset, xAdvance)}, where C{rect} is the L{Rect} of the character within its page and the offsets are from the top-left of the line.
+		@type glyphs: C{dict}
+		@param lineHeight: The distance between the tops of two lines of text.
+		@type lineHeight: C{float}
+		@param base: The distance from the top of a line of text to its baseline.
+		@type base: C{float}
+		@param isColored: Whether or not the characters should be drawn in their own colors. If not, only their alpha is used and they are drawn in the L{BitmapFontLabel}'s color.
+		@type isColored: C{bool}
+		"""
+		self._surfaces = surfaces
+		self._glyphs = glyphs
+		self._lineHeight = lineHeight
+		self._base = base
+		self._isColored = isColored
+
+#{ Accessor methods.
+	def getSurfaces(self):
+		"""
+		Returns the atlas surfaces which contain the characters.
+
+		@return: The atlas surfaces.
+		@rtype: C{list of cairo.ImageSurfaces}
+		"""
+		return self._surfaces[:]
+
+	surfaces = property(getSurfaces, doc="Read-only access to the atlas surfaces which contain the characters.")
+
+	def getLineHeight(self):
+		"""
+		Returns the distance between the tops of two lines of text.
+
+		@return: The line height.
+		@rtype: C{float}
+		"""
+		return self._lineHeight
+
+	lineHeight = property(getLineHeight, doc="Read-only access to the distance between the tops of two lines of text.")
+
+	def getBase(self):
+		"""
+		Returns the distance from the top of a line of text to its baseline.
+
+		@return: The base.
+		@rtype: C{float}
+		"""
+		return self._base
+
+	base = property(getBase, doc="Read-only access to the distance from the top of a line of text to its baseline.")
+
+	def isColored(self):
+		"""
+		Returns whether or not the characters are drawn in their own colors rather than in the L{BitmapFontLabel}'s color.
+
+		@return: Whether or not the characters are drawn in their own colors.
+		@rtype: C{bool}
+		"""
+		return self._isColored
+
+	colored = property(isColored, doc="Read-only access to whether or not the characters are drawn in their own colors.")
+
+	def hasCharacter(self, character):
+		"""
+		Returns whether or not a character has been rendered into the font.
+
+		@param character: The character.
+		@type character: C{string}
+		@return: Whether or not the font contains the character.
+		@rtype: C{bool}
+		"""
+		return character in self._glyphs
+
+	def getGlyph(self, character):
+		"""
+		Returns where a character is located and how it is placed (or C{None} if the font does not contain it).
+
+		@param character: The character.
+		@type character: C{string}
+		@return: A tuple of the form C{(pageIndex, rect, xOffset, yOffset, xAdvance)}.
+		@rtype: C{tuple} (or C{None})
+		"""
+		return self._glyphs.get(character)
+#}
+
+
+def MakeSystemBitmapFont(fontFamily="sans", fontSize=14, isBold=False, isItalic=False, characters=None, maximumWidth=1024):
+	"""
+	Renders a set of characters from a font installed on the system into a new L{BitmapFont}. The characters are rendered in white, so they take on the L{BitmapFontLabel}'s color.
+
+	@param fontFamily: The font family. Default is C{"sans"}.
+	@type fontFamily: C{string}
+	@param fontSize: The font size. Default is C{14}.
+	@type fontSize: Positive C{float}
+	@param isBold: Whether or not the characters are bolded.
+	@type isBold: C{bool}
+	@param isItalic: Whether or not the characters are italicized.
+	@type isItalic: C{bool}
+	@param characters: The characters to render. Default is all printable ASCII characters.
+	@type characters: C{string} (or C{None})
+	@param maximumWidth: The maximum width of the atlas surface.
+	@type maximumWidth: Positive C{int}
+	@return: The new bitmap font.
+	@rtype: L{BitmapFont}
+	"""
+	if characters is None:
+		characters = _DEFAULT_CHARACTERS
+	if isItalic:
+		slant = cairo.FONT_SLANT_ITALIC
+	else:
+		slant = cairo.FONT_SLANT_NORMAL
+	if isBold:
+		weight = cairo.FONT_WEIGHT_BOLD
+	else:
+		weight = cairo.FONT_WEIGHT_NORMAL
+
+	context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))	# only used for measuring
+	context.select_font_face(fontFamily, slant, weight)
+	context.set_font_size(fontSize)
+	ascent, descent = context.font_extents()[:2]
+	lineHeight = int(math.ceil(ascent + descent))
+
+	glyphs = {}
+	cells = []	# each item is of the form (character, rect)
+	x = 0
+	y = 0
+	for character in sorted(set(characters)):
+		xBearing, yBearing, width, height, xAdvance, yAdvance = context.text_extents(character)
+		xOffset = int(min(0, math.floor(xBearing)))
+		cellWidth = max(int(math.ceil(max(xAdvance, xBearing + width))) - xOffset, 1)
+		if x > 0 and x + cellWidth > maximumWidth:	# start a new row
+			x = 0
+			y += lineHeight + 1
+		rect = MakeRect(x, y, cellWidth, lineHeight)
+		glyphs[character] = (0, rect, xOffset, 0, xAdvance)
+		cells.append((character, rect))
+		x += cellWidth + 1	# leave a pixel between characters so that they do not bleed into each other
+
+	surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(maximumWidth if y > 0 else x, 1), y + lineHeight)
+	context = cairo.Context(surface)
+	context.select_font_face(fontFamily, slant, weight)
+	context.set_font_size(fontSize)
+	context.set_source_rgb(1.0, 1.0, 1.0)
+	for character, rect in cells:
+		context.move_to(rect.point.x - glyphs[character][2], rect.point.y + ascent)
+		context.show_text(character)
+	return BitmapFont([surface], glyphs, lineHeight, ascent)
+
+def MakeBitmapFontFromFile(fntName, isColored=True):
+	"""
+	Loads a L{BitmapFont} from a BMFont text descriptor (C{.fnt}) file and its page images, as generated by tools such as AngelCode's Bitmap Font Generator or Hiero. The page images are loaded through the L{SharedImageCache}.
+
+	@param fntName: The filepath of the descriptor file.
+	@type fntName: C{string}
+	@param isColored: Whether or not the characters should be drawn in their own colors. If not, only their alpha is used. Default is C{True}.
+	@type isColored: C{bool}
+	@return: The new bitmap font.
+	@rtype: L{BitmapFont}
+	"""
+	directory = os.path.dirname(fntName)
+	pages = {}
+	glyphs = {}
+	lineHeight = 0
+	base = 0
+	fntFile = open(fntName)
+	try:
+		for line in fntFile:
+			tokens = shlex.split(line)
+			if len(tokens) < 1:
+				continue
+			values = {}
+			for token in tokens[1:]:
+				if "=" in token:
+					key, value = token.split("=", 1)
+					values[key] = value
+			if tokens[0] == "common":
+				lineHeight = int(values.get("lineHeight", 0))
+				base = int(values.get("base", 0))
+			elif tokens[0] == "page":
+				pages[int(values["id"])] = SharedImageCache().getSurface(os.path.join(directory, values["file"]))
+			elif tokens[0] == "char":
+				rect = MakeRect(int(values["x"]), int(values["y"]), int(values["width"]), int(values["height"]))
+				glyph = (int(values.get("page", 0)), rect, int(values.get("xoffset", 0)), int(values.get("yoffset", 0)), int(values.get("xadvance", rect.size.width)))
+				glyphs[unichr(int(values["id"]))] = glyph
+	finally:
+		fntFile.close()
+	surfaces = [pages[pageId] for pageId in sorted(pages.keys())]
+	return BitmapFont(surfaces, glyphs, lineHeight, base, isColored)
+
+_defaultBitmapFont = None
+
+def _getDefaultBitmapFont():
+	global _defaultBitmapFont
+	if _defaultBitmapFont is None:
+		_defaultBitmapFont = MakeSystemBitmapFont()
+	return _defaultBitmapFont
+
+
+class BitmapFontLabel(Node):
+	"""
+	Renders text to the screen by copying its characters out of a L{BitmapFont}. Unlike L{Label} and L{PangoLabel}, changing the text does not shape any text; it only copies one small rectangle per character, so BitmapFontLabel is well suited to text that changes every frame, such as scores and counters.
+
+	Characters which are not in the font are skipped. Newline characters start a new line.
+	"""
+	_isApplyingDrawOpacity = True
+
+	def __init__(self, text="", position=None, bitmapFont=None, color=None):
+		"""
+		Initialization method.
+
+		@param text: The text to be displayed.
+		@type text: C{string}
+		@param position: The position of the Label on the screen. Default is L{PointZero}.
+		@type position: L{Point} (or C{None})
+		@param bitmapFont: The font from which characters are drawn. Default is the C{"sans"} system font at size C{14} (see L{MakeSystemBitmapFont}).
+		@type bitmapFont: L{BitmapFont} (or C{None})
+		@param color: The color of the text, which is ignored if the font is colored (see L{BitmapFont.isColored}). Default is L{WhiteColor()}.
+		@type color: L{Color} (or C{None})
+		"""
+		Node.__init__(self)
+		if position is not None:
+			self.setPosition(position)
+		if bitmapFont is None:
+			bitmapFont = _getDefaultBitmapFont()
+		if color is None:
+			color = WhiteColor()
+		self.setColor(color)
+		self._bitmapFont = bitmapFont
+		self._text = None
+		self._surface = None	# the text, assembled from the font's characters whenever the text changes
+		self.setText(text)
+
+#{ Accessor methods.
+	def getText(self):
+		"""
+		Returns the text to be rendered.
+
+		@return: The text to be rendered.
+		@rtype: C{string}
+		"""
+		return self._text
+
+	def setText(self, text):
+		"""
+		Sets the text to be rendered. Setting the same text again does nothing.
+
+		@param text: The text to be rendered.
+		@type text: C{string}
+		"""
+		if self._text != text:
+			self._text = text
+			self._assembleText()
+
+	text = property(getText, setText, doc="The text to be rendered to the screen.")
+
+	def getBitmapFont(self):
+		"""
+		Returns the font from which characters are drawn.
+
+		@return: The font.
+		@rtype: L{BitmapFont}
+		"""
+		return self._bitmapFont
+
+	def setBitmapFont(self, bitmapFont):
+		"""
+		Sets the font from which characters are drawn.
+
+		@param bitmapFont: The font.
+		@type bitmapFont: L{BitmapFont}
+		"""
+		if self._bitmapFont is not bitmapFont:
+			self._bitmapFont = bitmapFont
+			self._assembleText()
+
+	bitmapFont = property(getBitmapFont, setBitmapFont, doc="The font from which characters are drawn.")
+#}
+
+	def _assembleText(self):
+		"""
+		Private method. Copies the characters of the text out of the font into the Label's surface (which is only reallocated if its size changes) and updates the size of the Label.
+		"""
+		font = self._bitmapFont
+		surfaces = font.getSurfaces()
+		placements = []	# each item is of the form (page, rect, x, y)
+		width = 0
+		x = 0
+		y = 0
+		for character in self._text:
+			if character == "\n":
+				x = 0
+				y += font.getLineHeight()
+				continue
+			glyph = font.getGlyph(character)
+			if glyph is None:
+				continue
+			pageIndex, rect, xOffset, yOffset, xAdvance = glyph
+			placements.append((surfaces[pageIndex], rect, x + xOffset, y + yOffset))
+			x += xAdvance
+			width = max(width, x, x - xAdvance + xOffset + rect.size.width)
+		height = y + font.getLineHeight()
+		self.setSize(Size(width, height))
+		if len(placements) < 1 or width <= 0 or height <= 0:
+			self._surface = None
+			return
+		surfaceWidth = int(math.ceil(width))
+		surfaceHeight = int(math.ceil(height))
+		if self._surface is not None and self._surface.get_width() == surfaceWidth and self._surface.get_height() == surfaceHeight:
+			context = cairo.Context(self._surface)	# reuse the surface, e.g. when only the digits of a counter change
+			context.set_operator(cairo.OPERATOR_CLEAR)
+			context.paint()
+			context.set_operator(cairo.OPERATOR_OVER)
+		else:
+			self._surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, surfaceWidth, surfaceHeight)
+			context = cairo.Context(self._surface)
+		for page, rect, px, py in placements:
+			context.set_source_surface(page, px - rect.point.x, py - rect.point.y)
+			context.rectangle(px, py, rect.size.width, rect.size.height)
+			context.fill()
+
+	def draw(self, context):
+		if self._surface is None:
+			return
+		if self._bitmapFont.isColored():
+			context.set_source_surface(self._surface, 0, 0)
+			context.paint_with_alpha(self._drawOpacity)
+		else:
+			color = self._color
+			context.set_source_rgba(color.r, color.g, color.b, color.a*self._drawOpacity)
+			context.mask_surface(self._surface, 0, 0)
@@ -8,8 +8,11 @@ from GTKInterface import *
 from GTKWindow import *
 
 from GestureDispatch import *
+from GestureRecording import *
 from ActionManager import *
 from Scheduler import *
+from AssetLoader import *
+from AbstractModel import *
 
 from Label import *
 
@@ -27,7 +30,7 @@ gobject.threads_init()
 
 class Director(object):
 	"""
-	The central point of the application. It handles the main run loop, L{Scene} transitions, and propagating redraw events to the Scene's children. It is also the owner of the L{GestureDispatch}, L{ActionManager}, L{Scheduler}, and the L{GTKInterface}.
+	The central point of the application. It handles the main run loop, L{Scene} transitions, and propagating redraw events to the Scene's children. It is also the owner of the L{GestureDispatch}, L{ActionManager}, L{Scheduler}, L{AssetLoader}, and the L{GTKInterface}.
 
 	Normally only one Director should exist per application.
 	"""
@@ -46,11 +49,13 @@ class Director(object):
 		self._gestureDispatch = GestureDispatch()
 		self._scheduler = Scheduler()
 		self._actionManager = ActionManager(self._scheduler)
+		self._assetLoader = AssetLoader(self._scheduler)
 
 		self._isShowingFPS = False
 
 		self._runningScene = None
 		self._nextScene = None
+		self._pendingScene = None	# the Scene whose deferred replaceScene or pushScene is waiting for its assets to load
 		self._scenesStack = []
 
 		self._oldFramerate = 1.0/60.0
@@ -64,6 +69,9 @@ class Director(object):
 		self._frames = 0
 		self._displayedFramerate = 0
 		self._isRecording = False
+		self._isUsingFixedTimeStep = False
+		self._frameStats = FrameStats()
+		self._isCollectingFrameStats = False
 		self._backgroundColor = BlackColor()
 
 #{ Accessor methods.
@@ -131,6 +139,46 @@ class Director(object):
 
 	scheduler = property(getScheduler, doc="The application's Scheduler.")
 
+	def getFrameStats(self):
+		"""
+		Returns the timing statistics for the frames which have been run while collecting them (see L{setCollectingFrameStats}), i.e. how long each frame took to update and to draw.
+
+		@return: The frame timing statistics.
+		@rtype: L{FrameStats}
+		"""
+		return self._frameStats
+
+	def isCollectingFrameStats(self):
+		"""
+		Returns whether or not the time each frame takes to update and to draw is recorded in the L{FrameStats}. Default is C{False}.
+
+		@return: Whether or not frame timings are collected.
+		@rtype: C{bool}
+		"""
+		return self._isCollectingFrameStats
+
+	def setCollectingFrameStats(self, isCollectingFrameStats):
+		"""
+		Sets whether or not the time each frame takes to update and to draw is recorded in the L{FrameStats} (see L{getFrameStats}). This is off by default so that applications which are not being profiled do not time every frame.
+
+		@param isCollectingFrameStats: Whether or not frame timings are collected.
+		@type isCollectingFrameStats: C{bool}
+		"""
+		self._isCollectingFrameStats = isCollectingFrameStats
+
+	collectingFrameStats = property(isCollectingFrameStats, setCollectingFrameStats, doc="Whether or not frame timings are collected.")
+
+	def getAssetLoader(self):
+		"""
+		Returns the L{AssetLoader} for the application, which loads images and SVG files in the background.
+
+		@return: The asset loader.
+		@rtype: L{AssetLoader}
+		"""
+		return self._assetLoader
+
+	assetLoader = property(getAssetLoader, doc="The application's AssetLoader.")
+
 	def getBackgroundColor(self):
 		return self._backgroundColor
 
@@ -206,13 +254,32 @@ class Director(object):
 		self.pushScene(scene)
 		self._startAnimation()
 
+	def preloadScene(self, scene, callback=None, progressCallback=None):
+		"""
+		Starts loading the assets declared by a L{Scene} (see L{Scene.setAssetNames}) in the background, e.g. while the current Scene or a L{Transition} is running. See L{AssetLoader.loadAssets} for the callbacks.
+
+		@param scene: The Scene whose assets will be loaded.
+		@type scene: L{Scene}
+		@param callback: Called once all of the Scene's assets have been loaded.
+		@type callback: C{function} (or C{None})
+		@param progressCallback: Called with the number of assets loaded so far and the total number of assets.
+		@type progressCallback: C{function} (or C{None})
+		"""
+		self._assetLoader.loadAssets(scene.getAssetNames(), callback, progressCallback)
+
 	def replaceScene(self, scene):
 		"""
-		Replaces the currently running L{Scene} with a new Scene.
+		Replaces the currently running L{Scene} with a new Scene (which may be a L{Transition}, in which case the assets of its destination Scene are loaded). If the new Scene has declared assets (see L{Scene.setAssetNames}) which have not been loaded yet, the current Scene keeps running while they are loaded in the background, and the new Scene is set up and shown once they are done. Any other Scene change requested in the meantime cancels the deferred one.
 
 		@param scene: The new Scene.
 		@type scene: L{Scene}
 		"""
+		self._switchSceneWhenLoaded(scene, self._replaceSceneNow)
+
+	def _replaceSceneNow(self, scene):
+		"""
+		Private method used by L{replaceScene} to replace the currently running L{Scene} once its assets are loaded.
+		"""
 		scene.setRect(Rect(Point(0,0), self._gtkInterface.getSize()))
 		scene._setDirector(self)
 		index = len(self._scenesStack)-1
@@ -221,20 +288,42 @@ class Director(object):
 
 	def pushScene(self, scene):
 		"""
-		Pushes a new L{Scene} onto the stack of Scenes.
+		Pushes a new L{Scene} onto the stack of Scenes. Like L{replaceScene}, this waits for the Scene's declared assets to be loaded.
 
 		@param scene: The new Scene.
 		@type scene: L{Scene}
 		"""
+		self._switchSceneWhenLoaded(scene, self._pushSceneNow)
+
+	def _pushSceneNow(self, scene):
+		"""
+		Private method used by L{pushScene} to push a L{Scene} once its assets are loaded.
+		"""
 		scene.setRect(Rect(Point(0,0), self._gtkInterface.getSize()))
 		scene._setDirector(self)
 		self._scenesStack.append(scene)
 		self._nextScene = scene
 
+	def _switchSceneWhenLoaded(self, scene, switch):
+		"""
+		Private method. Calls C{switch} with the L{Scene} immediately if its assets are loaded, and otherwise once they have been loaded, unless another Scene change has been requested by then. Either way, any previously deferred Scene change is cancelled.
+		"""
+		self._pendingScene = None
+		if self._assetLoader.areAssetsLoaded(scene.getAssetNames()):
+			switch(scene)
+			return
+		self._pendingScene = scene
+		def onLoaded():
+			if self._pendingScene is scene:	# otherwise this change was cancelled or superseded
+				self._pendingScene = None
+				switch(scene)
+		self.preloadScene(scene, onLoaded)
+
 	def popScene(self):
 		"""
-		Pops the most recently-pushed L{Scene} off the stack of Scenes.
+		Pops the most recently-pushed L{Scene} off the stack of Scenes. This cancels any Scene change which is waiting for assets to load.
 		"""
+		self._pendingScene = None
 		scene = self._scenesStack.pop()
 		count = len(self._scenesStack)
 		if count == 0:
@@ -289,15 +378,36 @@ class Director(object):
 
 	framerate = property(getFramerate, setFramerate, doc="The application's framerate.")
 
+	def isUsingFixedTimeStep(self):
+		"""
+		Returns whether or not the L{Scheduler} is advanced by exactly one animation interval each frame, regardless of how much time has actually passed. Default is C{False}.
+
+		@return: Whether or not a fixed time step is used.
+		@rtype: C{bool}
+		"""
+		return self._isUsingFixedTimeStep
+
+	def setUsingFixedTimeStep(self, isUsingFixedTimeStep):
+		"""
+		Sets whether or not the L{Scheduler} is advanced by exactly one animation interval each frame, regardless of how much time has actually passed. This makes the application deterministic from frame to frame (e.g. for recording gestures which will later be replayed). A fixed time step is always used while recording video or replaying gestures.
+
+		@param isUsingFixedTimeStep: Whether or not a fixed time step is used.
+		@type isUsingFixedTimeStep: C{bool}
+		"""
+		self._isUsingFixedTimeStep = isUsingFixedTimeStep
+
+	usingFixedTimeStep = property(isUsingFixedTimeStep, setUsingFixedTimeStep, doc="Whether or not the Scheduler is advanced by exactly one animation interval each frame.")
+
 	def pause(self):
 		"""
-		Pauses the application.
+		Pauses the application. While paused, the Director only runs four frames per second, but gestures are dispatched as soon as they are received (see L{GestureDispatch.setQueueing}) so that the application still responds promptly, e.g. to a button which resumes it.
 		"""
 		if self._isPaused:
 			return
 		self._oldFramerate = self._framerate
 		self.setFramerate(1.0/4.0)
 		self._isPaused = True
+		self._gestureDispatch._setDispatchingImmediately(True)
 
 	def resume(self):
 		"""
@@ -307,6 +417,7 @@ class Director(object):
 			return
 		self.setFramerate(self._oldFramerate)
 		self._isPaused = False
+		self._gestureDispatch._setDispatchingImmediately(False)
 		self._dt = 0
 #}
 
@@ -333,14 +444,20 @@ class Director(object):
 		"""
 		Private method which is called repeatedly to redraw the L{Node}C{s} and to update the L{Scheduler} with the time that has passed since the last loop.
 		"""
+		startTime = time.time()
 		self._calculateDeltaTime()
+		isUsingFixedTimeStep = self._isUsingFixedTimeStep or self._isRecording or self._gestureDispatch.isReplayingGestures()	# checked before dispatching, since the replay may finish this frame
+		self._gestureDispatch.dispatchQueuedEvents()	# input received since the last frame is dispatched before anything is updated
 		if not self._isPaused:
-			if not self._isRecording:
+			if not isUsingFixedTimeStep:
 				self._scheduler.tick(self._dt)
 			else:
 				self._scheduler.tick(self._framerate)
 		if self._nextScene is not None:
 			self._setNextScene()
+		flushModelChanges()	# coalesced model changes are delivered once everything has been updated, before the Scene is redrawn
+		if self._isCollectingFrameStats:
+			self._frameStats.addUpdateDuration(time.time() - startTime)
 		self._gtkInterface.redraw()	# This is not guaranteed to redraw within the same loop iteration as PyGTK accumulates redraw events before dispatching.
 		if self._isShowingFPS is True:
 			self._showFPS()
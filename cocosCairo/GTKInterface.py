@@ -12,6 +12,7 @@ from AbstractWindow import *
 
 from Node import *
 from Label import *
+from BitmapFontLabel import *
 
 from Color import *
 
@@ -19,8 +20,9 @@ from threading import Thread
 import os
 import subprocess
 import shlex
+import time
 
-GTK_EVENT_MASKS = gtk.gdk.BUTTON_RELEASE_MASK | gtk.gdk.BUTTON_PRESS_MASK | gtk.gdk.ENTER_NOTIFY_MASK | gtk.gdk.LEAVE_NOTIFY_MASK | gtk.gdk.POINTER_MOTION_MASK | gtk.gdk.POINTER_MOTION_HINT_MASK | gtk.gdk.KEY_PRESS_MASK | gtk.gdk.KEY_RELEASE_MASK | gtk.gdk.SCROLL_MASK
+GTK_EVENT_MASKS = gtk.gdk.BUTTON_RELEASE_MASK | gtk.gdk.BUTTON_PRESS_MASK | gtk.gdk.ENTER_NOTIFY_MASK | gtk.gdk.LEAVE_NOTIFY_MASK | gtk.gdk.POINTER_MOTION_MASK | gtk.gdk.POINTER_MOTION_HINT_MASK | gtk.gdk.KEY_PRESS_MASK | gtk.gdk.KEY_RELEASE_MASK | gtk.gdk.SCROLL_MASK | gtk.gdk.FOCUS_CHANGE_MASK
 
 
 # TODO: implement double buffering
@@ -53,6 +55,7 @@ class GTKLayout(gtk.Layout):
 		self._renderNode.addChild(label)
 
 		self._framerate = None
+		self._fpsLabel = BitmapFontLabel(bitmapFont=MakeSystemBitmapFont(fontSize=14, characters="0123456789."))	# rendered once, so updating the framerate every frame is cheap
 		self._exposeCounter = 0
 		self.set_flags(gtk.CAN_FOCUS)
 		self.grab_focus()
@@ -66,6 +69,7 @@ class GTKLayout(gtk.Layout):
 		self.connect("scroll-event", gestureDispatch._onMouseScroll)
 		self.connect("key-press-event", gestureDispatch._onKeyPress)
 		self.connect("key-release-event", gestureDispatch._onKeyRelease)
+		self.connect("focus-out-event", gestureDispatch._onFocusOut)
 
 	def _makeFFMpegCommand(self):
 		"""
@@ -198,13 +202,17 @@ class GTKLayout(gtk.Layout):
 		# Traverse the node tree.
 		scene = self._director.getRunningScene()
 		if scene is not None:
-			scene._visit(context)
+			if self._director.isCollectingFrameStats():
+				startTime = time.time()
+				scene._visit(context)
+				self._director.getFrameStats().addDrawDuration(time.time() - startTime)
+			else:
+				scene._visit(context)
 
 		if self._framerate is not None:
-			context.move_to(0, self._size.height-10)
-			context.set_font_size(14)
-			context.set_source_rgb(1,1,1)
-			context.show_text(self._framerate)
+			self._fpsLabel.setText(self._framerate)
+			context.translate(0, self._size.height-10-self._fpsLabel.getBitmapFont().getBase())	# put the baseline 10 pixels above the bottom
+			self._fpsLabel.draw(context)
 			self._framerate = None
 
 		# Done with the new context state, so pop it.
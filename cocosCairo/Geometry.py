@@ -5,6 +5,11 @@ Defines basic Geometry classes like Point, Rect, or Polygon as well as helper ge
 import math
 import random
 
+try:
+	import numpy
+except ImportError:
+	numpy = None	# the array-based functions are unavailable without NumPy
+
 PI = math.pi
 
 class Size(object):
@@ -165,6 +170,10 @@ class Polygon(object):
 		@type points: C{Comma-separated Points}
 		"""
 		self._points = []
+		self._edgeTable = None	# cached by _getEdgeTable; cleared whenever the Points change
+		self._edgeArrays = None	# NumPy version of the edge table used by containsPoints
+		self._boundingBox = None
+		self._version = 0	# incremented whenever the Points change
 		for point in points:
 			self.addPoint(point)
 
@@ -197,6 +206,7 @@ class Polygon(object):
 		Removes all points from the Polygon.
 		"""
 		self._points = []
+		self._invalidate()
 
 	def addPoint(self, point):
 		"""
@@ -208,6 +218,7 @@ class Polygon(object):
 		matchingPoints = [p for p in self._points if p.x==point.x and p.y==point.y]
 		if len(matchingPoints) < 1:
 			self._points.append(point.copy())
+			self._invalidate()
 
 	def addPoints(self, *points):
 		"""
@@ -219,6 +230,48 @@ class Polygon(object):
 		for point in points:
 			self.addPoint(point)
 
+	def getPointArray(self):
+		"""
+		Returns the Polygon's Points as an C{(n, 2)} NumPy array of x- and y-coordinates. Requires NumPy.
+
+		@return: The Polygon's Points.
+		@rtype: C{numpy.ndarray}
+		"""
+		_requireNumpy()
+		return numpy.array([(p.x, p.y) for p in self._points], dtype=float).reshape(-1, 2)
+
+	pointArray = property(getPointArray, doc="An (n, 2) NumPy array of the Polygon's Points.")
+
+	def getVersion(self):
+		"""
+		Returns a number which changes whenever Points are added to or removed from the Polygon, so that anything which caches data derived from the Polygon (such as a L{PolygonNode}) can tell when to rebuild it.
+
+		@return: The version.
+		@rtype: C{int}
+		"""
+		return self._version
+
+	version = property(getVersion, doc="Read-only access to a number which changes whenever the Polygon's Points change.")
+
+	def getBoundingBox(self):
+		"""
+		Returns the smallest L{Rect} which contains all of the Polygon's Points (or C{None} if the Polygon has no Points).
+
+		@return: The bounding box.
+		@rtype: L{Rect} (or C{None})
+		"""
+		if self._boundingBox is None and len(self._points) > 0:
+			allX = [p.x for p in self._points]
+			allY = [p.y for p in self._points]
+			minX = min(allX)
+			minY = min(allY)
+			self._boundingBox = MakeRect(minX, minY, max(allX)-minX, max(allY)-minY)
+		if self._boundingBox is None:
+			return None
+		return self._boundingBox.copy()
+
+	boundingBox = property(getBoundingBox, doc="Read-only access to the Polygon's bounding box.")
+
 	def containsPoint(self, point):
 		"""
 		Returns whether or not the Polygon contains a point.
@@ -228,19 +281,88 @@ class Polygon(object):
 		@return: Whether or not the Point is in the Polygon.
 		@rtype: C{bool}
 		"""
+		if len(self._points) < 3:
+			return False
 		x = point.x
 		y = point.y
-		xp = [p.x for p in self._points]
-		yp = [p.y for p in self._points]
+		box = self._boundingBox
+		if box is None:
+			self.getBoundingBox()
+			box = self._boundingBox
+		if x < box.point.x or y <= box.point.y or x > box.point.x+box.size.width or y > box.point.y+box.size.height:
+			return False	# early reject
 		oddNodes = False
-		j = len(self._points)-1
-		for i in range(0, len(self._points)):
-			if (yp[i]<y and yp[j]>=y) or (yp[j]<y and yp[i]>=y):
-				 if xp[i]+(y-yp[i])/(yp[j]-yp[i])*(xp[j]-xp[i]) < x:
+		for minY, maxY, xi, yi, slope in self._getEdgeTable():
+			if minY < y <= maxY:
+				if xi+(y-yi)*slope < x:
 					oddNodes = not oddNodes
-			j = i
 		return oddNodes
 
+	def containsPoints(self, points):
+		"""
+		Tests many points against the Polygon at once. If NumPy is available, the test is vectorized over all of the points; otherwise, each point is tested with L{containsPoint}.
+
+		@param points: The points to test, either as an C{(n, 2)} array of x- and y-coordinates or as a sequence of L{Point}C{s}.
+		@type points: C{numpy.ndarray} (or C{list of Points})
+		@return: Whether or not each point is in the Polygon.
+		@rtype: C{numpy.ndarray} of C{bool} (or C{list of bool} if NumPy is not available)
+		"""
+		if numpy is None:
+			return [self.containsPoint(point) for point in points]
+		points = _asPointArray(points)
+		result = numpy.zeros(len(points), dtype=bool)
+		if len(self._points) < 3 or len(points) == 0:
+			return result
+		box = self.getBoundingBox()
+		x = points[:,0]
+		y = points[:,1]
+		candidates = (x >= box.point.x) & (y > box.point.y) & (x <= box.point.x+box.size.width) & (y <= box.point.y+box.size.height)
+		indices = numpy.nonzero(candidates)[0]
+		if len(indices) == 0:
+			return result
+		x = x[indices][:,numpy.newaxis]
+		y = y[indices][:,numpy.newaxis]
+		minY, maxY, xi, yi, slope = self._getEdgeArrays()
+		crossings = (minY < y) & (y <= maxY) & (xi+(y-yi)*slope < x)
+		result[indices] = (crossings.sum(axis=1) % 2) == 1
+		return result
+
+	def _getEdgeTable(self):
+		"""
+		Private method. Returns the cached list of non-horizontal edges used in the ray-crossing test, building it first if the Points have changed. Each entry is of the form C{(minY, maxY, x, y, dx/dy)}.
+		"""
+		if self._edgeTable is None:
+			table = []
+			points = self._points
+			j = len(points)-1
+			for i in range(0, len(points)):
+				pi = points[i]
+				pj = points[j]
+				if pi.y != pj.y:	# horizontal edges can never be crossed
+					slope = float(pj.x-pi.x)/(pj.y-pi.y)
+					table.append((min(pi.y, pj.y), max(pi.y, pj.y), pi.x, pi.y, slope))
+				j = i
+			self._edgeTable = table
+		return self._edgeTable
+
+	def _getEdgeArrays(self):
+		"""
+		Private method. Returns the edge table from L{_getEdgeTable} as five NumPy arrays.
+		"""
+		if self._edgeArrays is None:
+			table = numpy.array(self._getEdgeTable(), dtype=float).reshape(-1, 5)
+			self._edgeArrays = tuple(table[:,i] for i in range(0, 5))
+		return self._edgeArrays
+
+	def _invalidate(self):
+		"""
+		Private method. Clears the cached edge table and bounding box whenever the Points change.
+		"""
+		self._edgeTable = None
+		self._edgeArrays = None
+		self._boundingBox = None
+		self._version += 1
+
 
 class Path(object):
 	"""
@@ -253,7 +375,8 @@ class Path(object):
 		@param points: The points which define the path.
 		@type points: C{Comma-separated Points}
 		"""
-		self._points = points
+		self._points = list(points)
+		self._version = 0	# incremented whenever a Point is added
 
 	def getPoints(self):
 		"""
@@ -274,7 +397,19 @@ class Path(object):
 		@type point: L{Point}
 		"""
 		self._points.append(point)
-		
+		self._version += 1
+
+	def getVersion(self):
+		"""
+		Returns a number which changes whenever a Point is added to the Path, so that anything which caches data derived from the Path (such as a L{PathNode}) can tell when to rebuild it. Modifying the Path's Points in place does not change the version.
+
+		@return: The version.
+		@rtype: C{int}
+		"""
+		return self._version
+
+	version = property(getVersion, doc="Read-only access to a number which changes whenever a Point is added to the Path.")
+
 class RelativePath(Path):
 	"""
 	A sequence of L{Point}C{s} which defines a path. The first Point is used as the absolute starting point, and all subsequent Points are relative to the first Point.
@@ -386,11 +521,15 @@ def addPolygons(*polygons):
 	@return: The smallest possible convex polygon which encompasses all the points.
 	@rtype: L{Polygon}
 	"""
+	if numpy is not None:
+		return MakePolygonFromArray(addPolygonArrays(*[polygon.getPointArray() for polygon in polygons]))
 	points = []
-	for polygon1 in polygons:
-		for polygon2 in polygons:
-			if polygon1 == polygon2:
-				continue
+	for i in range(0, len(polygons)):
+		for j in range(0, len(polygons)):
+			if i == j:
+				continue	# skip by index like _combinePointArrays, so a Polygon passed twice is combined with itself
+			polygon1 = polygons[i]
+			polygon2 = polygons[j]
 			for point1 in polygon1.getPoints():
 				for point2 in polygon2.getPoints():
 					points.append(pointAdd(point1,point2))
@@ -405,15 +544,72 @@ def multiplyPolygons(*polygons):
 	@return: The smallest possible convex polygon which encompasses all the points.
 	@rtype: L{Polygon}
 	"""
+	if numpy is not None:
+		return MakePolygonFromArray(multiplyPolygonArrays(*[polygon.getPointArray() for polygon in polygons]))
 	points = []
-	for polygon1 in polygons:
-		for polygon2 in polygons:
-			if polygon1 == polygon2:
-				continue
+	for i in range(0, len(polygons)):
+		for j in range(0, len(polygons)):
+			if i == j:
+				continue	# skip by index like _combinePointArrays, so a Polygon passed twice is combined with itself
+			polygon1 = polygons[i]
+			polygon2 = polygons[j]
 			for point1 in polygon1.getPoints():
 				for point2 in polygon2.getPoints():
 					points.append(pointMult(point1,point2))
 	return MakePolygon(*points)
+
+def addPolygonArrays(*arrays):
+	"""
+	Array-based counterpart of L{addPolygons}. Returns every point generated from pointwise addition of each pair of the given point arrays (without taking the convex hull). Requires NumPy.
+
+	@param arrays: The C{(n, 2)} point arrays to add up.
+	@type arrays: C{comma-separated numpy.ndarrays}
+	@return: An C{(m, 2)} array of all of the pairwise sums.
+	@rtype: C{numpy.ndarray}
+	"""
+	return _combinePointArrays(numpy.add, arrays)
+
+def multiplyPolygonArrays(*arrays):
+	"""
+	Array-based counterpart of L{multiplyPolygons}. Returns every point generated from pointwise multiplication of each pair of the given point arrays (without taking the convex hull). Requires NumPy.
+
+	@param arrays: The C{(n, 2)} point arrays to multiply.
+	@type arrays: C{comma-separated numpy.ndarrays}
+	@return: An C{(m, 2)} array of all of the pairwise products.
+	@rtype: C{numpy.ndarray}
+	"""
+	return _combinePointArrays(numpy.multiply, arrays)
+
+def MakePolygonFromArray(array):
+	"""
+	Creates the convex hull (see L{MakePolygon}) of the points in an C{(n, 2)} array. Requires NumPy.
+
+	@param array: The points to be bounded by a Polygon.
+	@type array: C{numpy.ndarray}
+	@return: The convex polygon bounding the points.
+	@rtype: L{Polygon}
+	"""
+	_requireNumpy()
+	array = _asPointArray(array)
+	uniquePoints = sorted(set([tuple(row) for row in array.tolist()]))	# drop duplicate points before taking the hull
+	return MakePolygon(*[Point(x, y) for x, y in uniquePoints])
+
+def _combinePointArrays(operation, arrays):
+	"""
+	Private function used by L{addPolygonArrays} and L{multiplyPolygonArrays}. Applies the operation to every pair of points from every ordered pair of arrays at different positions in the argument list (so an array passed twice is combined with itself).
+	"""
+	_requireNumpy()
+	arrays = [_asPointArray(array) for array in arrays]
+	results = []
+	for i in range(0, len(arrays)):
+		for j in range(0, len(arrays)):
+			if i == j:
+				continue
+			combined = operation(arrays[i][:,numpy.newaxis,:], arrays[j][numpy.newaxis,:,:])
+			results.append(combined.reshape(-1, 2))
+	if len(results) < 1:
+		return numpy.zeros((0, 2))
+	return numpy.concatenate(results)
 #}
 
 
@@ -797,3 +993,122 @@ def pointToAngle(point):
 	"""
 	return math.atan2(point.y, point.x)
 #}
+
+
+#{ Point array functions.
+def pointArrayAdd(*arrays):
+	"""
+	Array-based counterpart of L{pointAdd}. Adds up a series of C{(n, 2)} point arrays row by row (a single L{Point} may be given in place of an array and will be added to every row). Requires NumPy.
+
+	@param arrays: A series of point arrays.
+	@type arrays: Comma-separated C{numpy.ndarray}C{s}
+	@return: An array with the result.
+	@rtype: C{numpy.ndarray}
+	"""
+	_requireNumpy()
+	result = numpy.zeros((1, 2))	# the additive identity
+	for array in arrays:
+		result = result + _asPointArray(array)
+	return result
+
+def pointArraySub(array, *arrays):
+	"""
+	Array-based counterpart of L{pointSub}. Requires NumPy.
+
+	@param array: The original points from which all other values will be subtracted.
+	@type array: C{numpy.ndarray}
+	@param arrays: A series of point arrays.
+	@type arrays: Comma-separated C{numpy.ndarray}C{s}
+	@return: An array with the result.
+	@rtype: C{numpy.ndarray}
+	"""
+	_requireNumpy()
+	result = _asPointArray(array).copy()
+	for other in arrays:
+		result = result - _asPointArray(other)
+	return result
+
+def pointArrayMult(*arrays):
+	"""
+	Array-based counterpart of L{pointMult}. Requires NumPy.
+
+	@param arrays: A series of point arrays.
+	@type arrays: Comma-separated C{numpy.ndarray}C{s}
+	@return: An array with the result.
+	@rtype: C{numpy.ndarray}
+	"""
+	_requireNumpy()
+	result = numpy.ones((1, 2))	# the multiplicative identity
+	for array in arrays:
+		result = result * _asPointArray(array)
+	return result
+
+def pointArrayConstMult(array, value):
+	"""
+	Array-based counterpart of L{pointConstMult}. Requires NumPy.
+
+	@param array: A point array.
+	@type array: C{numpy.ndarray}
+	@param value: The value by which the points are multiplied.
+	@type value: C{float}
+	@return: An array with the result.
+	@rtype: C{numpy.ndarray}
+	"""
+	_requireNumpy()
+	return _asPointArray(array) * value
+
+def pointArrayNeg(array):
+	"""
+	Array-based counterpart of L{pointNeg}. Requires NumPy.
+
+	@param array: A point array.
+	@type array: C{numpy.ndarray}
+	@return: An array with the result.
+	@rtype: C{numpy.ndarray}
+	"""
+	_requireNumpy()
+	return -_asPointArray(array)
+
+def pointArrayLength(array):
+	"""
+	Array-based counterpart of L{pointLength}. Requires NumPy.
+
+	@param array: A point array.
+	@type array: C{numpy.ndarray}
+	@return: The distance of each point from the origin.
+	@rtype: C{numpy.ndarray}
+	"""
+	_requireNumpy()
+	array = _asPointArray(array)
+	return numpy.sqrt((array*array).sum(axis=1))
+
+def pointArrayDistance(array1, array2):
+	"""
+	Array-based counterpart of L{pointDistance}. Requires NumPy.
+
+	@param array1: A point array.
+	@type array1: C{numpy.ndarray}
+	@param array2: Another point array (or a single L{Point}).
+	@type array2: C{numpy.ndarray}
+	@return: The distance between each pair of points.
+	@rtype: C{numpy.ndarray}
+	"""
+	return pointArrayLength(pointArraySub(array1, array2))
+
+def _asPointArray(points):
+	"""
+	Private function. Converts an array, a L{Point}, or a sequence of Points into an C{(n, 2)} C{float} array.
+	"""
+	if isinstance(points, Point):
+		return numpy.array([[points.x, points.y]], dtype=float)
+	if not isinstance(points, numpy.ndarray):
+		points = [(p.x, p.y) if isinstance(p, Point) else p for p in points]
+	return numpy.asarray(points, dtype=float).reshape(-1, 2)
+
+def _requireNumpy():
+	"""
+	Private function. Raises an C{ImportError} if NumPy is not available.
+	"""
+	if numpy is None:
+		raise ImportError("NumPy is required for array-based geometry functions.")
+#}
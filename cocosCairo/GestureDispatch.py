@@ -7,22 +7,81 @@ import gtk
 
 from ListenedObject import *
 from GestureEvent import *
+from GestureRecording import *
 from Geometry import *
 
+from collections import OrderedDict
+from collections import deque
+from array import array
+import warnings
+import math
+
 _DOUBLE_PRESS_ENUM = 5
 
+_HIT_TEST_CELL_SIZE = 64.0	# the width and height, in pixels, of the cells of the hit-testing grid
+_MAXIMUM_HIT_TEST_CELLS = 1024	# Nodes which would cover more cells than this are tested against every point instead
+
+_MODIFIER_KEY_DICT = { \
+"Shift_L": "shift", \
+"Shift_R": "shift", \
+"Control_L": "control", \
+"Control_R": "control", \
+"Alt_L": "alt", \
+"Alt_R": "alt", \
+"Meta_L": "alt", \
+"Meta_R": "alt", \
+"Super_L": "super", \
+"Super_R": "super", \
+}
+
+_DISPATCH_METHOD_DICT = { \
+"mouseMotion": "dispatchMouseMotionGesture", \
+"mousePress": "dispatchMousePressGesture", \
+"mouseDoublePress": "dispatchMouseDoublePressGesture", \
+"mouseRelease": "dispatchMouseReleaseGesture", \
+"mouseScroll": "dispatchMouseScrollGesture", \
+"keyPress": "dispatchKeyPressGesture", \
+"keyRelease": "dispatchKeyReleaseGesture", \
+}
+
 # TODO: add drag and drop
 # TODO: possibly add onMouseEnter, onMouseLeave?
 
 class GestureDispatch(object, ListenedObject):
 	"""
 	A L{ListenedObject} that is responsible for sending user gestures to handlers (which could, but not necessarily, be an L{AbstractController}).
+
+	There are two kinds of listeners. Node listeners (see L{addNodeListener}, which is normally called for you by L{Node.addGestureListener} and L{Node.addController}) are attached to a L{Node}, and mouse gestures are only sent to them while the pointer is over that Node or one of its children, starting with the topmost Node. A visible Node which has no area (i.e. neither it nor any of its visible children has a non-zero width and height) cannot be pointed at, so its listeners receive every mouse gesture, as all listeners did before gestures were routed by position; listeners attached to invisible Nodes receive no mouse gestures. Global listeners (see L{addListener}) receive every gesture after the Node listeners have had a chance to handle it. Keyboard gestures are sent to all Node listeners and then to all global listeners.
+
+	Each gesture is sent to one listener at a time until a listener handles it (i.e. returns C{True}).
+
+	The GestureDispatch also keeps track of which keys are currently held down, so that they can be polled cheaply every frame (see L{isKeyDown} and L{getModifiers}) instead of each listener mirroring the keyboard state itself.
+
+	By default, gestures received from GTK are not dispatched immediately but are put into a queue which the L{Director} drains once per frame, before the L{Scheduler} ticks (see L{setQueueing}). Other threads may also add gestures to the queue via L{postGestureEvent}.
 	"""
 
 	def __init__(self):
 		ListenedObject.__init__(self)
 		self._isDispatching = True
 		self._lastMousePressTime = 0	# needed to determine if the mouse press event is a double press
+		self._nodeListeners = OrderedDict()	# each key is a Node, and each value is the ListenerSet of listeners attached to it
+		self._nodeListenersSnapshot = ()	# all of the Node listeners as a tuple, or None if they have changed since it was last built
+		self._hoveredNodes = []	# the Nodes which were under the pointer at the last mouse motion
+		self._pressedNodes = []	# the Nodes which were under the pointer at the last mouse press
+		self._hitTestGrid = None	# built by getNodesAtPoint once the Nodes stop moving, and discarded whenever the Nodes with listeners change
+		self._hitTestVersion = None	# the Nodes' transform version at the last call to getNodesAtPoint
+		self._isCoalescingMouseMotion = False
+		self._pendingMouseMotion = None	# the (x, y, time) of the latest coalesced mouse motion, or None if there is none
+		self._mouseMotionHistory = array('d')	# x, y pairs of the coalesced mouse motions since the last flush
+		self._isQueueing = True
+		self._isDispatchingImmediately = False	# set by the Director while it is paused, so that queued gestures are not held until its slow paused frames
+		self._eventQueue = deque()	# (gestureType, gestureEvent) tuples; deque appends and pops are atomic, so any thread may post without locking
+		self._frameIndex = 0	# the number of times the queue has been drained
+		self._gestureRecorder = None
+		self._gestureReplay = None
+		self._pressedKeys = set()	# the (normalized) names of the keys which are currently held down
+		self._modifiers = frozenset()	# the modifiers of the modifier keys in _pressedKeys
+		self._isSuppressingKeyRepeat = False
 
 #{ Allow / disallow dispatching.
 	def isDispatching(self):
@@ -47,59 +106,434 @@ class GestureDispatch(object, ListenedObject):
 #}
 
 
+#{ Event queue methods.
+	def isQueueing(self):
+		"""
+		Returns whether or not gestures received from GTK are queued until the next frame rather than being dispatched immediately. Default is C{True}.
+
+		@return: Whether or not gestures are queued.
+		@rtype: C{bool}
+		"""
+		return self._isQueueing
+
+	def setQueueing(self, isQueueing):
+		"""
+		Sets whether or not gestures received from GTK are queued until the next frame rather than being dispatched immediately. Queued gestures are dispatched in the order in which they were received, at a fixed point in each frame (before the L{Scheduler} ticks), so listeners never run in the middle of a GTK callback. If queueing is turned off, any queued gestures are dispatched immediately.
+
+		While the L{Director} is paused, it only runs a few frames per second, so gestures are then dispatched as soon as they are received (along with any which were already queued) regardless of this setting, and mouse motion is not coalesced (see L{setCoalescingMouseMotion}). This keeps controls such as a resume button responsive.
+
+		@param isQueueing: Whether or not gestures are queued.
+		@type isQueueing: C{bool}
+		"""
+		self._isQueueing = isQueueing
+		if not isQueueing:
+			self.dispatchQueuedEvents()
+
+	queueing = property(isQueueing, setQueueing, doc="Whether or not gestures received from GTK are queued until the next frame.")
+
+	def postGestureEvent(self, gestureType, gestureEvent):
+		"""
+		Adds a gesture to the queue, to be dispatched the next time the queue is drained. This may be called from any thread (e.g. to inject input from a network connection or a test driver).
+
+		@param gestureType: The kind of gesture: C{"mouseMotion"}, C{"mousePress"}, C{"mouseDoublePress"}, C{"mouseRelease"}, C{"mouseScroll"}, C{"keyPress"}, or C{"keyRelease"}.
+		@type gestureType: C{string}
+		@param gestureEvent: The event.
+		@type gestureEvent: L{AbstractGestureEvent}
+		"""
+		if gestureType not in _DISPATCH_METHOD_DICT:
+			warnings.warn("Unknown gesture type: " + str(gestureType))
+			return
+		self._eventQueue.append((gestureType, gestureEvent))
+
+	def dispatchQueuedEvents(self):
+		"""
+		Dispatches any pending coalesced mouse motion (see L{setCoalescingMouseMotion}) and then every gesture currently in the queue, in order. Gestures posted while the queue is being drained are left for the next call. This is called by the L{Director} once per frame, before the L{Scheduler} ticks, so it should not usually need to be called manually.
+		"""
+		self.flushMouseMotion()
+		if self._gestureReplay is not None:
+			self._gestureReplay.postGestureEventsForFrame(self, self._frameIndex)
+		self._dispatchQueue()
+		if self._gestureReplay is not None and self._gestureReplay.isFinished():
+			self._gestureReplay = None
+		self._frameIndex += 1
+
+	def getFrameIndex(self):
+		"""
+		Returns the number of times the queue has been drained (i.e. the number of frames that have passed, since the L{Director} drains it once per frame).
+
+		@return: The current frame index.
+		@rtype: C{int}
+		"""
+		return self._frameIndex
+
+	frameIndex = property(getFrameIndex, doc="Read-only access to the number of times the queue has been drained.")
+
+	def _handleGestureEvent(self, gestureType, gestureEvent):
+		"""
+		Private method. Queues a gesture received from GTK, or dispatches it immediately if the GestureDispatch is not queueing. Gestures from GTK are ignored while a log is being replayed.
+		"""
+		if self._gestureReplay is not None:
+			return
+		if self._isQueueing and not self._isDispatchingImmediately:
+			self._eventQueue.append((gestureType, gestureEvent))
+			return
+		if self._pendingMouseMotion is not None:
+			self.flushMouseMotion()	# dispatch the earlier coalesced motion first
+		self._dispatchQueue()	# and any earlier queued gestures, so that gestures stay in order
+		self._dispatchGestureEvent(gestureType, gestureEvent)
+
+	def _dispatchQueue(self):
+		"""
+		Private method. Dispatches every gesture currently in the queue, in order. Gestures posted while the queue is being drained are left for the next call.
+		"""
+		for i in range(len(self._eventQueue)):
+			gestureType, gestureEvent = self._eventQueue.popleft()
+			self._dispatchGestureEvent(gestureType, gestureEvent)
+
+	def _setDispatchingImmediately(self, isDispatchingImmediately):
+		"""
+		Private method called by the L{Director} when it is paused or resumed. While set, gestures received from GTK are dispatched as soon as they are received, even if the GestureDispatch is queueing (see L{setQueueing}).
+		"""
+		self._isDispatchingImmediately = isDispatchingImmediately
+
+	def _dispatchGestureEvent(self, gestureType, gestureEvent):
+		"""
+		Private method. Records a gesture if gestures are being recorded, then dispatches it.
+		"""
+		if self._gestureRecorder is not None:
+			self._gestureRecorder.recordGestureEvent(self._frameIndex, gestureType, gestureEvent)
+		getattr(self, _DISPATCH_METHOD_DICT[gestureType])(gestureEvent)
+#}
+
+
+#{ Recording and replay methods.
+	def startRecordingGestures(self, path):
+		"""
+		Starts writing every gesture that is dispatched from the queue (or from GTK, if the GestureDispatch is not queueing) to a compact binary log, along with the frame in which it was dispatched. Gestures dispatched manually via the public dispatch methods are not recorded. If gestures are already being recorded, the previous log is finished first. For the replay to match the recording exactly, the L{Director} should also use a fixed time step while recording (see L{Director.setUsingFixedTimeStep}).
+
+		@param path: The filepath of the log.
+		@type path: C{string}
+		"""
+		self.stopRecordingGestures()
+		self._gestureRecorder = GestureRecorder(path)
+
+	def stopRecordingGestures(self):
+		"""
+		Stops recording gestures and finishes writing the log. Does nothing if gestures are not being recorded.
+		"""
+		if self._gestureRecorder is not None:
+			self._gestureRecorder.close()
+			self._gestureRecorder = None
+
+	def isRecordingGestures(self):
+		"""
+		Returns whether or not gestures are currently being recorded.
+
+		@return: Whether or not gestures are being recorded.
+		@rtype: C{bool}
+		"""
+		return self._gestureRecorder is not None
+
+	def startReplayingGestures(self, path):
+		"""
+		Starts replaying a log written by L{startRecordingGestures}. Each gesture in the log is posted to the queue in the same frame (relative to the first recorded gesture) in which it was originally dispatched, and gestures from GTK are ignored until the replay finishes. While a log is being replayed, the L{Director} advances the L{Scheduler} by a fixed step each frame (see L{Director.setUsingFixedTimeStep}), so the replay does not depend on how fast the machine is.
+
+		@param path: The filepath of the log.
+		@type path: C{string}
+		"""
+		self._gestureReplay = GestureReplay(path)
+
+	def stopReplayingGestures(self):
+		"""
+		Stops replaying gestures. Does nothing if no log is being replayed.
+		"""
+		self._gestureReplay = None
+
+	def isReplayingGestures(self):
+		"""
+		Returns whether or not a log is currently being replayed.
+
+		@return: Whether or not gestures are being replayed.
+		@rtype: C{bool}
+		"""
+		return self._gestureReplay is not None
+#}
+
+
+#{ Mouse motion coalescing.
+	def isCoalescingMouseMotion(self):
+		"""
+		Returns whether or not mouse motions are coalesced into one event per frame. Default is C{False}.
+
+		@return: Whether or not mouse motions are coalesced.
+		@rtype: C{bool}
+		"""
+		return self._isCoalescingMouseMotion
+
+	def setCoalescingMouseMotion(self, isCoalescingMouseMotion):
+		"""
+		Sets whether or not mouse motions are coalesced into one event per frame. If so, the motions received from GTK are not dispatched as they arrive; instead, a single L{MouseGestureEvent} for the latest position is dispatched by the L{Director} at the start of each frame, and its C{history} holds the positions of all of the motions since the previous frame (e.g. for drawing applications). A pending motion is also dispatched before any mouse press, release or scroll so that listeners see events in order.
+
+		@param isCoalescingMouseMotion: Whether or not mouse motions are coalesced.
+		@type isCoalescingMouseMotion: C{bool}
+		"""
+		self._isCoalescingMouseMotion = isCoalescingMouseMotion
+		if not isCoalescingMouseMotion:
+			self.flushMouseMotion()
+
+	coalescingMouseMotion = property(isCoalescingMouseMotion, setCoalescingMouseMotion, doc="Whether or not mouse motions are coalesced into one event per frame.")
+
+	def flushMouseMotion(self):
+		"""
+		Dispatches (or queues, see L{setQueueing}) the pending coalesced mouse motion, if there is one. This is called by L{dispatchQueuedEvents} once per frame, so it should not usually need to be called manually.
+		"""
+		if self._pendingMouseMotion is None:
+			return
+		x, y, time = self._pendingMouseMotion
+		history = self._mouseMotionHistory
+		self._pendingMouseMotion = None
+		self._mouseMotionHistory = array('d')
+		self._handleGestureEvent("mouseMotion", MouseGestureEvent(Point(x, y), time, -1, history))
+#}
+
+
+#{ Keyboard state methods.
+	def isKeyDown(self, key):
+		"""
+		Returns whether or not a key is currently held down. Single-character key names are compared case-insensitively, so C{isKeyDown("a")} is C{True} whether or not Shift was held when the key was pressed.
+
+		@param key: The name of the key, as in L{KeyboardGestureEvent.key} (e.g. C{"a"}, C{"Left"}, C{"space"}, C{"Shift_L"}).
+		@type key: C{string}
+		@return: Whether or not the key is held down.
+		@rtype: C{bool}
+		"""
+		return _normalizeKeyName(key) in self._pressedKeys
+
+	def getPressedKeys(self):
+		"""
+		Returns the names of all of the keys which are currently held down (with single-character names in lower case).
+
+		@return: The pressed keys.
+		@rtype: C{frozenset of strings}
+		"""
+		return frozenset(self._pressedKeys)
+
+	pressedKeys = property(getPressedKeys, doc="Read-only access to the names of the keys which are currently held down.")
+
+	def getModifiers(self):
+		"""
+		Returns the modifiers whose keys are currently held down: any of C{"shift"}, C{"control"}, C{"alt"} and C{"super"}. Every dispatched gesture event also carries the modifiers which were held down at the time in its C{modifiers} attribute.
+
+		@return: The held modifiers.
+		@rtype: C{frozenset of strings}
+		"""
+		return self._modifiers
+
+	modifiers = property(getModifiers, doc="Read-only access to the modifiers whose keys are currently held down.")
+
+	def isModifierDown(self, modifier):
+		"""
+		Returns whether or not a modifier key is currently held down.
+
+		@param modifier: The modifier: C{"shift"}, C{"control"}, C{"alt"} or C{"super"}.
+		@type modifier: C{string}
+		@return: Whether or not the modifier is held down.
+		@rtype: C{bool}
+		"""
+		return modifier in self._modifiers
+
+	def isSuppressingKeyRepeat(self):
+		"""
+		Returns whether or not auto-repeated key presses are discarded rather than dispatched. Default is C{False}.
+
+		@return: Whether or not auto-repeated key presses are discarded.
+		@rtype: C{bool}
+		"""
+		return self._isSuppressingKeyRepeat
+
+	def setSuppressingKeyRepeat(self, isSuppressingKeyRepeat):
+		"""
+		Sets whether or not auto-repeated key presses (i.e. presses of a key which is already held down) are discarded rather than dispatched. Whether or not this is set, repeated presses are marked via L{KeyboardGestureEvent.isRepeat}.
+
+		@param isSuppressingKeyRepeat: Whether or not auto-repeated key presses are discarded.
+		@type isSuppressingKeyRepeat: C{bool}
+		"""
+		self._isSuppressingKeyRepeat = isSuppressingKeyRepeat
+
+	suppressingKeyRepeat = property(isSuppressingKeyRepeat, setSuppressingKeyRepeat, doc="Whether or not auto-repeated key presses are discarded rather than dispatched.")
+
+	def releaseAllKeys(self):
+		"""
+		Forgets all of the keys which are held down, without dispatching any key releases. This is called when the window loses the keyboard focus, since the key releases will then never arrive.
+		"""
+		self._pressedKeys.clear()
+		self._modifiers = frozenset()
+#}
+
+
+#{ Node listener methods.
+	def addNodeListener(self, node, listener):
+		"""
+		Adds a listener which is attached to a L{Node}. It receives mouse gestures only while the pointer is over the Node or one of its visible children, and it receives all keyboard gestures.
+
+		@param node: The Node to which the listener is attached.
+		@type node: L{Node}
+		@param listener: The listener.
+		@type listener: L{GestureListener}
+		"""
+		self.addNodeListeners(node, (listener,))
+
+	def addNodeListeners(self, node, listeners):
+		"""
+		Adds several listeners which are attached to a L{Node} at once (see L{addNodeListener}). This is called by L{Node.onEnter}.
+
+		@param node: The Node to which the listeners are attached.
+		@type node: L{Node}
+		@param listeners: The listeners.
+		@type listeners: C{iterable} of L{GestureListener}C{s}
+		"""
+		nodeListeners = self._nodeListeners.get(node)
+		if nodeListeners is None:
+			nodeListeners = ListenerSet()
+			self._nodeListeners[node] = nodeListeners
+			self._hitTestGrid = None
+		nodeListeners.addAll(listeners)
+		if len(nodeListeners) < 1:
+			del self._nodeListeners[node]
+		self._nodeListenersSnapshot = None
+
+	def removeNodeListener(self, node, listener):
+		"""
+		Removes a listener which is attached to a L{Node}, if it is currently listening.
+
+		@param node: The Node to which the listener is attached.
+		@type node: L{Node}
+		@param listener: The listener.
+		@type listener: L{GestureListener}
+		"""
+		nodeListeners = self._nodeListeners.get(node)
+		if nodeListeners is not None and listener in nodeListeners:
+			nodeListeners.remove(listener)
+			if len(nodeListeners) < 1:
+				del self._nodeListeners[node]
+				self._hitTestGrid = None
+			self._nodeListenersSnapshot = None
+
+	def removeNodeListeners(self, node):
+		"""
+		Removes all of the listeners which are attached to a L{Node} at once. This is called by L{Node.onExit}.
+
+		@param node: The Node to which the listeners are attached.
+		@type node: L{Node}
+		"""
+		if node in self._nodeListeners:
+			del self._nodeListeners[node]
+			self._nodeListenersSnapshot = None
+			self._hitTestGrid = None
+
+	def getNodeListeners(self):
+		"""
+		Returns all of the listeners which are attached to L{Node}C{s}, in the order in which their Nodes were registered. The returned tuple is not affected by later changes to the listeners.
+
+		@return: A tuple of L{GestureListener}C{s}.
+		@rtype: C{tuple}
+		"""
+		if self._nodeListenersSnapshot is None:
+			listeners = []
+			for nodeListeners in self._nodeListeners.itervalues():
+				listeners.extend(nodeListeners)
+			self._nodeListenersSnapshot = tuple(listeners)
+		return self._nodeListenersSnapshot
+
+	def getNodesAtPoint(self, point):
+		"""
+		Returns the L{Node}C{s} with attached listeners which are under a point (along with those which have no area, see L{GestureDispatch}), topmost first.
+
+		Once the Nodes have stopped moving, their bounding boxes are bucketed into a grid so that only the Nodes near the point need to be tested. The grid is rebuilt the next time the Nodes are still after any Node's geometry, visibility or parenting changes; while the Nodes are moving (e.g. during an animation), every Node is tested instead, since a new grid might only be used once.
+
+		@param point: The point in window coordinates.
+		@type point: L{Point}
+		@return: The Nodes.
+		@rtype: C{list}
+		"""
+		if len(self._nodeListeners) < 1:
+			return []
+		version = next(iter(self._nodeListeners))._getTransformVersion()
+		grid = self._hitTestGrid
+		if grid is None or grid.version != version:
+			if version != self._hitTestVersion:
+				self._hitTestVersion = version
+				self._hitTestGrid = None
+				nodes = [node for node in self._nodeListeners.keys() if node._isHitByWindowPoint(point) or (node._isVisible and not node._hasHitArea())]
+				nodes.sort(key=lambda node: node._getDrawingOrder(), reverse=True)
+				return nodes
+			grid = _HitTestGrid(self._nodeListeners.keys(), version)
+			self._hitTestGrid = grid
+		return grid.getNodesAtPoint(point)
+#}
+
+
 #{ Private GTK event handlers.
 	def _onMouseMotion(self, widget, event):
 		"""
-		Private method. Receives mouse motion events from GTK. It constructs a L{MouseGestureEvent}, then dispatches it via L{dispatchMouseMotionGesture}.
+		Private method. Receives mouse motion events from GTK. It constructs a L{MouseGestureEvent}, then dispatches it (once the queue is drained, see L{setQueueing}) via L{dispatchMouseMotionGesture}.
 
 		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
 		@type widget: C{gtk.Widget}
 		@param event: The GTK event with the event information.
 		@type event: C{gtk.gdk.MOTION_NOTIFY}
 		"""
+		if self._isCoalescingMouseMotion and not self._isDispatchingImmediately:
+			self._pendingMouseMotion = (event.x, event.y, event.time)
+			self._mouseMotionHistory.append(event.x)
+			self._mouseMotionHistory.append(event.y)
+			return
 		point = Point(event.x, event.y)
 		gestureEvent = MouseGestureEvent(point, event.time, -1)
-		self.dispatchMouseMotionGesture(gestureEvent)
+		self._handleGestureEvent("mouseMotion", gestureEvent)
 
 	def _onMousePress(self, widget, event):
 		"""
-		Private method. Receives mouse press events from GTK. It constructs a L{MouseGestureEvent}, then dispatches it via L{dispatchMousePressGesture} (or L{dispatchMouseDoublePressGesture} if it was a double press). Note that, when a user double presses, two single-press events will be dispatched before the double-press event is dispatched.
+		Private method. Receives mouse press events from GTK. It constructs a L{MouseGestureEvent}, then dispatches it (once the queue is drained, see L{setQueueing}) via L{dispatchMousePressGesture} (or L{dispatchMouseDoublePressGesture} if it was a double press). Note that, when a user double presses, two single-press events will be dispatched before the double-press event is dispatched.
 
 		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
 		@type widget: C{gtk.Widget}
 		@param event: The GTK event with the event information.
 		@type event: C{gtk.gdk.BUTTON_PRESS}
 		"""
+		self.flushMouseMotion()
 		point = Point(event.x, event.y)
 		gestureEvent = MouseGestureEvent(point, event.time, event.button)
 		if self._lastMousePressTime == event.time:
-			self.dispatchMouseDoublePressGesture(gestureEvent)
+			self._handleGestureEvent("mouseDoublePress", gestureEvent)
 		else:
-			self.dispatchMousePressGesture(gestureEvent)
+			self._handleGestureEvent("mousePress", gestureEvent)
 		self._lastMousePressTime = event.time
 
 	def _onMouseRelease(self, widget, event):
 		"""
-		Private method. Receives mouse release events from GTK. It constructs a L{MouseGestureEvent}, then dispatches it via L{dispatchMouseReleaseGesture}.
+		Private method. Receives mouse release events from GTK. It constructs a L{MouseGestureEvent}, then dispatches it (once the queue is drained, see L{setQueueing}) via L{dispatchMouseReleaseGesture}.
 
 		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
 		@type widget: C{gtk.Widget}
 		@param event: The GTK event with the event information.
 		@type event: C{gtk.gdk.BUTTON_RELEASE}
 		"""
+		self.flushMouseMotion()
 		point = Point(event.x, event.y)
 		gestureEvent = MouseGestureEvent(point, event.time, event.button)
-		self.dispatchMouseReleaseGesture(gestureEvent)
+		self._handleGestureEvent("mouseRelease", gestureEvent)
 
 	def _onMouseScroll(self, widget, event):
 		"""
-		Private method. Receives mouse scroll events from GTK. It constructs a L{MouseScrollGestureEvent}, then dispatches it via L{dispatchMouseScrollGesture}.
+		Private method. Receives mouse scroll events from GTK. It constructs a L{MouseScrollGestureEvent}, then dispatches it (once the queue is drained, see L{setQueueing}) via L{dispatchMouseScrollGesture}.
 
 		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
 		@type widget: C{gtk.Widget}
 		@param event: The GTK event with the event information.
 		@type event: C{gtk.gdk.SCROLL}
 		"""
+		self.flushMouseMotion()
 		if event.direction is gtk.gdk.SCROLL_UP:
 			direction = 'up'
 		elif event.direction is gtk.gdk.SCROLL_DOWN:
@@ -112,11 +546,11 @@ class GestureDispatch(object, ListenedObject):
 			direction = ''
 		point = Point(event.x, event.y)
 		gestureEvent = MouseScrollGestureEvent(point, event.time, direction)
-		self.dispatchMouseScrollGesture(gestureEvent)
+		self._handleGestureEvent("mouseScroll", gestureEvent)
 
 	def _onKeyPress(self, widget, event):
 		"""
-		Private method. Receives key press events from GTK. It constructs a L{KeyboardGestureEvent}, then dispatches it via L{dispatchKeyPressGesture}.
+		Private method. Receives key press events from GTK. It constructs a L{KeyboardGestureEvent}, then dispatches it (once the queue is drained, see L{setQueueing}) via L{dispatchKeyPressGesture}.
 
 		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
 		@type widget: C{gtk.Widget}
@@ -124,11 +558,11 @@ class GestureDispatch(object, ListenedObject):
 		@type event: C{gtk.gdk.KEY_PRESS}
 		"""
 		gestureEvent = KeyboardGestureEvent(event.time, gtk.gdk.keyval_name(event.keyval))
-		self.dispatchKeyPressGesture(gestureEvent)
+		self._handleGestureEvent("keyPress", gestureEvent)
 
 	def _onKeyRelease(self, widget, event):
 		"""
-		Private method. Receives key release events from GTK. It constructs a L{KeyboardGestureEvent}, then dispatches it via L{dispatchKeyReleaseGesture}.
+		Private method. Receives key release events from GTK. It constructs a L{KeyboardGestureEvent}, then dispatches it (once the queue is drained, see L{setQueueing}) via L{dispatchKeyReleaseGesture}.
 
 		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
 		@type widget: C{gtk.Widget}
@@ -136,23 +570,35 @@ class GestureDispatch(object, ListenedObject):
 		@type event: C{gtk.gdk.KEY_RELEASE}
 		"""
 		gestureEvent = KeyboardGestureEvent(event.time, gtk.gdk.keyval_name(event.keyval))
-		self.dispatchKeyReleaseGesture(gestureEvent)
+		self._handleGestureEvent("keyRelease", gestureEvent)
+
+	def _onFocusOut(self, widget, event):
+		"""
+		Private method. Receives focus out events from GTK, and forgets the keys which are held down (see L{releaseAllKeys}).
+
+		@param widget: The GTK widget in which the event occurred. This should normally be the L{GTKLayout}.
+		@type widget: C{gtk.Widget}
+		@param event: The GTK event with the event information.
+		@type event: C{gtk.gdk.FOCUS_CHANGE}
+		"""
+		if self._gestureReplay is None:	# replayed keys are not affected by the real keyboard
+			self.releaseAllKeys()
 #}
 
 
 #{ Public dispatch methods.
 	def dispatchMouseMotionGesture(self, gestureEvent):
 		"""
-		If currently sending out events, notifies listeners of a mouse motion. This may be used to manually fire an event.
+		If currently sending out events, notifies listeners of a mouse motion. This may be used to manually fire an event. Node listeners whose Nodes were under the pointer at the previous motion also receive the event, so that they can tell when the pointer has left. While a button is held, Node listeners whose Nodes were under the pointer when it was pressed also receive the event, so that a drag continues even once the pointer has moved past the edge of the dragged Node.
 
 		@param gestureEvent: The event.
 		@type gestureEvent: L{MouseGestureEvent}
 		"""
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onMouseMotion(gestureEvent)
-				if listenerHandledEvent:
-					break
+			nodes = self.getNodesAtPoint(gestureEvent.point)
+			previousNodes = self._hoveredNodes
+			self._hoveredNodes = nodes
+			self._dispatchToListeners("onMouseMotion", gestureEvent, self._getMouseListeners(nodes, previousNodes + self._pressedNodes))
 
 	def dispatchMousePressGesture(self, gestureEvent):
 		"""
@@ -162,10 +608,9 @@ class GestureDispatch(object, ListenedObject):
 		@type gestureEvent: L{MouseGestureEvent}
 		"""
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onMousePress(gestureEvent)
-				if listenerHandledEvent:
-					break
+			nodes = self.getNodesAtPoint(gestureEvent.point)
+			self._pressedNodes = nodes
+			self._dispatchToListeners("onMousePress", gestureEvent, self._getMouseListeners(nodes))
 
 	def dispatchMouseDoublePressGesture(self, gestureEvent):
 		"""
@@ -175,23 +620,21 @@ class GestureDispatch(object, ListenedObject):
 		@type gestureEvent: L{MouseGestureEvent}
 		"""
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onMouseDoublePress(gestureEvent)
-				if listenerHandledEvent:
-					breaks
+			nodes = self.getNodesAtPoint(gestureEvent.point)
+			self._dispatchToListeners("onMouseDoublePress", gestureEvent, self._getMouseListeners(nodes))
 
 	def dispatchMouseReleaseGesture(self, gestureEvent):
 		"""
-		If currently sending out events, notifies listeners of a mouse release. This may be used to manually fire an event.
+		If currently sending out events, notifies listeners of a mouse release. This may be used to manually fire an event. Node listeners whose Nodes were under the pointer when the button was pressed also receive the event, even if the pointer has since left them.
 
 		@param gestureEvent: The event.
 		@type gestureEvent: L{MouseGestureEvent}
 		"""
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onMouseRelease(gestureEvent)
-				if listenerHandledEvent:
-					break
+			nodes = self.getNodesAtPoint(gestureEvent.point)
+			pressedNodes = self._pressedNodes
+			self._pressedNodes = []
+			self._dispatchToListeners("onMouseRelease", gestureEvent, self._getMouseListeners(nodes, pressedNodes))
 
 	def dispatchMouseScrollGesture(self, gestureEvent):
 		"""
@@ -201,34 +644,122 @@ class GestureDispatch(object, ListenedObject):
 		@type gestureEvent: L{MouseScrollGestureEvent}
 		"""
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onMouseScroll(gestureEvent)
-				if listenerHandledEvent:
-					break
+			nodes = self.getNodesAtPoint(gestureEvent.point)
+			self._dispatchToListeners("onMouseScroll", gestureEvent, self._getMouseListeners(nodes))
 
 	def dispatchKeyPressGesture(self, gestureEvent):
 		"""
-		If currently sending out events, notifies listeners of a key press. This may be used to manually fire an event.
+		Records that the key is held down and, if currently sending out events, notifies listeners of a key press. This may be used to manually fire an event. If the key is already held down, the press is marked as a repeat and, if repeats are being suppressed (see L{setSuppressingKeyRepeat}), it is not sent out.
 
 		@param gestureEvent: The event.
 		@type gestureEvent: L{KeyboardGestureEvent}
 		"""
+		key = _normalizeKeyName(gestureEvent.key)
+		gestureEvent.isRepeat = key in self._pressedKeys
+		if not gestureEvent.isRepeat:
+			self._pressedKeys.add(key)
+			if key in _MODIFIER_KEY_DICT:
+				self._updateModifiers()
+		elif self._isSuppressingKeyRepeat:
+			return
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onKeyPress(gestureEvent)
-				if listenerHandledEvent:
-					break
+			self._dispatchToListeners("onKeyPress", gestureEvent, self.getNodeListeners() + self.getListeners())
 
 	def dispatchKeyReleaseGesture(self, gestureEvent):
 		"""
-		If currently sending out events, notifies listeners of a key release. This may be used to manually fire an event.
+		Records that the key is no longer held down and, if currently sending out events, notifies listeners of a key release. This may be used to manually fire an event. The released key's own modifier is still included in the event's C{modifiers}.
 
 		@param gestureEvent: The event.
 		@type gestureEvent: L{KeyboardGestureEvent}
 		"""
+		if gestureEvent.modifiers is None:
+			gestureEvent.modifiers = self._modifiers
+		key = _normalizeKeyName(gestureEvent.key)
+		if key in self._pressedKeys:
+			self._pressedKeys.remove(key)
+			if key in _MODIFIER_KEY_DICT:
+				self._updateModifiers()
 		if self._isDispatching is True:
-			for listener in self.getListeners():
-				listenerHandledEvent = listener.onKeyRelease(gestureEvent)
-				if listenerHandledEvent:
-					break
+			self._dispatchToListeners("onKeyRelease", gestureEvent, self.getNodeListeners() + self.getListeners())
+#}
+
+
+#{ Private dispatch methods.
+	def _getMouseListeners(self, nodes, extraNodes=None):
+		"""
+		Private method. Returns the listeners attached to the given Nodes (topmost first), followed by those attached to any extra Nodes which are still registered, followed by the global listeners.
+		"""
+		if extraNodes is not None:
+			nodes = list(nodes)
+			for node in extraNodes:
+				if node not in nodes and node in self._nodeListeners:
+					nodes.append(node)
+		listeners = []
+		for node in nodes:
+			listeners.extend(self._nodeListeners[node])
+		listeners.extend(self.getListeners())
+		return listeners
+
+	def _dispatchToListeners(self, handlerName, gestureEvent, listeners):
+		"""
+		Private method. Fills in the event's modifiers if they have not been set, then calls the named handler of each listener in turn until one of them handles the event.
+		"""
+		if getattr(gestureEvent, "modifiers", False) is None:
+			gestureEvent.modifiers = self._modifiers
+		for listener in listeners:
+			listenerHandledEvent = getattr(listener, handlerName)(gestureEvent)
+			if listenerHandledEvent:
+				break
+
+	def _updateModifiers(self):
+		"""
+		Private method. Recalculates the held modifiers from the held keys.
+		"""
+		self._modifiers = frozenset([_MODIFIER_KEY_DICT[key] for key in self._pressedKeys if key in _MODIFIER_KEY_DICT])
 #}
+
+def _normalizeKeyName(key):
+	if key is not None and len(key) == 1:
+		return key.lower()	# e.g. "A" and "a" are the same key, and Shift may be released before the key is
+	return key
+
+
+class _HitTestGrid(object):
+	"""
+	Private class used by the L{GestureDispatch}. Buckets L{Node}C{s} into the cells of a uniform grid which their bounding boxes overlap, so that only the Nodes in the cell under a point need to be hit-tested.
+	"""
+	def __init__(self, nodes, version):
+		self.version = version	# the Nodes' transform version when the grid was built
+		self._cells = {}	# each key is a cell of the form (column, row), and each value is a list of Nodes
+		self._largeNodes = []	# Nodes which cover too many cells to be bucketed, so they are tested against every point
+		self._arealessNodes = []	# visible Nodes which have no area, so they are under every point
+		self._drawingOrders = {}	# each key is a Node, and each value is its drawing order
+		for node in nodes:
+			box = node._getHitBoundingBox()
+			if box is None:
+				continue	# the Node is not visible
+			self._drawingOrders[node] = node._getDrawingOrder()
+			if not node._hasHitArea():
+				self._arealessNodes.append(node)
+				continue
+			minColumn, minRow = _getHitTestCell(box[0], box[1])
+			maxColumn, maxRow = _getHitTestCell(box[2], box[3])
+			if (maxColumn-minColumn+1) * (maxRow-minRow+1) > _MAXIMUM_HIT_TEST_CELLS:
+				self._largeNodes.append(node)
+				continue
+			for column in xrange(minColumn, maxColumn+1):
+				for row in xrange(minRow, maxRow+1):
+					self._cells.setdefault((column, row), []).append(node)
+
+	def getNodesAtPoint(self, point):
+		"""
+		Returns the Nodes which are under a point, topmost first.
+		"""
+		candidates = self._cells.get(_getHitTestCell(point.x, point.y), [])
+		nodes = [node for node in candidates + self._largeNodes if node._isHitByWindowPoint(point)]
+		nodes.extend(self._arealessNodes)
+		nodes.sort(key=self._drawingOrders.__getitem__, reverse=True)
+		return nodes
+
+def _getHitTestCell(x, y):
+	return (int(math.floor(x / _HIT_TEST_CELL_SIZE)), int(math.floor(y / _HIT_TEST_CELL_SIZE)))
@@ -4,9 +4,6 @@ An object that contains information about a detected gesture.
 
 from Geometry import *
 
-# TODO: add state stuff so GestureListeners know if, e.g., Ctrl or Alt keys are pressed when gesture is
-# TODO: dispatched.
-
 class AbstractGestureEvent(object):
 	"""
 	An object that contains information about a detected gesture (e.g. a mouse press or a key release). AbstractGestureEvents are considered primitives, so values may be accessed directly (e.g. C{event.point} if event is a L{MouseGestureEvent}).
@@ -17,7 +14,7 @@ class MouseGestureEvent(AbstractGestureEvent):
 	"""
 	An event for mouse press, mouse double press, mouse release, and mouse motion. If the gesture is a mouse motion, the button is not recorded and instead is defined as C{-1}.
 	"""
-	def __init__(self, point=None, time=0, button=0):
+	def __init__(self, point=None, time=0, button=0, history=None, modifiers=None):
 		"""
 		Initialization method.
 
@@ -27,16 +24,22 @@ class MouseGestureEvent(AbstractGestureEvent):
 		@type time: Non-negative C{int}
 		@param button: For press and release events, the index of the button for which the event occurred. If the gesture is a mouse motion, the value is C{-1}. Default is C{0}.
 		@type button: Non-negative C{int}
+		@param history: For coalesced mouse motions (see L{GestureDispatch.setCoalescingMouseMotion}), the positions of all of the motions since the last frame as a flat array of the form C{[x0, y0, x1, y1, ...]}, oldest first and ending with C{point}. Default is C{None}.
+		@type history: C{array.array} (or C{None})
+		@param modifiers: The modifier keys which were held down when the event occurred (see L{GestureDispatch.getModifiers}). If C{None}, the GestureDispatch fills it in when the event is dispatched. Default is C{None}.
+		@type modifiers: C{frozenset of strings} (or C{None})
 		"""
 		self.point = point		#: The Point to which the event occurred.
 		self.time = time		#: The time at which the event occurred.
 		self.button = button	#: The index of the button for which the event occurred (C{-1} if the event is a mouse motion event).
+		self.history = history	#: For coalesced mouse motions, the flat array of positions since the last frame (C{None} otherwise).
+		self.modifiers = modifiers	#: The modifier keys (e.g. C{"shift"}, C{"control"}) which were held down when the event occurred.
 
 class MouseScrollGestureEvent(AbstractGestureEvent):
 	"""
 	An event for when the mouse scrolls.
 	"""
-	def __init__(self, point=None, time=0, direction=''):
+	def __init__(self, point=None, time=0, direction='', modifiers=None):
 		"""
 		@param point: The Point at which the event occurred. Default is C{None}.
 		@type point: L{Point}
@@ -44,16 +47,19 @@ class MouseScrollGestureEvent(AbstractGestureEvent):
 		@type time: Non-negative C{int}
 		@param direction: The direction in which the mouse scrolled (C{'up'}, C{'down'}, C{'left'}, C{'right'}). Default is the empty string (C{""}).
 		@type direction: C{string}
+		@param modifiers: The modifier keys which were held down when the event occurred (see L{GestureDispatch.getModifiers}). If C{None}, the GestureDispatch fills it in when the event is dispatched. Default is C{None}.
+		@type modifiers: C{frozenset of strings} (or C{None})
 		"""
 		self.point = point			#: The Point at which the event occurred.
 		self.time = time			#: The time at which the event occurred.
 		self.direction = direction	#: The direction of the scrolling.
+		self.modifiers = modifiers	#: The modifier keys (e.g. C{"shift"}, C{"control"}) which were held down when the event occurred.
 
 class KeyboardGestureEvent(AbstractGestureEvent):
 	"""
 	An event for when a key is pressed or released.
 	"""
-	def __init__(self, time=0, key=''):
+	def __init__(self, time=0, key='', modifiers=None, isRepeat=False):
 		"""
 		Initialization method.
 
@@ -61,6 +67,12 @@ class KeyboardGestureEvent(AbstractGestureEvent):
 		@type time: Non-negative C{int}
 		@param key: The key for which the event occurred. Default is the empty string (C{""}).
 		@type key: C{string}
+		@param modifiers: The modifier keys which were held down when the event occurred, including the key itself if it is a modifier key (see L{GestureDispatch.getModifiers}). If C{None}, the GestureDispatch fills it in when the event is dispatched. Default is C{None}.
+		@type modifiers: C{frozenset of strings} (or C{None})
+		@param isRepeat: Whether or not the event is an auto-repeated press of a key which is already held down. This is set by the GestureDispatch when the event is dispatched. Default is C{False}.
+		@type isRepeat: C{bool}
 		"""
-		self.time = time	#: The time at which the event occurred.
-		self.key = key		#: The keyboard key for which the event occurred.
+		self.time = time			#: The time at which the event occurred.
+		self.key = key				#: The keyboard key for which the event occurred.
+		self.modifiers = modifiers	#: The modifier keys (e.g. C{"shift"}, C{"control"}) which were held down when the event occurred.
+		self.isRepeat = isRepeat	#: Whether or not the event is an auto-repeated press of a key which is already held down.
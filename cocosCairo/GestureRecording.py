@@ -0,0 +1,263 @@
+"""
+Records gestures to a compact binary log and replays them, along with frame timing statistics.
+"""
+
+from GestureEvent import *
+from Geometry import *
+
+from array import array
+from collections import deque
+import struct
+
+_MAGIC = "CCGR"	# identifies a gesture log
+_VERSION = 1
+
+_GESTURE_TYPES = ("mouseMotion", "mousePress", "mouseDoublePress", "mouseRelease", "mouseScroll", "keyPress", "keyRelease")
+_SCROLL_DIRECTIONS = ("", "up", "down", "left", "right")
+
+_HEADER_FORMAT = "<IBI"		# frame index, gesture type, time
+_MOUSE_FORMAT = "<ddhI"		# x, y, button, number of history values (which follow as doubles)
+_SCROLL_FORMAT = "<ddB"		# x, y, direction
+_KEY_FORMAT = "<H"			# length of the key name (which follows as UTF-8)
+
+class GestureRecorder(object):
+	"""
+	Writes gestures to a binary log file, each tagged with the index of the frame in which it was dispatched. Normally used via L{GestureDispatch.startRecordingGestures}; the log can be replayed with L{GestureReplay}.
+	"""
+	def __init__(self, path):
+		"""
+		Initialization method. Creates (or overwrites) the log file.
+
+		@param path: The filepath of the log.
+		@type path: C{string}
+		"""
+		self._file = open(path, "wb")
+		self._file.write(_MAGIC + struct.pack("<B", _VERSION))
+
+	def recordGestureEvent(self, frameIndex, gestureType, gestureEvent):
+		"""
+		Appends a gesture to the log.
+
+		@param frameIndex: The index of the frame in which the gesture was dispatched.
+		@type frameIndex: Non-negative C{int}
+		@param gestureType: The kind of gesture (see L{GestureDispatch.postGestureEvent}).
+		@type gestureType: C{string}
+		@param gestureEvent: The event.
+		@type gestureEvent: L{AbstractGestureEvent}
+		"""
+		data = struct.pack(_HEADER_FORMAT, frameIndex, _GESTURE_TYPES.index(gestureType), int(gestureEvent.time) & 0xffffffff)
+		if gestureType == "mouseScroll":
+			direction = gestureEvent.direction
+			if direction not in _SCROLL_DIRECTIONS:
+				direction = ""
+			data += struct.pack(_SCROLL_FORMAT, gestureEvent.point.x, gestureEvent.point.y, _SCROLL_DIRECTIONS.index(direction))
+		elif gestureType.startswith("mouse"):
+			history = gestureEvent.history
+			if history is None:
+				history = array('d')
+			data += struct.pack(_MOUSE_FORMAT, gestureEvent.point.x, gestureEvent.point.y, gestureEvent.button, len(history))
+			data += array('d', history).tostring()
+		else:
+			key = gestureEvent.key
+			if key is None:
+				key = ""
+			elif isinstance(key, unicode):
+				key = key.encode("utf-8")
+			data += struct.pack(_KEY_FORMAT, len(key)) + key
+		self._file.write(data)
+
+	def close(self):
+		"""
+		Finishes writing the log.
+		"""
+		self._file.close()
+
+
+def readGestureLog(path):
+	"""
+	Reads a log written by L{GestureRecorder}.
+
+	@param path: The filepath of the log.
+	@type path: C{string}
+	@return: A list of tuples of the form C{(frameIndex, gestureType, gestureEvent)}, in the order in which they were recorded.
+	@rtype: C{list}
+	"""
+	logFile = open(path, "rb")
+	try:
+		data = logFile.read()
+	finally:
+		logFile.close()
+	if data[:len(_MAGIC)] != _MAGIC:
+		raise ValueError(path + " is not a gesture log.")
+	offset = len(_MAGIC) + 1
+	headerSize = struct.calcsize(_HEADER_FORMAT)
+	records = []
+	while offset < len(data):
+		frameIndex, typeIndex, time = struct.unpack_from(_HEADER_FORMAT, data, offset)
+		offset += headerSize
+		gestureType = _GESTURE_TYPES[typeIndex]
+		if gestureType == "mouseScroll":
+			x, y, directionIndex = struct.unpack_from(_SCROLL_FORMAT, data, offset)
+			offset += struct.calcsize(_SCROLL_FORMAT)
+			gestureEvent = MouseScrollGestureEvent(Point(x, y), time, _SCROLL_DIRECTIONS[directionIndex])
+		elif gestureType.startswith("mouse"):
+			x, y, button, historyLength = struct.unpack_from(_MOUSE_FORMAT, data, offset)
+			offset += struct.calcsize(_MOUSE_FORMAT)
+			history = None
+			if historyLength > 0:
+				history = array('d')
+				history.fromstring(data[offset:offset+8*historyLength])
+				offset += 8*historyLength
+			gestureEvent = MouseGestureEvent(Point(x, y), time, button, history)
+		else:
+			keyLength, = struct.unpack_from(_KEY_FORMAT, data, offset)
+			offset += struct.calcsize(_KEY_FORMAT)
+			key = data[offset:offset+keyLength]	# left as a UTF-8 string, like the key names from GTK
+			offset += keyLength
+			gestureEvent = KeyboardGestureEvent(time, key)
+		records.append((frameIndex, gestureType, gestureEvent))
+	return records
+
+
+class GestureReplay(object):
+	"""
+	Feeds the gestures from a log written by L{GestureRecorder} back into a L{GestureDispatch}, each in the same frame (relative to the start of the replay) in which it was recorded. Normally used via L{GestureDispatch.startReplayingGestures}; while it runs, the L{Director} advances by exactly one animation interval per frame so that the replay does not depend on how fast the machine is.
+	"""
+	def __init__(self, path):
+		"""
+		Initialization method. Reads the whole log.
+
+		@param path: The filepath of the log.
+		@type path: C{string}
+		"""
+		self._records = readGestureLog(path)
+		self._index = 0	# the next record to post
+		self._firstFrameIndex = None	# the frame index (of the GestureDispatch) at which the replay started
+
+	def postGestureEventsForFrame(self, gestureDispatch, frameIndex):
+		"""
+		Posts all gestures which were recorded in the given frame to the GestureDispatch's queue.
+
+		@param gestureDispatch: The GestureDispatch.
+		@type gestureDispatch: L{GestureDispatch}
+		@param frameIndex: The GestureDispatch's current frame index.
+		@type frameIndex: Non-negative C{int}
+		"""
+		if self._firstFrameIndex is None:
+			self._firstFrameIndex = frameIndex
+			if len(self._records) > 0:
+				self._firstFrameIndex -= self._records[0][0]	# start with the first recorded frame
+		while self._index < len(self._records) and self._records[self._index][0] + self._firstFrameIndex <= frameIndex:
+			recordedFrameIndex, gestureType, gestureEvent = self._records[self._index]
+			gestureDispatch.postGestureEvent(gestureType, gestureEvent)
+			self._index += 1
+
+	def isFinished(self):
+		"""
+		Returns whether or not every gesture in the log has been posted.
+
+		@return: Whether or not the replay is finished.
+		@rtype: C{bool}
+		"""
+		return self._index >= len(self._records)
+
+
+class FrameStats(object):
+	"""
+	Collects how long each frame takes to update (dispatching input, ticking the L{Scheduler}, and so on) and to draw. The L{Director} keeps one, available via L{Director.getFrameStats}, which only collects timings while L{Director.isCollectingFrameStats} is C{True}.
+
+	Only the timings of the most recent L{getMaximumFrameCount} frames are kept, so collecting for a long time does not use more and more memory.
+	"""
+	def __init__(self, maximumFrameCount=3600):
+		"""
+		Initialization method.
+
+		@param maximumFrameCount: The number of most recent frames whose timings are kept. Default is C{3600} (one minute at 60 frames per second).
+		@type maximumFrameCount: Positive C{int}
+		"""
+		self._maximumFrameCount = max(1, maximumFrameCount)
+		self.reset()
+
+	def reset(self):
+		"""
+		Discards all collected timings.
+		"""
+		self._updateDurations = deque(maxlen=self._maximumFrameCount)	# the oldest durations are dropped once it is full
+		self._drawDurations = deque(maxlen=self._maximumFrameCount)
+
+	def getMaximumFrameCount(self):
+		"""
+		Returns the number of most recent frames whose timings are kept. Default is C{3600}.
+
+		@return: The maximum number of frames.
+		@rtype: C{int}
+		"""
+		return self._maximumFrameCount
+
+	def setMaximumFrameCount(self, maximumFrameCount):
+		"""
+		Sets the number of most recent frames whose timings are kept. If more frames than this have been collected, the oldest ones are discarded.
+
+		@param maximumFrameCount: The maximum number of frames.
+		@type maximumFrameCount: Positive C{int}
+		"""
+		self._maximumFrameCount = max(1, maximumFrameCount)
+		self._updateDurations = deque(self._updateDurations, maxlen=self._maximumFrameCount)
+		self._drawDurations = deque(self._drawDurations, maxlen=self._maximumFrameCount)
+
+	maximumFrameCount = property(getMaximumFrameCount, setMaximumFrameCount, doc="The number of most recent frames whose timings are kept.")
+
+	def addUpdateDuration(self, duration):
+		"""
+		Records how long a frame took to update.
+
+		@param duration: The duration, in seconds.
+		@type duration: C{float}
+		"""
+		self._updateDurations.append(duration)
+
+	def addDrawDuration(self, duration):
+		"""
+		Records how long a frame took to draw.
+
+		@param duration: The duration, in seconds.
+		@type duration: C{float}
+		"""
+		self._drawDurations.append(duration)
+
+	def getFrameCount(self):
+		"""
+		Returns the number of frames whose update timings are currently kept, i.e. the number of frames which have been updated since the stats were last reset, up to L{getMaximumFrameCount}.
+
+		@return: The number of frames.
+		@rtype: C{int}
+		"""
+		return len(self._updateDurations)
+
+	frameCount = property(getFrameCount, doc="Read-only access to the number of frames which have been updated.")
+
+	def getUpdateSummary(self):
+		"""
+		Returns statistics about how long frames took to update. See L{getDrawSummary} for the format.
+
+		@return: The statistics.
+		@rtype: C{dict}
+		"""
+		return _summarize(self._updateDurations)
+
+	def getDrawSummary(self):
+		"""
+		Returns statistics about how long the kept frames took to draw, as a dictionary with the keys C{"count"}, C{"mean"}, C{"minimum"}, C{"maximum"}, C{"median"} and C{"95th"} (the 95th percentile). All durations are in seconds, and they are all C{0.0} if no frames have been recorded.
+
+		@return: The statistics.
+		@rtype: C{dict}
+		"""
+		return _summarize(self._drawDurations)
+
+
+def _summarize(durations):
+	count = len(durations)
+	if count < 1:
+		return {"count": 0, "mean": 0.0, "minimum": 0.0, "maximum": 0.0, "median": 0.0, "95th": 0.0}
+	ordered = sorted(durations)
+	return {"count": count, "mean": sum(ordered)/count, "minimum": ordered[0], "maximum": ordered[-1], "median": ordered[count//2], "95th": ordered[min(int(count*0.95), count-1)]}
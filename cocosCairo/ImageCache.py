@@ -0,0 +1,329 @@
+"""
+Shares decoded images between Sprites and packs small images into texture atlases.
+"""
+
+from Geometry import *
+
+import gtk
+import cairo
+
+import os
+from collections import OrderedDict
+
+class ImageCache(object):
+	"""
+	A cache of decoded images, keyed by their file paths, which hands out shared C{cairo.ImageSurface}C{s}. Every L{Sprite} loads its image through the cache returned by L{SharedImageCache}, so creating many Sprites from the same file only decodes the file once.
+
+	Images are decoded into cairo's native premultiplied ARGB32 format when they are loaded, so drawing them never requires a conversion. Downscaled copies (mipmaps) can also be requested via L{getMipmaps} for images that are usually drawn scaled down.
+
+	A cached image is reloaded if its file has been modified since it was decoded. When the total size of the cached images exceeds L{getMaximumBytes}, the least recently used images are evicted (Sprites which are still using an evicted image keep their own reference to it).
+	"""
+	def __init__(self, maximumBytes=64*1024*1024):
+		"""
+		Initialization method.
+
+		@param maximumBytes: The maximum number of bytes of image data to keep in the cache. Default is 64 MB.
+		@type maximumBytes: Non-negative C{int}
+		"""
+		self._maximumBytes = maximumBytes
+		self._entries = OrderedDict()	# each key is an absolute path, and each value is [mtime, surface, numberOfBytes, mipmaps]. Ordered from least to most recently used.
+		self._totalBytes = 0
+
+#{ Accessor methods.
+	def getMaximumBytes(self):
+		"""
+		Returns the maximum number of bytes of image data that the cache will hold.
+
+		@return: The maximum number of bytes.
+		@rtype: C{int}
+		"""
+		return self._maximumBytes
+
+	def setMaximumBytes(self, maximumBytes):
+		"""
+		Sets the maximum number of bytes of image data that the cache will hold. If the cache currently holds more than this, the least recently used images are evicted immediately.
+
+		@param maximumBytes: The maximum number of bytes.
+		@type maximumBytes: Non-negative C{int}
+		"""
+		self._maximumBytes = maximumBytes
+		self._evict()
+
+	maximumBytes = property(getMaximumBytes, setMaximumBytes, doc="The maximum number of bytes of image data that the cache will hold.")
+
+	def getTotalBytes(self):
+		"""
+		Returns the number of bytes of image data currently held by the cache.
+
+		@return: The number of bytes.
+		@rtype: C{int}
+		"""
+		return self._totalBytes
+
+	totalBytes = property(getTotalBytes, doc="Read-only access to the number of bytes of image data currently held by the cache.")
+#}
+
+
+#{ Cache methods.
+	def getSurface(self, imageName):
+		"""
+		Returns the shared surface for an image file, decoding the file first if it is not cached or if it has changed on disk. The returned surface should not be drawn onto since it is shared.
+
+		@param imageName: The filepath to the image.
+		@type imageName: C{string}
+		@return: The decoded image.
+		@rtype: C{cairo.ImageSurface}
+		"""
+		key = os.path.abspath(imageName)
+		mtime = os.path.getmtime(key)
+		entry = self._entries.get(key)
+		if entry is not None:
+			del self._entries[key]
+			if entry[0] == mtime:
+				self._entries[key] = entry	# move it to the most recently used end
+				return entry[1]
+			self._totalBytes -= entry[2]
+		surface = self._loadSurface(key)
+		numberOfBytes = surface.get_stride() * surface.get_height()
+		self._entries[key] = [mtime, surface, numberOfBytes, None]
+		self._totalBytes += numberOfBytes
+		self._evict()
+		return surface
+
+	def getMipmaps(self, imageName):
+		"""
+		Returns the downscaled copies of an image, each roughly half the size of the one before it (see L{makeMipmaps}). They are generated the first time they are requested and are then shared like the image itself.
+
+		@param imageName: The filepath to the image.
+		@type imageName: C{string}
+		@return: The downscaled copies, largest first (not including the full-size image).
+		@rtype: C{list of cairo.ImageSurfaces}
+		"""
+		surface = self.getSurface(imageName)
+		entry = self._entries[os.path.abspath(imageName)]
+		if entry[3] is None:
+			entry[3] = makeMipmaps(surface)
+			numberOfBytes = sum([level.get_stride() * level.get_height() for level in entry[3]])
+			entry[2] += numberOfBytes
+			self._totalBytes += numberOfBytes
+			self._evict()
+		return entry[3]
+
+	def addSurface(self, imageName, surface):
+		"""
+		Adds an already-decoded surface to the cache (for example, one decoded on another thread) as though it had been loaded by L{getSurface}.
+
+		@param imageName: The filepath of the image.
+		@type imageName: C{string}
+		@param surface: The decoded image.
+		@type surface: C{cairo.ImageSurface}
+		"""
+		self.removeSurface(imageName)
+		key = os.path.abspath(imageName)
+		numberOfBytes = surface.get_stride() * surface.get_height()
+		self._entries[key] = [os.path.getmtime(key), surface, numberOfBytes, None]
+		self._totalBytes += numberOfBytes
+		self._evict()
+
+	def hasSurface(self, imageName):
+		"""
+		Returns whether or not an image is currently cached (regardless of whether or not its file has since changed).
+
+		@param imageName: The filepath to the image.
+		@type imageName: C{string}
+		@return: Whether or not the image is cached.
+		@rtype: C{bool}
+		"""
+		return os.path.abspath(imageName) in self._entries
+
+	def removeSurface(self, imageName):
+		"""
+		Removes an image from the cache if it is cached.
+
+		@param imageName: The filepath to the image.
+		@type imageName: C{string}
+		"""
+		key = os.path.abspath(imageName)
+		if key in self._entries:
+			self._totalBytes -= self._entries[key][2]
+			del self._entries[key]
+
+	def removeAllSurfaces(self):
+		"""
+		Removes all images from the cache.
+		"""
+		self._entries = OrderedDict()
+		self._totalBytes = 0
+#}
+
+
+#{ Private methods.
+	def _evict(self):
+		"""
+		Private method. Removes the least recently used images until the cache is within its byte limit. The most recently used image is always kept.
+		"""
+		while self._totalBytes > self._maximumBytes and len(self._entries) > 1:
+			key, entry = self._entries.popitem(last=False)
+			self._totalBytes -= entry[2]
+
+	def _loadSurface(self, path):
+		"""
+		Private method. Decodes an image file into a new C{cairo.ImageSurface}.
+		"""
+		return loadImageSurface(path)
+#}
+
+
+class TextureAtlas(object):
+	"""
+	Packs many small images into a single C{cairo.ImageSurface}. A L{Sprite} can then display one of the packed images via L{Sprite.setAtlasImage}, so that many different Sprites share one surface.
+	"""
+	def __init__(self, imageNames, maximumWidth=1024, padding=1):
+		"""
+		Initialization method. The images are packed in rows ("shelves") from tallest to shortest.
+
+		@param imageNames: The filepaths of the images to pack.
+		@type imageNames: C{list of strings}
+		@param maximumWidth: The maximum width of the atlas. Images wider than this get a row of their own.
+		@type maximumWidth: Positive C{int}
+		@param padding: The number of empty pixels between images, which prevents neighbouring images from bleeding into each other when scaled.
+		@type padding: Non-negative C{int}
+		"""
+		imageCache = SharedImageCache()
+		surfaces = {}
+		for imageName in imageNames:
+			surfaces[imageName] = imageCache.getSurface(imageName)
+		order = sorted(surfaces.keys(), key=lambda name: surfaces[name].get_height(), reverse=True)
+
+		self._rects = {}	# each key is an image name, and each value is the Rect of the image within the atlas
+		x = 0
+		y = 0
+		shelfHeight = 0
+		width = 0
+		for imageName in order:
+			w = surfaces[imageName].get_width()
+			h = surfaces[imageName].get_height()
+			if x > 0 and x + w > maximumWidth:	# start a new shelf
+				x = 0
+				y += shelfHeight + padding
+				shelfHeight = 0
+			self._rects[imageName] = MakeRect(x, y, w, h)
+			x += w + padding
+			shelfHeight = max(shelfHeight, h)
+			width = max(width, x - padding)
+		height = y + shelfHeight
+
+		self._surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(width, 1), max(height, 1))
+		context = cairo.Context(self._surface)
+		context.set_operator(cairo.OPERATOR_SOURCE)
+		for imageName in order:
+			point = self._rects[imageName].point
+			context.set_source_surface(surfaces[imageName], point.x, point.y)
+			context.paint()
+
+#{ Accessor methods.
+	def getSurface(self):
+		"""
+		Returns the surface containing all of the packed images.
+
+		@return: The atlas surface.
+		@rtype: C{cairo.ImageSurface}
+		"""
+		return self._surface
+
+	surface = property(getSurface, doc="Read-only access to the surface containing all of the packed images.")
+
+	def getImageNames(self):
+		"""
+		Returns the filepaths of all of the packed images.
+
+		@return: The filepaths.
+		@rtype: C{list of strings}
+		"""
+		return self._rects.keys()
+
+	imageNames = property(getImageNames, doc="Read-only access to the filepaths of all of the packed images.")
+
+	def getRectForImage(self, imageName):
+		"""
+		Returns where an image is located within the atlas (or C{None} if it was not packed into this atlas).
+
+		@param imageName: The filepath of the image.
+		@type imageName: C{string}
+		@return: The image's location.
+		@rtype: L{Rect} (or C{None})
+		"""
+		if imageName not in self._rects:
+			return None
+		return self._rects[imageName].copy()
+#}
+
+
+def loadImageSurface(imageName):
+	"""
+	Decodes an image file into a new C{cairo.ImageSurface} without going through the cache. PNG files are decoded by cairo directly; all other formats go through a C{gtk.gdk.Pixbuf}. This does not touch any shared state, so it may be called from any thread (see L{AssetLoader}).
+
+	@param imageName: The filepath to the image.
+	@type imageName: C{string}
+	@return: The decoded image.
+	@rtype: C{cairo.ImageSurface}
+	"""
+	if imageName.lower().endswith(".png"):
+		return cairo.ImageSurface.create_from_png(imageName)
+	return surfaceFromPixbuf(gtk.gdk.pixbuf_new_from_file(imageName))
+
+def surfaceFromPixbuf(pixbuf):
+	"""
+	Converts a C{gtk.gdk.Pixbuf} into a new C{cairo.ImageSurface} in cairo's native (premultiplied ARGB32) format.
+
+	@param pixbuf: The pixbuf.
+	@type pixbuf: C{gtk.gdk.Pixbuf}
+	@return: The new surface.
+	@rtype: C{cairo.ImageSurface}
+	"""
+	surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, pixbuf.get_width(), pixbuf.get_height())
+	context = gtk.gdk.CairoContext(cairo.Context(surface))
+	context.set_source_pixbuf(pixbuf, 0, 0)
+	context.set_operator(cairo.OPERATOR_SOURCE)
+	context.paint()
+	return surface
+
+def makeMipmaps(surface, minimumSize=8):
+	"""
+	Returns successively downscaled copies of a surface, each half the width and height of the one before it, stopping before either dimension would drop below C{minimumSize}.
+
+	@param surface: The full-size image.
+	@type surface: C{cairo.ImageSurface}
+	@param minimumSize: The smallest width or height of a copy.
+	@type minimumSize: Positive C{int}
+	@return: The downscaled copies, largest first.
+	@rtype: C{list of cairo.ImageSurfaces}
+	"""
+	levels = []
+	source = surface
+	width = surface.get_width() // 2
+	height = surface.get_height() // 2
+	while width >= minimumSize and height >= minimumSize:
+		level = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+		context = cairo.Context(level)
+		context.scale(float(width)/source.get_width(), float(height)/source.get_height())
+		context.set_source_surface(source, 0, 0)
+		context.get_source().set_filter(cairo.FILTER_GOOD)
+		context.set_operator(cairo.OPERATOR_SOURCE)
+		context.paint()
+		levels.append(level)
+		source = level
+		width = width // 2
+		height = height // 2
+	return levels
+
+_sharedImageCache = ImageCache()
+
+def SharedImageCache():
+	"""
+	Returns the process-wide L{ImageCache} used by all L{Sprite}C{s}.
+
+	@return: The shared image cache.
+	@rtype: L{ImageCache}
+	"""
+	return _sharedImageCache
@@ -16,10 +16,16 @@ _WEIGHT_DICT = { \
 "bold": cairo.FONT_WEIGHT_BOLD \
 }
 
+_measuringContext = None	# an offscreen context used to create scaled fonts outside of the drawing method
+
 class Label(Node):
 	"""
-	Renders text to the screen. Note that the Label's rect is only an approximation of the text's area.
+	Renders text to the screen. The Label's size is the measured advance width of the text and the height of the font (its ascent plus descent).
+
+	The font and the positions of the glyphs are computed only when the text or font changes, so drawing an unchanged Label does not select fonts or lay out text.
 	"""
+	_isApplyingDrawOpacity = True
+
 	def __init__(self, text="", position=None, color=None, isAnimated=False):
 		"""
 		Initialization method.
@@ -46,6 +52,9 @@ class Label(Node):
 		self._isBold = False
 		self._isAnimated = isAnimated
 		self._displayText = ""
+		self._scaledFont = None	# built the first time it is needed after the font changes
+		self._glyphs = None	# the positioned glyphs of the displayed text, or None if they must be rebuilt (or cannot be built by this version of pycairo)
+		self._advance = 0.0	# the x position after the last displayed glyph
 		if self._isAnimated:
 			self._setDisplayText("")
 		else:
@@ -78,17 +87,79 @@ class Label(Node):
 				continue
 			else:
 				break
-		self._setDisplayText(self._displayText + newString)
+		self._appendDisplayText(newString)
 		if self._displayText == self._text:
 			self.stop()
 
 	def _setDisplayText(self, text):
 		self._displayText = text
+		self._glyphs = []
+		self._advance = 0.0
+		self._appendGlyphs(text)
+		self._updateSize()
+
+	def _appendDisplayText(self, text):
+		"""
+		Private method. Adds text to the end of the displayed text, measuring and laying out only the added text.
+		"""
+		self._displayText += text
+		self._appendGlyphs(text)
 		self._updateSize()
 
+	def _appendGlyphs(self, text):
+		"""
+		Private method. Lays out the glyphs for text which is added to the end of the displayed text.
+		"""
+		if len(text) < 1:
+			return
+		scaledFont = self._getScaledFont()
+		if self._glyphs is not None and hasattr(scaledFont, "text_to_glyphs"):
+			self._glyphs.extend(scaledFont.text_to_glyphs(self._advance, self._getBaseline(), text, False))
+		else:
+			self._glyphs = None	# draw falls back to show_text
+		self._advance += scaledFont.text_extents(text)[4]
+
 	def _updateSize(self):
-		size = Size(self._fontSize*len(self._displayText)*.5, self._fontSize*1.33)
-		self.setSize(size)
+		ascent, descent = self._getScaledFont().extents()[:2]
+		self.setSize(Size(self._advance, ascent + descent))
+
+	def _getBaseline(self):
+		"""
+		Private method. Returns the y position of the text's baseline within the Label.
+		"""
+		return self._getScaledFont().extents()[0]
+
+	def _getScaledFont(self):
+		"""
+		Private method. Returns the scaled font for the Label's font family, size, slant and weight, creating it if the font has changed.
+		"""
+		global _measuringContext
+		if self._scaledFont is None:
+			if _measuringContext is None:
+				_measuringContext = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+			_measuringContext.select_font_face(self._fontFamily, self._getSlantFlag(), self._getWeightFlag())
+			_measuringContext.set_font_size(self._fontSize)
+			self._scaledFont = _measuringContext.get_scaled_font()
+		return self._scaledFont
+
+	def _getSlantFlag(self):
+		if self._isItalic:
+			return _SLANT_DICT["italic"]
+		else:
+			return _SLANT_DICT["normal"]
+
+	def _getWeightFlag(self):
+		if self._isBold:
+			return _WEIGHT_DICT["bold"]
+		else:
+			return _WEIGHT_DICT["normal"]
+
+	def _fontChanged(self):
+		"""
+		Private method called whenever the font changes to re-measure and re-lay out the displayed text.
+		"""
+		self._scaledFont = None
+		self._setDisplayText(self._displayText)
 
 	def getOpacity(self):
 		return self._color.a
@@ -137,8 +208,9 @@ class Label(Node):
 		@param fontSize: The font size.
 		@type fontSize: Non-negative C{float}
 		"""
-		self._fontSize = fontSize
-		self._updateSize()
+		if self._fontSize != fontSize:
+			self._fontSize = fontSize
+			self._fontChanged()
 
 	fontSize = property(getFontSize, setFontSize, doc="The font size for the Label.")
 
@@ -158,7 +230,9 @@ class Label(Node):
 		@param fontFamily: The font family used in rendering.
 		@type fontFamily: C{string}
 		"""
-		self._fontFamily = fontFamily
+		if self._fontFamily != fontFamily:
+			self._fontFamily = fontFamily
+			self._fontChanged()
 
 	fontFamily = property(getFontFamily, setFontFamily, doc="The font family for the Label.")
 
@@ -178,7 +252,9 @@ class Label(Node):
 		@param isItalic: Whether or not the text will be italicized.
 		@type isItalic: C{bool}
 		"""
-		self._isItalic = isItalic
+		if self._isItalic != isItalic:
+			self._isItalic = isItalic
+			self._fontChanged()
 
 	italic = property(isItalic, setItalic, doc="Whether or not the text will be italicized.")
 
@@ -198,23 +274,21 @@ class Label(Node):
 		@param isBold: Whether or not the text will be bolded.
 		@type isBold: C{bool}
 		"""
-		self._isBold = isBold
+		if self._isBold != isBold:
+			self._isBold = isBold
+			self._fontChanged()
 
 	bold = property(isBold, setBold, doc="Whether or not the text will be bolded.")
 #}
 
 	def draw(self, context):
 		color = self.color
-		context.set_source_rgba(color.r, color.g, color.b, color.a)
-		if self._isItalic:
-			slantFlag = _SLANT_DICT["italic"]
-		else:
-			slantFlag = _SLANT_DICT["normal"]
-		if self._isBold:
-			boldFlag = _WEIGHT_DICT["bold"]
-		else:
-			boldFlag = _WEIGHT_DICT["normal"]
-		context.select_font_face(self._fontFamily, slantFlag, boldFlag)
-		context.set_font_size(self._fontSize)
-		context.move_to(0, self._fontSize*1.33)
-		context.show_text(self._displayText)
+		context.set_source_rgba(color.r, color.g, color.b, color.a*self._drawOpacity)
+		if self._glyphs is not None:
+			context.set_scaled_font(self._getScaledFont())
+			context.show_glyphs(self._glyphs)
+		else:	# older versions of pycairo cannot convert text to glyphs
+			context.select_font_face(self._fontFamily, self._getSlantFlag(), self._getWeightFlag())
+			context.set_font_size(self._fontSize)
+			context.move_to(0, self._getBaseline())
+			context.show_text(self._displayText)
@@ -2,21 +2,116 @@
 A mixin which provides listenable methods to an object.
 """
 
+from collections import OrderedDict
+
+class ListenerSet(object):
+	"""
+	An ordered set of listeners. Adding, removing and checking for a listener take constant time, and listeners are kept in the order in which they were added.
+
+	Iterating over a ListenerSet iterates over a snapshot of it, so listeners may safely be added or removed while it is being iterated over (e.g. by a listener which removes itself while being notified); such changes take effect the next time it is iterated over. The snapshot is only rebuilt after the set has changed, so repeatedly iterating over an unchanged set does not copy it.
+	"""
+	def __init__(self, listeners=None):
+		"""
+		Initialization method.
+
+		@param listeners: The initial listeners. Default is C{None}.
+		@type listeners: C{iterable} (or C{None})
+		"""
+		self._listeners = OrderedDict()	# each key is a listener; the values are unused
+		self._snapshot = ()	# the listeners as a tuple, or None if the set has changed since it was last built
+		if listeners is not None:
+			self.addAll(listeners)
+
+	def add(self, listener):
+		"""
+		Adds a listener if it is not already in the set.
+
+		@param listener: The listener.
+		@type listener: C{object}
+		"""
+		if listener not in self._listeners:
+			self._listeners[listener] = None
+			self._snapshot = None
+
+	def addAll(self, listeners):
+		"""
+		Adds several listeners at once, in order, skipping those already in the set.
+
+		@param listeners: The listeners.
+		@type listeners: C{iterable}
+		"""
+		for listener in listeners:
+			if listener not in self._listeners:
+				self._listeners[listener] = None
+				self._snapshot = None
+
+	def remove(self, listener):
+		"""
+		Removes a listener if it is in the set.
+
+		@param listener: The listener.
+		@type listener: C{object}
+		"""
+		if listener in self._listeners:
+			del self._listeners[listener]
+			self._snapshot = None
+
+	def removeAll(self, listeners):
+		"""
+		Removes several listeners at once, skipping those not in the set.
+
+		@param listeners: The listeners.
+		@type listeners: C{iterable}
+		"""
+		for listener in listeners:
+			if listener in self._listeners:
+				del self._listeners[listener]
+				self._snapshot = None
+
+	def clear(self):
+		"""
+		Removes all listeners.
+		"""
+		if len(self._listeners) > 0:
+			self._listeners = OrderedDict()
+			self._snapshot = ()
+
+	def getSnapshot(self):
+		"""
+		Returns the listeners, in the order in which they were added. The returned tuple is not affected by later changes to the set.
+
+		@return: The listeners.
+		@rtype: C{tuple}
+		"""
+		if self._snapshot is None:
+			self._snapshot = tuple(self._listeners)
+		return self._snapshot
+
+	def __contains__(self, listener):
+		return listener in self._listeners
+
+	def __len__(self):
+		return len(self._listeners)
+
+	def __iter__(self):
+		return iter(self.getSnapshot())
+
+
 class ListenedObject:
 	"""
-	A mixin which provides convenience methods for storing, adding, and removing L{AbstractListener}C{s} to an object.
+	A mixin which provides convenience methods for storing, adding, and removing L{AbstractListener}C{s} to an object. The listeners are kept in a L{ListenerSet}, so listeners may add or remove listeners while they are being notified.
 	"""
 	def __init__(self):
-		self._listeners = []
+		self._listeners = ListenerSet()
 
 	def getListeners(self):
 		"""
-		Returns the list of listeners.
+		Returns the listeners, in the order in which they were added. The returned tuple is not affected by later changes to the listeners.
 
-		@return: A list of L{AbstractListener}C{s}.
-		@rtype: C{list}
+		@return: A tuple of L{AbstractListener}C{s}.
+		@rtype: C{tuple}
 		"""
-		return self._listeners
+		return self._listeners.getSnapshot()
 
 	def addListener(self, listener):
 		"""
@@ -25,8 +120,7 @@ class ListenedObject:
 		@param listener: A new listener.
 		@type listener: L{AbstractListener}
 		"""
-		if not listener in self._listeners:
-			self._listeners.append(listener)
+		self._listeners.add(listener)
 
 	def removeListener(self, listener):
 		"""
@@ -35,5 +129,15 @@ class ListenedObject:
 		@param listener: The listener to be removed.
 		@type listener: L{AbstractListener}
 		"""
-		if listener in self._listeners:
-			self._listeners.remove(listener)
+		self._listeners.remove(listener)
+
+	def hasListener(self, listener):
+		"""
+		Returns whether or not a listener is currently listening.
+
+		@param listener: The listener.
+		@type listener: L{AbstractListener}
+		@return: Whether or not the listener is listening.
+		@rtype: C{bool}
+		"""
+		return listener in self._listeners
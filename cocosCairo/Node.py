@@ -6,10 +6,16 @@ from Geometry import *
 from Color import *
 
 from Timer import *
+from Scheduler import *
+from ActionManager import *
 from AbstractModel import *
+from ListenedObject import *
 
+import cairo
 import warnings
 
+_transformVersion = 0	# incremented whenever the geometry, visibility or parenting of any Node changes (see Node._getTransformVersion)
+
 # TODO: add a convenience method to get and set the absolute position (that is, relative to the top-left of the screen).
 # TODO: possibly add some translation stuff so that the origin is at the bottom-left (and NOT top-left) of the screen.
 
@@ -19,6 +25,8 @@ class Node(object, ModelListener):
 
 	Note that the position is set relative to the Node's parent. If the Node's parent is the L{Director}, the position is relative to the top-left corner of the screen (in general, this should only apply to L{Scene}C{s}).
 	"""
+	_isApplyingDrawOpacity = False	# whether draw() multiplies what it draws by self._drawOpacity; subclasses which do so set this to True so that a translucent Node need not be composited as a group
+
 	def __init__(self, rect=None):
 		"""
 		Initialization method.
@@ -38,6 +46,7 @@ class Node(object, ModelListener):
 		self._zOrder = 0
 		self._isVisible = True
 		self._backgroundColor = ClearColor()
+		self._hasVisibleBackground = False	# whether _visit needs to fill the background at all
 
 		self._rotation = 0.0
 		self._scaleX = 1.0
@@ -51,16 +60,22 @@ class Node(object, ModelListener):
 		self._isRunning = False
 		self._controller = None
 		self._color = ClearColor()	# convenience color for subclasses that use foreground coloring
-		self._opacity = 1.0		# used by subclasses that support opacity
+		self._opacity = 1.0		# applied to the whole subtree; see setOpacity
+		self._drawOpacity = 1.0	# the opacity draw() should apply itself; 1.0 while the subtree is composited as a group
 		self._scheduledTimers = {}
+		self._ownScheduler = None	# see setUsingOwnScheduler
+		self._ownActionManager = None
+		self._parentScheduler = None	# the Scheduler in which _ownScheduler is nested while the Node is running
+		self._scheduler = None	# the Scheduler in which this Node's timers are scheduled while it is running
+		self._actionManager = None	# the ActionManager which holds this Node's Actions
 
-		self._gestureListeners = []
+		self._gestureListeners = ListenerSet()
 		self._controllers = []	# there may be GestureListeners that are not Controllers
 
 #{ Appearance methods.
 	def getOpacity(self):
 		"""
-		Returns the opacity for Node subclasses that use it. Default is C{1.0}.
+		Returns the opacity of this Node and its children. Default is C{1.0}.
 
 		@return: The opacity.
 		@rtype: C{float}
@@ -69,14 +84,16 @@ class Node(object, ModelListener):
 
 	def setOpacity(self, opacity):
 		"""
-		Sets the opacity for Node subclasses that use it. This should be set between C{0.0} (fully transparent) and C{1.0} (fully opaque).
+		Sets the opacity of this Node and its children. This should be set between C{0.0} (fully transparent) and C{1.0} (fully opaque). While the opacity is C{0.0}, neither this Node nor its children are drawn.
+
+		If more than one thing draws within the Node (the Node itself and its visible children), the whole subtree is drawn to an offscreen group which is then painted with the opacity, so fading a parent (e.g. with L{FadeIn}) fades everything beneath it at once. Otherwise, the opacity is pushed down without grouping: a Node which only draws itself draws its background with the opacity, and subclasses that support opacity (such as L{Sprite}) apply it in L{draw}; a Node with a single drawing child passes the opacity on to that child. Note that some subclasses (such as the L{Primitive} Nodes) override this method to change their color's alpha value instead.
 
 		@param opacity: The opacity.
 		@type opacity: C{float}
 		"""
 		self._opacity = opacity
 
-	opacity = property(getOpacity, setOpacity, doc="The opacity for Node subclasses that use it.")
+	opacity = property(getOpacity, setOpacity, doc="The opacity of this Node and its children.")
 
 	def getZOrder(self):
 		"""
@@ -95,6 +112,7 @@ class Node(object, ModelListener):
 		@type zOrder: C{int} (or C{float})
 		"""
 		self._zOrder = zOrder
+		self._transformDidChange()
 
 	zOrder = property(getZOrder, setZOrder, doc="The z-order of this current Node in relation to other Nodes.")
 
@@ -115,6 +133,7 @@ class Node(object, ModelListener):
 		@type isVisible: C{bool}
 		"""
 		self._isVisible = isVisible
+		self._transformDidChange()
 
 	visible = property(isVisible, setVisible, doc="Whether or not this node and its children are visible.")
 
@@ -125,7 +144,7 @@ class Node(object, ModelListener):
 		@return: The background color.
 		@rtype: L{Color}
 		"""
-		return self._backgroundColor
+		return self._backgroundColor.copy()
 
 	def setBackgroundColor(self, backgroundColor):
 		"""
@@ -135,6 +154,7 @@ class Node(object, ModelListener):
 		@type backgroundColor: L{Color}
 		"""
 		self._backgroundColor = backgroundColor.copy()
+		self._hasVisibleBackground = self._backgroundColor.a > 0.0
 
 	backgroundColor = property(getBackgroundColor, setBackgroundColor, doc="Background color for the Node.")
 
@@ -155,6 +175,7 @@ class Node(object, ModelListener):
 		@type rotation: C{float}
 		"""
 		self._rotation = rotation
+		self._transformDidChange()
 
 	rotation = property(getRotation, setRotation, doc="The rotation angle of the Node in radians.")
 
@@ -175,6 +196,7 @@ class Node(object, ModelListener):
 		@type scaleX: C{float}
 		"""
 		self._scaleX = scaleX
+		self._transformDidChange()
 
 	scaleX = property(getScaleX, setScaleX, doc="Scale factor for the y-axis.")
 
@@ -195,6 +217,7 @@ class Node(object, ModelListener):
 		@type scaleY: C{float}
 		"""
 		self._scaleY = scaleY
+		self._transformDidChange()
 
 	scaleY = property(getScaleY, setScaleY, doc="Scale factor for the y-axis.")
 
@@ -250,6 +273,7 @@ class Node(object, ModelListener):
 		"""
 		self._scaleX = scale
 		self._scaleY = scale
+		self._transformDidChange()
 
 	scale = property(getScale, setScale, doc="The scale amount for both the x-axis and y-axis.")
 #}
@@ -340,6 +364,7 @@ class Node(object, ModelListener):
 		@param position: L{Point}.
 		'''
 		self._position = position.copy()
+		self._transformDidChange()
 
 	position = property(getPosition, setPosition, doc="The current position of the Node relative to its parent.")
 
@@ -375,6 +400,7 @@ class Node(object, ModelListener):
 		@param size: L{Size}.
 		"""
 		self._size = size.copy()
+		self._transformDidChange()
 		anchorPoint = self._anchorPoint
 		transformAnchor = Point(self._size.width*anchorPoint.x, self._size.height*anchorPoint.y)
 		self.setTransformAnchorPoint(transformAnchor)
@@ -440,6 +466,7 @@ class Node(object, ModelListener):
 		@param anchorPoint: L{Point}, with both C{0 <= x <= 1} and C{0 <= y <= 1}.
 		"""
 		self._transformAnchor = anchorPoint.copy()
+		self._transformDidChange()
 
 	transformAnchorPoint = property(getTransformAnchorPoint, setTransformAnchorPoint, doc="How the Node is transformed relative to its position.")
 #}
@@ -584,6 +611,7 @@ class Node(object, ModelListener):
 		child._parent = None
 		child._setDirector(None)
 		self._children.remove(child)
+		self._transformDidChange()
 #}
 
 
@@ -631,19 +659,19 @@ class Node(object, ModelListener):
 
 	def addGestureListener(self, listener):
 		"""
-		Adds a L{GestureListener} to the Scene, which will be registered to the L{GestureDispatch} when the Scene is entered.
+		Adds a L{GestureListener} to the Node, which will be registered to the L{GestureDispatch} when the Node is entered. The listener receives mouse gestures only while the pointer is over this Node or one of its children (see L{GestureDispatch.addNodeListener}), and it receives all keyboard gestures.
 
 		@param listener: A new listener.
 		@type listener: L{GestureListener}
 		"""
 		if listener not in self._gestureListeners:
-			self._gestureListeners.append(listener)
+			self._gestureListeners.add(listener)
 			if self.getDirector() is not None:
-				self.getDirector().getGestureDispatch().addListener(listener)
+				self.getDirector().getGestureDispatch().addNodeListener(self, listener)
 
 	def removeGestureListener(self, listener):
 		"""
-		Removes a L{GestureListener} to the Scene, which will be unregistered from the L{GestureDispatch} when the Scene is exited.
+		Removes a L{GestureListener} from the Node, which will be unregistered from the L{GestureDispatch}.
 
 		@param listener: The listener to be removed.
 		@type listener: L{GestureListener}
@@ -651,7 +679,7 @@ class Node(object, ModelListener):
 		if listener in self._gestureListeners:
 			self._gestureListeners.remove(listener)
 			if self.getDirector() is not None:
-				self.getDirector().getGestureDispatch().removeListener(listener)
+				self.getDirector().getGestureDispatch().removeNodeListener(self, listener)
 #}
 
 
@@ -664,15 +692,20 @@ class Node(object, ModelListener):
 		"""
 		pass
 
-	def _visit(self, context):
+	def _visit(self, context, inheritedOpacity=1.0):
 		"""
 		Private method that is called by its parent whenever the node (and its children) need to be redrawn. Do not call this method directly as the L{Director} and L{GTKInterface} handle the redrawing.
 
 		@param context: The Cairo context.
+		@param inheritedOpacity: The opacity of an ancestor which was pushed down to this Node rather than composited (see L{setOpacity}). Default is C{1.0}.
+		@type inheritedOpacity: C{float}
 		"""
 		# if this node is not visible, then don't draw this node or any of its children
 		if not self.isVisible():
 			return
+		opacity = self._opacity * inheritedOpacity
+		if opacity <= 0.0:
+			return	# the whole subtree is fully transparent
 
 		# push a new context onto the stack to transform
 		context.save()
@@ -680,27 +713,64 @@ class Node(object, ModelListener):
 		# do any transformations here
 		self._transform(context)
 
+		# a translucent node is drawn offscreen and composited once only if more than one thing draws within it; otherwise its opacity is pushed down to whatever draws
+		isGrouped = False
+		childOpacity = 1.0
+		self._drawOpacity = opacity
+		if opacity < 1.0:
+			if self._hasSeveralDrawingParts():
+				isGrouped = True
+				context.push_group()
+				self._drawOpacity = 1.0
+			else:
+				childOpacity = opacity	# a child applies it in its own _visit
+
 		# first draw any children that are behind this node
 		for child in self._children:
 			if child.getZOrder() < 0:
-				child._visit(context)
+				child._visit(context, childOpacity)
 
 		# then draw this node
-		color = self._backgroundColor
-		context.set_source_rgba(color.r, color.g, color.b, color.a)
-		context.rectangle(0, 0, self._size.width, self._size.height)
-		context.fill()	# first draw the background color
+		if self._hasVisibleBackground:	# a fully transparent background would be a wasted fill
+			color = self._backgroundColor
+			context.set_source_rgba(color.r, color.g, color.b, color.a*self._drawOpacity)
+			context.rectangle(0, 0, self._size.width, self._size.height)
+			context.fill()	# first draw the background color
 		self.draw(context)	# then do any user-defined drawing
 
 		# finally, draw any children parallel or in front of this node
 		for child in self._children:
 			if child.getZOrder() >= 0:
-				child._visit(context)
+				child._visit(context, childOpacity)
+
+		if isGrouped:
+			context.pop_group_to_source()
+			context.paint_with_alpha(opacity)
 
 		# pop the new context off the stack before continuing.
 		context.restore()
 
 
+	def _hasSeveralDrawingParts(self):
+		"""
+		Private method used by C{_visit}. Returns whether or not this translucent Node must be composited as a group: either more than one thing draws within it, counting its background, its own L{draw} and each visible child, or its own L{draw} does not apply C{_drawOpacity} itself.
+		"""
+		count = 0
+		if self._hasVisibleBackground:
+			count = 1
+		if self.__class__.draw.im_func is not Node.draw.im_func:
+			if not self._isApplyingDrawOpacity:
+				return True
+			count += 1
+			if count > 1:
+				return True
+		for child in self._children:
+			if child._isVisible and child._opacity > 0.0:
+				count += 1
+				if count > 1:
+					return True
+		return False
+
 	def _transform(self, context):
 		"""
 		Private method that is called by C{_visit}. Performs transforms onto the current context (e.g. rotation, scaling).
@@ -731,6 +801,22 @@ class Node(object, ModelListener):
 		#elif position.x != 0.0 or position.y != 0.0:
 		#	context.translate(-position.x, -position.y)
 
+	def _getTransformMatrix(self):
+		"""
+		Private method. Returns the transformation which L{_transform} applies, i.e. from this Node's coordinate space into its parent's.
+		"""
+		matrix = cairo.Matrix()
+		offset = self._getTransformOffset()
+		matrix.translate(offset.x, offset.y)
+		if self._rotation != 0.0:
+			matrix.rotate(self._rotation)
+		if self._scaleX != 1.0 or self._scaleY != 1.0:
+			matrix.scale(self._scaleX, self._scaleY)
+		transformAnchor = self.getTransformAnchorPoint()
+		if transformAnchor.x != 0.0 or transformAnchor.y != 0.0:
+			matrix.translate(-transformAnchor.x, -transformAnchor.y)
+		return matrix
+
 	def _getTransformOffset(self):
 		"""
 		Private method for performing a translation on the current context.
@@ -752,14 +838,141 @@ class Node(object, ModelListener):
 #}
 
 
+#{ Hit-testing methods.
+	def convertToNodeSpace(self, point):
+		"""
+		Converts a point from window coordinates (such as L{MouseGestureEvent.point}) into this Node's coordinate space, in which C{Point(0,0)} is the Node's top-left corner, taking into account the positions, rotations and scales of the Node and all of its parents.
+
+		@param point: The point in window coordinates.
+		@type point: L{Point}
+		@return: The point in this Node's coordinate space, or C{None} if the Node is scaled to nothing.
+		@rtype: L{Point} (or C{None})
+		"""
+		matrix = cairo.Matrix()
+		node = self
+		while node is not None:
+			matrix = matrix.multiply(node._getTransformMatrix())	# apply this Node's transformation, then its parent's
+			node = node._parent
+		try:
+			matrix.invert()
+		except cairo.Error:
+			return None
+		x, y = matrix.transform_point(point.x, point.y)
+		return Point(x, y)
+
+	def containsWindowPoint(self, point):
+		"""
+		Returns whether or not a point in window coordinates lies within this Node's bounds (its size, as transformed onto the screen).
+
+		@param point: The point in window coordinates.
+		@type point: L{Point}
+		@return: Whether or not the point is within the Node.
+		@rtype: C{bool}
+		"""
+		localPoint = self.convertToNodeSpace(point)
+		if localPoint is None:
+			return False
+		return 0 <= localPoint.x <= self._size.width and 0 <= localPoint.y <= self._size.height
+
+	def _isHitByWindowPoint(self, point):
+		"""
+		Private method used by the L{GestureDispatch}. Returns whether or not a point in window coordinates lies within this visible Node or any of its visible children.
+		"""
+		if not self._isVisible:
+			return False
+		if self.containsWindowPoint(point):
+			return True
+		for child in self._children:
+			if child._isHitByWindowPoint(point):
+				return True
+		return False
+
+	def _hasHitArea(self):
+		"""
+		Private method used by the L{GestureDispatch}. Returns whether or not this visible Node or any of its visible children has a non-zero width and height, i.e. whether L{_isHitByWindowPoint} can be true for more than a single point.
+		"""
+		if not self._isVisible:
+			return False
+		if self._size.width > 0 and self._size.height > 0:
+			return True
+		for child in self._children:
+			if child._hasHitArea():
+				return True
+		return False
+
+	def _getHitBoundingBox(self):
+		"""
+		Private method used by the L{GestureDispatch}. Returns the bounding box, in window coordinates, of this visible Node and its visible children (i.e. of every point for which L{_isHitByWindowPoint} can be true) as a tuple of the form C{(minX, minY, maxX, maxY)}, or C{None} if the Node is not visible.
+		"""
+		matrix = cairo.Matrix()
+		node = self._parent
+		while node is not None:
+			matrix = matrix.multiply(node._getTransformMatrix())	# apply the parent's transformation, then the grandparent's
+			node = node._parent
+		return self._getSubtreeBoundingBox(matrix)
+
+	def _getSubtreeBoundingBox(self, parentMatrix):
+		"""
+		Private method. Returns the bounding box of this visible Node and its visible children, given the transformation from the parent's coordinate space into window coordinates.
+		"""
+		if not self._isVisible:
+			return None
+		matrix = self._getTransformMatrix().multiply(parentMatrix)
+		width = self._size.width
+		height = self._size.height
+		corners = [matrix.transform_point(x, y) for x, y in ((0, 0), (width, 0), (0, height), (width, height))]
+		minX = min([x for x, y in corners])
+		minY = min([y for x, y in corners])
+		maxX = max([x for x, y in corners])
+		maxY = max([y for x, y in corners])
+		for child in self._children:
+			box = child._getSubtreeBoundingBox(matrix)
+			if box is not None:
+				minX = min(minX, box[0])
+				minY = min(minY, box[1])
+				maxX = max(maxX, box[2])
+				maxY = max(maxY, box[3])
+		return (minX, minY, maxX, maxY)
+
+	def _getTransformVersion(self):
+		"""
+		Private method used by the L{GestureDispatch}. Returns a number which changes whenever the position, size, anchor point, rotation, scale, z-order or visibility of any Node changes, or whenever any Node is added or removed as a child, so that cached hit-testing data can tell when it must be rebuilt.
+		"""
+		return _transformVersion
+
+	def _transformDidChange(self):
+		"""
+		Private method. Records that the geometry, visibility or parenting of a Node has changed (see L{_getTransformVersion}). Subclasses which set the Node's size or position without going through L{setSize} or L{setPosition} must call this.
+		"""
+		global _transformVersion
+		_transformVersion += 1
+
+	def _getDrawingOrder(self):
+		"""
+		Private method. Returns a key which sorts Nodes in the order in which they are drawn by L{_visit}, so that the Node drawn last (i.e. the topmost Node) sorts last.
+		"""
+		key = [(0, 0)]	# the Node itself is drawn after its children with negative zOrders and before the rest
+		node = self
+		while node._parent is not None:
+			if node.getZOrder() < 0:
+				key.insert(0, (-1, node._parent._children.index(node)))
+			else:
+				key.insert(0, (1, node._parent._children.index(node)))
+			node = node._parent
+		return key
+#}
+
+
 #{ Scene management.
 	def onEnter(self):
 		"""
 		Called when this node will first be displayed. Override to have custom behaviors.
 		"""
-		gestureDispatch = self.getDirector().getGestureDispatch()
-		for listener in self._gestureListeners:
-			gestureDispatch.addListener(listener)
+		if self._ownScheduler is not None:
+			self._parentScheduler = self._getParentScheduler()
+			self._parentScheduler.addChildScheduler(self._ownScheduler)
+		if len(self._gestureListeners) > 0:
+			self.getDirector().getGestureDispatch().addNodeListeners(self, self._gestureListeners)
 		for child in self._children:
 			child.onEnter()
 		self.activateTimers()
@@ -776,40 +989,120 @@ class Node(object, ModelListener):
 		"""
 		Called when this node will no longer be displayed. Override to have custom behaviors.
 		"""
-		gestureDispatch = self.getDirector().getGestureDispatch()
-		for listener in self._gestureListeners:
-			gestureDispatch.removeListener(listener)
+		if len(self._gestureListeners) > 0:
+			self.getDirector().getGestureDispatch().removeNodeListeners(self)
 		self.deactivateTimers()
 		self._isRunning = False
 		for child in self._children:
 			child.onExit()
+		if self._parentScheduler is not None:
+			self._parentScheduler.removeChildScheduler(self._ownScheduler)
+			self._parentScheduler = None
 #}
 
 
 #{ Timer methods.
+	def isUsingOwnScheduler(self):
+		"""
+		Returns whether or not this Node has its own L{Scheduler} and L{ActionManager}. Default is C{False}.
+
+		@return: Whether or not the Node has its own Scheduler.
+		@rtype: C{bool}
+		"""
+		return self._ownScheduler is not None
+
+	def setUsingOwnScheduler(self, isUsingOwnScheduler):
+		"""
+		Sets whether or not this Node has its own L{Scheduler} and L{ActionManager}. If so, the timers and L{Action}C{s} of this Node and all of its children run in its own Scheduler, which is nested in the Scheduler of its parent (or the Director's) while the Node is running. The whole subtree can then be slowed down or sped up via the Scheduler's C{timeScale}, or paused via L{Scheduler.setPaused}, without touching any individual timer or Action. For example, each L{Scene} may have its own Scheduler. This cannot be changed while the Node is running.
+
+		@param isUsingOwnScheduler: Whether or not the Node has its own Scheduler.
+		@type isUsingOwnScheduler: C{bool}
+		"""
+		if self._isRunning:
+			warnings.warn("Cannot change whether a Node uses its own Scheduler while it is running.")
+			return
+		if isUsingOwnScheduler and self._ownScheduler is None:
+			self._ownScheduler = Scheduler()
+			self._ownActionManager = ActionManager(self._ownScheduler)
+		elif not isUsingOwnScheduler:
+			self._ownScheduler = None
+			self._ownActionManager = None
+
+	usingOwnScheduler = property(isUsingOwnScheduler, setUsingOwnScheduler, doc="Whether or not this Node has its own Scheduler and ActionManager.")
+
+	def getScheduler(self):
+		"""
+		Returns the L{Scheduler} which runs this Node's timers: its own (see L{setUsingOwnScheduler}), otherwise that of its nearest ancestor which has one, otherwise the Director's. If there is none (i.e. the Node is not in a Scene run by a Director), this returns C{None}.
+
+		@return: The Scheduler.
+		@rtype: L{Scheduler} (or C{None})
+		"""
+		if self._ownScheduler is not None:
+			return self._ownScheduler
+		return self._getParentScheduler()
+
+	def getActionManager(self):
+		"""
+		Returns the L{ActionManager} which runs this Node's L{Action}C{s}: its own (see L{setUsingOwnScheduler}), otherwise that of its nearest ancestor which has one, otherwise the Director's. If there is none, this returns C{None}.
+
+		@return: The ActionManager.
+		@rtype: L{ActionManager} (or C{None})
+		"""
+		node = self
+		while node is not None:
+			if node._ownActionManager is not None:
+				return node._ownActionManager
+			node = node._parent
+		if self._director is not None:
+			return self._director.getActionManager()
+		return None
+
+	def _getParentScheduler(self):
+		"""
+		Private method. Returns the Scheduler of the nearest ancestor which has its own, otherwise the Director's (or C{None}).
+		"""
+		node = self._parent
+		while node is not None:
+			if node._ownScheduler is not None:
+				return node._ownScheduler
+			node = node._parent
+		if self._director is not None:
+			return self._director.getScheduler()
+		return None
+
+	def _getActionManager(self):
+		"""
+		Private method. Returns the ActionManager which runs this Node's Actions, first moving any of its Actions which are still held by a different ActionManager (e.g. if the Node has been moved into a subtree with its own Scheduler).
+		"""
+		actionManager = self.getActionManager()
+		if actionManager is None:
+			return self._actionManager
+		if self._actionManager is not None and self._actionManager is not actionManager:
+			self._actionManager.transferAllActions(self, actionManager)
+		self._actionManager = actionManager
+		return actionManager
+
 	def activateTimers(self):
 		"""
-		Activates any L{Timer}C{s} that this Node has.
+		Activates any L{Timer}C{s} that this Node has, and resumes its L{Action}C{s}. This only touches this Node's own Timers and Actions.
 		"""
-		for callback in self._scheduledTimers:
-			timer = self._scheduledTimers[callback]
-			scheduler = self.getDirector().getScheduler()
-			scheduler.schedule(timer)
-		actionManager = self.getDirector().getActionManager()
-		actionManager.resumeAllActions(self)
+		self._scheduler = self.getScheduler()
+		for timer in self._scheduledTimers.itervalues():
+			self._scheduler.schedule(timer)
+		self._getActionManager().resumeAllActions(self)
 
 	def deactivateTimers(self):
 		"""
-		Deactivates any L{Timer}C{s} that this Node has.
+		Deactivates any L{Timer}C{s} that this Node has, and pauses its L{Action}C{s}. This only touches this Node's own Timers and Actions.
 		"""
-		for callback in self._scheduledTimers:
-			timer = self._scheduledTimers[callback]
-			scheduler = self.getDirector().getScheduler()
-			scheduler.unschedule(timer)
-		actionManager = self.getDirector().getActionManager()
-		actionManager.pauseAllActions(self)
+		if self._scheduler is not None:
+			for timer in self._scheduledTimers.itervalues():
+				self._scheduler.unschedule(timer)
+			self._scheduler = None
+		if self._actionManager is not None:
+			self._actionManager.pauseAllActions(self)
 
-	def scheduleCallback(self, callback, interval=0):
+	def scheduleCallback(self, callback, interval=0, isDriftFree=False):
 		"""
 		Registers a function to be called every C{interval} seconds.
 
@@ -819,19 +1112,57 @@ class Node(object, ModelListener):
 		@type callback: Python C{function}
 		@param interval: How often (in seconds) the C{callback} should be called.
 		@type interval: Non-negative C{float}
+		@param isDriftFree: Whether or not the callback should be called on average exactly once per interval, catching up after long frames (see L{Timer.setDriftFree}). The catch-up limit and the number of skipped calls are available via L{getTimerForScheduledCallback}. Default is C{False}.
+		@type isDriftFree: C{bool}
 		"""
 		if callback in self._scheduledTimers:
 			return
 		if interval < 0.0:
 			return
 
-		timer = Timer(callback, interval)
+		timer = Timer(callback, interval, isDriftFree)
+		if self._isRunning:
+			self._scheduler.schedule(timer)
+
+		self._scheduledTimers[callback] = timer
+
+	def scheduleCallbackOnce(self, callback, delay=0):
+		"""
+		Registers a function to be called once, after C{delay} seconds, after which it is unscheduled automatically. Like other scheduled callbacks, the delay only counts down while this Node is running, and the callback may be cancelled via L{unscheduleCallback}.
+
+		@requires: This method should only be used by a subclass. If you wish to create a timer, see L{Timer} and L{Scheduler}.
+
+		@param callback: The method to be called by the L{Scheduler}.
+		@type callback: Python C{function}
+		@param delay: How long (in seconds) to wait before calling the C{callback}.
+		@type delay: Non-negative C{float}
+		"""
+		if callback in self._scheduledTimers:
+			return
+		if delay < 0.0:
+			return
+
+		def fireOnce(dt):
+			if self._scheduledTimers.get(callback) is timer:
+				del self._scheduledTimers[callback]	# the Scheduler unschedules the Timer itself
+			callback(dt)
+		timer = Timer(fireOnce, delay, isOneShot=True)
 		if self._isRunning:
-			scheduler = self.getDirector().getScheduler()
-			scheduler.schedule(timer)
+			self._scheduler.schedule(timer)
 
 		self._scheduledTimers[callback] = timer
 
+	def getTimerForScheduledCallback(self, callback):
+		"""
+		Returns the L{Timer} which calls a callback scheduled via L{scheduleCallback} or L{scheduleCallbackOnce} (or C{None} if the callback is not currently scheduled), e.g. to change its catch-up limit or to check how many calls it skipped.
+
+		@param callback: The scheduled callback.
+		@type callback: C{function}
+		@return: The Timer for the callback.
+		@rtype: L{Timer} (or C{None})
+		"""
+		return self._scheduledTimers.get(callback)
+
 	def unscheduleCallback(self, callback):
 		"""
 		Removes a C{callback} that has been added via L{scheduleCallback}.
@@ -846,8 +1177,7 @@ class Node(object, ModelListener):
 		del self._scheduledTimers[callback]
 
 		if self._isRunning:
-			scheduler = self.getDirector().getScheduler()
-			scheduler.unschedule(timer)
+			self._scheduler.unschedule(timer)
 
 	def getIntervalForScheduledCallback(self, callback):
 		"""
@@ -884,7 +1214,7 @@ class Node(object, ModelListener):
 		Runs an L{Action} on this Node.
 		"""
 		if self.getDirector() is not None:
-			actionManager = self.getDirector().getActionManager()
+			actionManager = self._getActionManager()
 			actionManager.addAction(action, self, (not self._isRunning))
 			return action
 		else:
@@ -894,14 +1224,14 @@ class Node(object, ModelListener):
 		"""
 		Stops all L{Action}C{s} currently running on this Node.
 		"""
-		actionManager = self.getDirector().getActionManager()
+		actionManager = self._getActionManager()
 		actionManager.removeAllActions(self)
 
 	def stopAction(self, action):
 		"""
 		Stops a particular L{Action} currently running on this Node.
 		"""
-		actionManager = self.getDirector().getActionManager()
+		actionManager = self._getActionManager()
 		actionManager.removeAction(action)
 
 	def stopActionByTag(self, tag):
@@ -911,7 +1241,7 @@ class Node(object, ModelListener):
 		@param tag: The tag of the Node.
 		@type tag: C{string}
 		"""
-		actionManager = self.getDirector().getActionManager()
+		actionManager = self._getActionManager()
 		actionManager.removeActionByTag(tag, self)
 
 	def getActionByTag(self, tag):
@@ -923,7 +1253,7 @@ class Node(object, ModelListener):
 		@return: The Action.
 		@rtype: L{Action} (or C{None})
 		"""
-		actionManager = self.getDirector().getActionManager()
+		actionManager = self._getActionManager()
 		return actionManager.getActionByTag(tag, self)
 
 	def numberOfRunningActions(self):
@@ -933,7 +1263,7 @@ class Node(object, ModelListener):
 		@return: Number of running actions.
 		@rtype: C{int}
 		"""
-		actionManager = self.getDirector().getActionManager()
+		actionManager = self._getActionManager()
 		return actionManager.getNumberOfRunningActions(self)
 #}
 
@@ -4,10 +4,13 @@ A Node which renders text to the screen using the Pango library.
 
 import pango
 import pangocairo
+import cairo
 
 from Node import *
 from Color import *
 
+from collections import OrderedDict
+
 _STRETCH_DICT = { \
 -4: pango.STRETCH_ULTRA_CONDENSED, \
 -3: pango.STRETCH_EXTRA_CONDENSED, \
@@ -34,6 +37,103 @@ _ALIGN_DICT = { \
 
 # TODO: add alpha / opacity somehow (doesn't look like pango.Layout + context.show_layout can do it).
 
+class PangoLayoutCache(object):
+	"""
+	A cache of C{pango.Layout}C{s}, keyed by everything which affects how the text is laid out (the markup, font, width, wrapping, alignment, and so on). Every L{PangoLabel} gets its layout through the cache returned by L{SharedPangoLayoutCache}, so identical labels share one layout and the text is only laid out once.
+
+	Layouts are built against an offscreen C{pangocairo.CairoContext} rather than the context being drawn to, so they can be built outside of the drawing method. When the cache holds more than L{getMaximumLayouts} layouts, the least recently used ones are evicted.
+	"""
+	def __init__(self, maximumLayouts=256):
+		"""
+		Initialization method.
+
+		@param maximumLayouts: The maximum number of layouts to keep. Default is C{256}.
+		@type maximumLayouts: Positive C{int}
+		"""
+		self._maximumLayouts = maximumLayouts
+		self._layouts = OrderedDict()	# ordered from least to most recently used
+		self._pangoContext = pangocairo.CairoContext(cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)))
+
+	def getMaximumLayouts(self):
+		"""
+		Returns the maximum number of layouts that the cache will hold.
+
+		@return: The maximum number of layouts.
+		@rtype: C{int}
+		"""
+		return self._maximumLayouts
+
+	def setMaximumLayouts(self, maximumLayouts):
+		"""
+		Sets the maximum number of layouts that the cache will hold. If the cache currently holds more than this, the least recently used layouts are evicted immediately.
+
+		@param maximumLayouts: The maximum number of layouts.
+		@type maximumLayouts: Positive C{int}
+		"""
+		self._maximumLayouts = maximumLayouts
+		self._evict()
+
+	maximumLayouts = property(getMaximumLayouts, setMaximumLayouts, doc="The maximum number of layouts that the cache will hold.")
+
+	def getLayout(self, key, setupFunction):
+		"""
+		Returns the shared layout for a key, building it first if it is not cached. The returned layout should not be modified since it is shared.
+
+		@param key: Everything which affects how the text is laid out.
+		@type key: C{tuple}
+		@param setupFunction: Called with a new, empty C{pango.Layout} to set it up if the layout is not cached.
+		@type setupFunction: C{function}
+		@return: The layout.
+		@rtype: C{pango.Layout}
+		"""
+		layout = self._layouts.pop(key, None)
+		if layout is None:
+			layout = self._pangoContext.create_layout()
+			setupFunction(layout)
+		self._layouts[key] = layout	# (re)insert it at the most recently used end
+		self._evict()
+		return layout
+
+	def createLayout(self, setupFunction):
+		"""
+		Builds a new layout which is not cached or shared, for a label which modifies its layout (see L{PangoLabel.setAlwaysRedrawing}). The layout has its own C{pango.Context}, so modifying it does not affect any shared layout.
+
+		@param setupFunction: Called with the new, empty C{pango.Layout} to set it up.
+		@type setupFunction: C{function}
+		@return: The layout.
+		@rtype: C{pango.Layout}
+		"""
+		layout = self._pangoContext.create_layout()
+		setupFunction(layout)
+		return layout
+
+	def removeAllLayouts(self):
+		"""
+		Removes all layouts from the cache.
+		"""
+		self._layouts = OrderedDict()
+
+	def _evict(self):
+		"""
+		Private method. Removes the least recently used layouts until the cache is within its limit.
+		"""
+		while len(self._layouts) > max(self._maximumLayouts, 1):
+			self._layouts.popitem(last=False)
+
+_sharedPangoLayoutCache = None
+
+def SharedPangoLayoutCache():
+	"""
+	Returns the process-wide L{PangoLayoutCache} used by all L{PangoLabel}C{s}. It is created the first time it is needed.
+
+	@return: The shared layout cache.
+	@rtype: L{PangoLayoutCache}
+	"""
+	global _sharedPangoLayoutCache
+	if _sharedPangoLayoutCache is None:
+		_sharedPangoLayoutCache = PangoLayoutCache()
+	return _sharedPangoLayoutCache
+
 class PangoLabel(Node):
 	"""
 	A L{Node} used to render text to the screen. It is recommended that you do NOT use PangoLabel at this point due to rendering issues.
@@ -70,10 +170,11 @@ class PangoLabel(Node):
 		self._isSingleParagraph = False
 		self._isDirty = True
 		self._isAlwaysRedrawing = False
+		self._layout = None
 
 	def isAlwaysRedrawing(self):
 		"""
-		Whether or not this Node will be redrawn every loop. By default, this is C{False}. This should only be used to fix a Pango rendering bug when the Node is originally rendered at a small scale and then is scaled up.
+		Whether or not this Node will be redrawn every loop. By default, this is C{False}. This should only be used to fix a Pango rendering bug when the Node is originally rendered at a small scale and then is scaled up. Redrawing updates the layout for the current transformation, but does not rebuild it. Since the layout is modified, a label which is always redrawing has its own layout rather than sharing one from the L{PangoLayoutCache}.
 
 		@return: Whether or not this Node will be redrawn every loop.
 		@rtype: C{bool}.
@@ -85,7 +186,9 @@ class PangoLabel(Node):
 		@param isAlwaysRedrawing: Whether or not this Node should redraw every loop.
 		@type isAlwaysRedrawing: C{bool}.
 		"""
-		self._isAlwaysRedrawing = isAlwaysRedrawing
+		if isAlwaysRedrawing != self._isAlwaysRedrawing:
+			self._isAlwaysRedrawing = isAlwaysRedrawing
+			self.dirty()	# switch between a shared and a private layout
 
 	alwaysRendering = property(isAlwaysRedrawing, setAlwaysRedrawing, doc="Whether or not this Node should be redrawn every loop.")
 
@@ -113,7 +216,7 @@ class PangoLabel(Node):
 
 	def setMarkupText(self, markupText):
 		"""
-		Sets the marked-up text to be rendered.
+		Sets the marked-up text to be rendered. Setting the same text again does nothing.
 
 		@param markupText: The marked-up text.
 		@type markupText: C{string}
@@ -422,54 +525,81 @@ class PangoLabel(Node):
 
 	singleParagraph = property(isSingleParagraph, setSingleParagraph, doc="Whether or not the text should be treated as a single paragraph.")
 
+	def getSize(self):
+		"""
+		Returns the size of the laid-out text, laying it out first if any parameters have changed.
+
+		@return: The size of the text.
+		@rtype: L{Size}
+		"""
+		self.updateLayout()
+		return Node.getSize(self)
+
+	size = property(getSize, Node.setSize, doc="The size of the laid-out text.")
+
+	def updateLayout(self):
+		"""
+		Lays out the text if any parameters have changed since it was last laid out, and updates the size of the Node. This is called automatically before the text is drawn (and by L{getSize}), but it may also be called ahead of time so that laying out does not happen while drawing. Labels with the same parameters share one layout (see L{PangoLayoutCache}), unless they are always redrawing (see L{setAlwaysRedrawing}).
+		"""
+		if not self._isDirty and self._layout is not None:
+			return
+		if self._isAlwaysRedrawing:
+			self._layout = SharedPangoLayoutCache().createLayout(self._setupLayout)	# draw() modifies it, so it must not be shared
+		else:
+			key = (self._markupText, self._accelMarker, self._fontFamily, self._fontSize, self._isItalic, self._isSmallCaps, self._fontWeight, self._fontStretch, self._wrappingType, self._width, self._indentation, self._spacing, self._isJustified, self._alignment, self._isSingleParagraph)
+			self._layout = SharedPangoLayoutCache().getLayout(key, self._setupLayout)
+		width, height = self._layout.get_pixel_size()
+		self.setSize(Size(width, height))
+		self._isDirty = False
+
+	def _setupLayout(self, layout):
+		"""
+		Private method. Applies the parameters of the PangoLabel to a new layout.
+		"""
+		if self._accelMarker is not None:
+			layout.set_markup_with_accel(self._markupText, self._accelMarker)
+		else:
+			layout.set_markup(self._markupText)
+		fontDescription = pango.FontDescription()
+		fontDescription.set_size(self._fontSize * pango.SCALE)
+		fontDescription.set_family(self._fontFamily)
+		if self._isItalic:
+			fontDescription.set_style(pango.STYLE_ITALIC)
+		else:
+			fontDescription.set_style(pango.STYLE_NORMAL)
+		if self._isSmallCaps:
+			fontDescription.set_variant(pango.VARIANT_SMALL_CAPS)
+		else:
+			fontDescription.set_variant(pango.VARIANT_NORMAL)
+		fontDescription.set_weight(int(100 + self._fontWeight*800))
+		fontDescription.set_stretch(_STRETCH_DICT[self._fontStretch])
+		layout.set_font_description(fontDescription)
+		if self._wrappingType is "none" or self._width < 0:
+			layout.set_width(-1)
+		elif self._wrappingType is not "none" and self._width >= 0:
+			layout.set_width(self._width*pango.SCALE)
+			layout.set_wrap(_WRAP_DICT[self._wrappingType])
+		layout.set_indent(self._indentation * pango.SCALE)
+		layout.set_spacing(self._spacing * pango.SCALE)
+		layout.set_justify(self._isJustified)
+		layout.set_alignment(_ALIGN_DICT[self._alignment])
+		layout.set_single_paragraph_mode(self._isSingleParagraph)
+
 	def draw(self, context):
-		# TODO: making the layout in the drawing method might slow down rendering / cause flickering. Maybe
-		# TODO: move the layout setup to another method for 'offline' rendering.
+		self.updateLayout()
+		pangoContext = pangocairo.CairoContext(context)
 		if self.isAlwaysRedrawing():
-			self.dirty()
-
-		if self._isDirty:
-			pangoContext = pangocairo.CairoContext(context)
-			self._layout = pangoContext.create_layout()
-			if self._accelMarker is not None:
-				self._layout.set_markup_with_accel(self._markupText, self._accelMarker)
-			else:
-				self._layout.set_markup(self._markupText)
-			fontDescription = pango.FontDescription()
-			fontDescription.set_size(self._fontSize * pango.SCALE)
-			fontDescription.set_family(self._fontFamily)
-			if self._isItalic:
-				fontDescription.set_style(pango.STYLE_ITALIC)
-			else:
-				fontDescription.set_style(pango.STYLE_NORMAL)
-			if self._isSmallCaps:
-				fontDescription.set_variant(pango.VARIANT_SMALL_CAPS)
-			else:
-				fontDescription.set_variant(pango.VARIANT_NORMAL)
-			fontDescription.set_weight(int(100 + self._fontWeight*800))
-			fontDescription.set_stretch(_STRETCH_DICT[self._fontStretch])
-			self._layout.set_font_description(fontDescription)
-			if self._wrappingType is "none" or self._width < 0:
-				self._layout.set_width(-1)
-			elif self._wrappingType is not "none" and self._width >= 0:
-				self._layout.set_width(self._width*pango.SCALE)
-				self._layout.set_wrap(_WRAP_DICT[self._wrappingType])
-			self._layout.set_indent(self._indentation * pango.SCALE)
-			self._layout.set_spacing(self._spacing * pango.SCALE)
-			self._layout.set_justify(self._isJustified)
-			self._layout.set_alignment(_ALIGN_DICT[self._alignment])
-			self._layout.set_single_paragraph_mode(self._isSingleParagraph)
-			width = self._layout.get_pixel_size()[0]
-			height = self._layout.get_pixel_size()[1]
-			self.setSize(Size(width, height))
-			self._isDirty = False
-
-		context.show_layout(self._layout)
+			pangoContext.update_layout(self._layout)	# re-hint the layout for the current transformation
+			width, height = self._layout.get_pixel_size()	# hinting may change the size of the text
+			size = Node.getSize(self)
+			if width != size.width or height != size.height:
+				self.setSize(Size(width, height))
+		pangoContext.show_layout(self._layout)
 
 
 	def dirty(self):
 		"""
-		Notifies the drawing method that the layout has changed and needs to be redrawn. This method is automatically called whenever any parameters for C{PangoLabel} are changed, so it should not typically need to be called manually.
+		Notifies the PangoLabel that the layout has changed and needs to be rebuilt. This method is automatically called whenever any parameters for C{PangoLabel} are changed, so it should not typically need to be called manually.
 		"""
 		self._isDirty = True
 		
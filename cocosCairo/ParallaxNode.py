@@ -43,7 +43,7 @@ class ParallaxNode(Node):
 			del self._parallaxDict[child]
 		Node._detachChild(self, child, shouldCleanup)
 
-	def _visit(self, context):
+	def _visit(self, context, inheritedOpacity=1.0):
 		currentAbsolutePosition = self.getAbsolutePosition()
 		if self._lastPosition is None or currentAbsolutePosition != self._lastPosition:
 			for child in self._parallaxDict:
@@ -53,4 +53,4 @@ class ParallaxNode(Node):
 				y = -currentAbsolutePosition.y + currentAbsolutePosition.y*ratio.y + offset.y
 				child.setPosition(Point(x,y))
 			self._lastPosition = currentAbsolutePosition
-		Node._visit(self, context)
+		Node._visit(self, context, inheritedOpacity)
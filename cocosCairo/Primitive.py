@@ -8,12 +8,16 @@ from Color import *
 
 import math
 
+_BATCH_KINDS = ("point", "rect", "line")	# the kinds of elements supported by PrimitiveBatchNode
+
 # TODO: make more primitive nodes.
 
 class PathNode(Node):
 	"""
 	Displays interconnected lines as defined by a L{Path}.
 	"""
+	_isApplyingDrawOpacity = True
+
 	def __init__(self, path=None, color=None, thickness=2.0):
 		"""
 		Initialization method.
@@ -33,6 +37,8 @@ class PathNode(Node):
 		self._path = None
 		self._isRelative = False
 		self._thickness = thickness
+		self._cachedPath = None	# the cairo path built from self._path in the Node's own coordinates, replayed every draw
+		self._cachedVersion = None	# the version of self._path when self._cachedPath was built
 		self.setPath(path)
 		self.setColor(color)
 
@@ -55,6 +61,7 @@ class PathNode(Node):
 		"""
 		self._isRelative = isinstance(path, RelativePath)
 		self._path = path
+		self.dirty()
 
 	path = property(getPath, setPath, doc="The Path to be displayed.")
 
@@ -99,26 +106,43 @@ class PathNode(Node):
 
 	opacity = property(getOpacity, setOpacity)
 
+	def dirty(self):
+		"""
+		Notifies the drawing method that the Path has changed and its cached cairo path needs to be rebuilt. The path is rebuilt automatically after L{setPath} or after Points are added to the Path, so this only needs to be called manually if the Path's Points are modified in place.
+		"""
+		self._cachedPath = None
+
 	def draw(self, context):
-		points = self._path.getPoints()
-		if len(points) < 2:
-			return
+		context.new_path()
+		if self._cachedPath is None or self._cachedVersion != self._path.getVersion():
+			points = self._path.getPoints()
+			if len(points) < 2:
+				return
+			context.save()
+			context.identity_matrix()	# copy the path in the Node's own coordinates rather than rounded to the current device coordinates
+			point = points[0]
+			context.move_to(point.x, point.y)
+			if self._isRelative:
+				for point in points[1:]:
+					context.rel_line_to(point.x, point.y)
+			else:
+				for point in points[1:]:
+					context.line_to(point.x, point.y)
+			self._cachedPath = context.copy_path()
+			self._cachedVersion = self._path.getVersion()
+			context.new_path()
+			context.restore()
+		context.append_path(self._cachedPath)
 		context.set_line_width(self._thickness)
-		context.set_source_rgba(self._color.r, self._color.g, self._color.b, self._color.a)
-		point = points[0]
-		context.move_to(point.x, point.y)
-		if self._isRelative:
-			for point in points[1:]:
-				context.rel_line_to(point.x, point.y)
-		else:
-			for point in points[1:]:
-				context.line_to(point.x, point.y)
+		context.set_source_rgba(self._color.r, self._color.g, self._color.b, self._color.a*self._drawOpacity)
 		context.stroke()
 
 class LineNode(Node):
 	"""
 	Displays a line.
 	"""
+	_isApplyingDrawOpacity = True
+
 	def __init__(self, startPoint=None, endPoint=None, color=None, thickness=2.0):
 		"""
 		Initialization method.
@@ -245,7 +269,7 @@ class LineNode(Node):
 
 	def draw(self, context):
 		context.set_line_width(self._thickness)
-		context.set_source_rgba(self._color.r, self._color.g, self._color.b, self._color.a)
+		context.set_source_rgba(self._color.r, self._color.g, self._color.b, self._color.a*self._drawOpacity)
 		context.move_to(self._startPoint.x, self._startPoint.y)
 		context.line_to(self._endPoint.x, self._endPoint.y)
 		context.stroke()
@@ -254,6 +278,8 @@ class AbstractFillableNode(Node):
 	"""
 	A L{Node} which can be filled with a color and have a colored outline.
 	"""
+	_isApplyingDrawOpacity = True
+
 	def __init__(self, fillColor=None, strokeColor=None, strokeThickness=0.0):
 		"""
 		Initialization method.
@@ -383,6 +409,8 @@ class PolygonNode(AbstractFillableNode):
 		self._polygon = None
 		self._minX = 0
 		self._minY = 0
+		self._cachedPath = None	# the cairo path built from self._polygon in the Node's own coordinates, replayed every draw
+		self._cachedVersion = None	# the version of self._polygon when self._cachedPath was built
 		if polygon is not None:
 			self.setPolygon(polygon)
 
@@ -414,30 +442,47 @@ class PolygonNode(AbstractFillableNode):
 		self._minY = minY
 		self.setRect(rect)
 		self._polygon = polygon
+		self.dirty()
 
 	polygon = property(getPolygon, setPolygon, doc="The Polygon to be rendered.")
 #}
 
+	def dirty(self):
+		"""
+		Notifies the drawing method that the Polygon has changed and its cached cairo path needs to be rebuilt. The path is rebuilt automatically after L{setPolygon} or after Points are added to or removed from the Polygon (though the Node's bounding box is only updated by L{setPolygon}), so this should not usually need to be called manually.
+		"""
+		self._cachedPath = None
+
 	def draw(self, context):
-		points = self._polygon.getPoints()
-		if len(points) < 3:
+		if self._polygon is None:
 			return
+		context.new_path()
+		if self._cachedPath is None or self._cachedVersion != self._polygon.getVersion():
+			points = self._polygon.getPoints()
+			if len(points) < 3:
+				return
+			context.save()
+			context.identity_matrix()	# copy the path in the Node's own coordinates rather than rounded to the current device coordinates
+			x = self._minX
+			y = self._minY
+			context.move_to(points[0].x-x, points[0].y-y)
+			for point in points[1:]:
+				context.line_to(point.x-x, point.y-y)
+			context.close_path()
+			self._cachedPath = context.copy_path()
+			self._cachedVersion = self._polygon.getVersion()
+			context.new_path()
+			context.restore()
+		context.append_path(self._cachedPath)
 		color = self._fillColor
-		context.set_source_rgba(color.r, color.g, color.b, color.a)
-		x = self._minX
-		y = self._minY
-		context.move_to(points[0].x-x, points[0].y-y)
-		for point in points[1:]:
-			context.line_to(point.x-x, point.y-y)
-		context.close_path()
-		context.fill()
+		context.set_source_rgba(color.r, color.g, color.b, color.a*self._drawOpacity)
+		if self._strokeThickness <= 0.0 or self._strokeColor.a <= 0.0:
+			context.fill()	# nothing would be stroked, so don't keep the path around
+			return
+		context.fill_preserve()
 		context.set_line_width(self._strokeThickness)
 		color = self._strokeColor
-		context.set_source_rgba(color.r, color.g, color.b, color.a)
-		context.move_to(points[0].x-x, points[0].y-y)
-		for point in points[1:]:
-			context.line_to(point.x-x, point.y-y)
-		context.close_path()
+		context.set_source_rgba(color.r, color.g, color.b, color.a*self._drawOpacity)
 		context.stroke()
 
 class RectangleNode(PolygonNode):
@@ -472,6 +517,7 @@ class EllipseNode(AbstractFillableNode):
 	"""
 	def __init__(self, rect=None, color=None):
 		AbstractFillableNode.__init__(self, color)
+		self._cachedPath = None	# the cairo path for the ellipse, rebuilt whenever the size changes
 		self.setRect(rect)
 
 	def getColor(self):
@@ -482,17 +528,32 @@ class EllipseNode(AbstractFillableNode):
 
 	color = property(getColor, setColor, doc="The fill color of the ellipse.")
 
+	def setSize(self, size):
+		self._cachedPath = None
+		AbstractFillableNode.setSize(self, size)
+
+	size = property(AbstractFillableNode.getSize, setSize, doc="The size of the ellipse.")
+
 	def draw(self, context):
-		context.save()
-		w = self.getRect().size.width
-		h = self.getRect().size.height
-		context.translate(w/2., h/2.)
-		context.scale(w/2., h/2.)
+		context.new_path()
+		if self._cachedPath is None:
+			w = self._size.width
+			h = self._size.height
+			if w <= 0 or h <= 0:
+				return
+			context.save()
+			context.identity_matrix()	# copy the path in the Node's own coordinates rather than rounded to the current device coordinates
+			context.translate(w/2., h/2.)
+			context.scale(w/2., h/2.)
+			context.arc(0., 0., 1., 0., 2*math.pi)
+			context.identity_matrix()
+			self._cachedPath = context.copy_path()
+			context.new_path()
+			context.restore()
+		context.append_path(self._cachedPath)
 		color = self._fillColor
-		context.set_source_rgba(color.r, color.g, color.b, color.a)
-		context.arc(0., 0., 1., 0., 2*math.pi)
+		context.set_source_rgba(color.r, color.g, color.b, color.a*self._drawOpacity)
 		context.fill()
-		context.restore()
 
 class PointNode(EllipseNode):
 	"""
@@ -511,3 +572,314 @@ class PointNode(EllipseNode):
 		"""
 		EllipseNode.__init__(self, MakeRect(point.x, point.y, radius*2, radius*2), fillColor)
 		self.setAnchorPoint(Point(0.5,0.5))
+
+class PrimitiveBatchNode(Node):
+	"""
+	Draws many simple shapes (points, rectangles, and lines) in a single L{draw} call. This is much faster than adding thousands of L{PointNode}C{s} or L{LineNode}C{s} to a Scene since each of those is a separate Node with its own transform and background fill.
+
+	Elements are referred to by the index returned from L{addElement}. Elements of the same kind and L{Color} are drawn together with a single cairo path, which is cached and only rebuilt when one of its elements changes. Note that elements are therefore drawn grouped by color (in the order each color was first used) rather than strictly in the order they were added.
+
+	The kinds of elements are:
+		- C{"point"}: a circle centered at the position whose diameter is the size's width.
+		- C{"rect"}: a rectangle whose top-left corner is at the position.
+		- C{"line"}: a line from the position to the position offset by the size's width and height. Lines are stroked with L{getThickness}.
+	"""
+	_isApplyingDrawOpacity = True
+
+	def __init__(self, rect=None, thickness=1.0):
+		"""
+		Initialization method.
+
+		@param rect: The bounding box for the Node. By default, the bounding box is L{RectZero}.
+		@type rect: L{Rect} (or C{None})
+		@param thickness: The thickness of any line elements.
+		@type thickness: Non-negative C{float}
+		"""
+		Node.__init__(self, rect)
+		self._thickness = thickness
+		self._kinds = []
+		self._positions = []
+		self._sizes = []
+		self._colors = []
+		self._groupKeys = []	# the group key of each element
+		self._groups = {}		# each key is of the form (isStroked, r, g, b, a), and each value is a list of element indices
+		self._groupOrder = []	# the order in which groups are drawn
+		self._cachedPaths = {}	# group key to its cached cairo path, in the Node's own coordinates; a missing entry means the group must be rebuilt
+
+#{ Accessor methods.
+	def getThickness(self):
+		"""
+		Returns the thickness of line elements. Default is C{1.0}.
+
+		@return: The thickness.
+		@rtype: C{float}
+		"""
+		return self._thickness
+
+	def setThickness(self, thickness):
+		"""
+		Sets the thickness of line elements.
+
+		@param thickness: The thickness.
+		@type thickness: C{float}
+		"""
+		self._thickness = thickness
+
+	thickness = property(getThickness, setThickness, doc="The thickness of line elements.")
+
+	def getNumberOfElements(self):
+		"""
+		Returns the number of elements in the batch.
+
+		@return: The number of elements.
+		@rtype: C{int}
+		"""
+		return len(self._kinds)
+
+	def getElementKind(self, index):
+		"""
+		Returns the kind of the element at the given index (C{"point"}, C{"rect"}, or C{"line"}).
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@return: The kind of the element.
+		@rtype: C{string}
+		"""
+		return self._kinds[index]
+
+	def getElementPosition(self, index):
+		"""
+		Returns the position of the element at the given index.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@return: The position.
+		@rtype: L{Point}
+		"""
+		return self._positions[index].copy()
+
+	def setElementPosition(self, index, position):
+		"""
+		Sets the position of the element at the given index. Only the element's color group will be rebuilt.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@param position: The new position.
+		@type position: L{Point}
+		"""
+		self._positions[index] = position.copy()
+		self._dirtyGroup(self._groupKeys[index])
+
+	def getElementSize(self, index):
+		"""
+		Returns the size of the element at the given index.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@return: The size.
+		@rtype: L{Size}
+		"""
+		return self._sizes[index].copy()
+
+	def setElementSize(self, index, size):
+		"""
+		Sets the size of the element at the given index. Only the element's color group will be rebuilt.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@param size: The new size.
+		@type size: L{Size}
+		"""
+		self._sizes[index] = size.copy()
+		self._dirtyGroup(self._groupKeys[index])
+
+	def getElementColor(self, index):
+		"""
+		Returns the color of the element at the given index.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@return: The color.
+		@rtype: L{Color}
+		"""
+		return self._colors[index].copy()
+
+	def setElementColor(self, index, color):
+		"""
+		Sets the color of the element at the given index. Only the element's old and new color groups will be rebuilt.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		@param color: The new color.
+		@type color: L{Color}
+		"""
+		self._colors[index] = color.copy()
+		oldKey = self._groupKeys[index]
+		newKey = self._makeGroupKey(self._kinds[index], color)
+		if newKey != oldKey:
+			self._removeFromGroup(index, oldKey)
+			self._addToGroup(index, newKey)
+#}
+
+
+#{ Adding and removing elements.
+	def addElement(self, kind, position, size, color=None):
+		"""
+		Adds an element to the batch.
+
+		@param kind: The kind of element (C{"point"}, C{"rect"}, or C{"line"}).
+		@type kind: C{string}
+		@param position: The position of the element.
+		@type position: L{Point}
+		@param size: The size of the element. See L{PrimitiveBatchNode} for how it is interpreted for each kind.
+		@type size: L{Size}
+		@param color: The color of the element. Default is L{WhiteColor}.
+		@type color: L{Color}
+		@return: The index of the new element.
+		@rtype: C{int}
+		"""
+		if kind not in _BATCH_KINDS:
+			raise ValueError("Unknown element kind: " + str(kind))
+		if color is None:
+			color = WhiteColor()
+		index = len(self._kinds)
+		self._kinds.append(kind)
+		self._positions.append(position.copy())
+		self._sizes.append(size.copy())
+		self._colors.append(color.copy())
+		self._groupKeys.append(None)
+		self._addToGroup(index, self._makeGroupKey(kind, color))
+		return index
+
+	def addPoints(self, points, color=None, radius=1.0):
+		"""
+		Convenience method which adds a C{"point"} element for every given L{Point}.
+
+		@param points: The centers of the points.
+		@type points: C{list of Points}
+		@param color: The color of all of the points. Default is L{WhiteColor}.
+		@type color: L{Color}
+		@param radius: The radius of all of the points.
+		@type radius: Non-negative C{float}
+		@return: The indices of the new elements.
+		@rtype: C{list}
+		"""
+		size = Size(radius*2, radius*2)
+		return [self.addElement("point", point, size, color) for point in points]
+
+	def addLine(self, startPoint, endPoint, color=None):
+		"""
+		Convenience method which adds a C{"line"} element between two L{Point}C{s}.
+
+		@param startPoint: The starting point of the line.
+		@type startPoint: L{Point}
+		@param endPoint: The ending point of the line.
+		@type endPoint: L{Point}
+		@param color: The color of the line. Default is L{WhiteColor}.
+		@type color: L{Color}
+		@return: The index of the new element.
+		@rtype: C{int}
+		"""
+		size = Size(endPoint.x-startPoint.x, endPoint.y-startPoint.y)
+		return self.addElement("line", startPoint, size, color)
+
+	def removeElement(self, index):
+		"""
+		Removes the element at the given index. Note that all elements after it will have their index decreased by one, so this causes every group to be rebuilt.
+
+		@param index: The index of the element.
+		@type index: C{int}
+		"""
+		del self._kinds[index]
+		del self._positions[index]
+		del self._sizes[index]
+		del self._colors[index]
+		self._rebuildGroups()
+
+	def removeAllElements(self):
+		"""
+		Removes all elements from the batch.
+		"""
+		self._kinds = []
+		self._positions = []
+		self._sizes = []
+		self._colors = []
+		self._rebuildGroups()
+#}
+
+
+#{ Private methods.
+	def _makeGroupKey(self, kind, color):
+		return (kind == "line", color.r, color.g, color.b, color.a)
+
+	def _addToGroup(self, index, key):
+		if key not in self._groups:
+			self._groups[key] = []
+			self._groupOrder.append(key)
+		self._groups[key].append(index)
+		self._groupKeys[index] = key
+		self._dirtyGroup(key)
+
+	def _removeFromGroup(self, index, key):
+		indices = self._groups[key]
+		indices.remove(index)
+		if len(indices) < 1:
+			del self._groups[key]
+			self._groupOrder.remove(key)
+			if key in self._cachedPaths:
+				del self._cachedPaths[key]
+		else:
+			self._dirtyGroup(key)
+
+	def _dirtyGroup(self, key):
+		if key in self._cachedPaths:
+			del self._cachedPaths[key]
+
+	def _rebuildGroups(self):
+		self._groupKeys = [None] * len(self._kinds)
+		self._groups = {}
+		self._groupOrder = []
+		self._cachedPaths = {}
+		for index in range(0, len(self._kinds)):
+			self._addToGroup(index, self._makeGroupKey(self._kinds[index], self._colors[index]))
+
+	def _buildGroupPath(self, context, key):
+		"""
+		Private method. Appends every element in a group to the context's current path.
+		"""
+		positions = self._positions
+		sizes = self._sizes
+		kinds = self._kinds
+		for index in self._groups[key]:
+			position = positions[index]
+			size = sizes[index]
+			kind = kinds[index]
+			if kind == "point":
+				context.new_sub_path()
+				context.arc(position.x, position.y, size.width/2., 0., 2*math.pi)
+			elif kind == "rect":
+				context.rectangle(position.x, position.y, size.width, size.height)
+			else:
+				context.move_to(position.x, position.y)
+				context.rel_line_to(size.width, size.height)
+#}
+
+	def draw(self, context):
+		opacity = self._drawOpacity
+		context.set_line_width(self._thickness)
+		for key in self._groupOrder:
+			context.new_path()
+			if key not in self._cachedPaths:
+				context.save()
+				context.identity_matrix()	# copy the path in the Node's own coordinates rather than rounded to the current device coordinates
+				self._buildGroupPath(context, key)
+				self._cachedPaths[key] = context.copy_path()
+				context.new_path()
+				context.restore()
+			context.append_path(self._cachedPaths[key])
+			isStroked, r, g, b, a = key
+			context.set_source_rgba(r, g, b, a*opacity)
+			if isStroked:
+				context.stroke()
+			else:
+				context.fill()
@@ -6,10 +6,13 @@ from Node import *
 from Geometry import *
 
 import gtk
+import cairo
 from xml.etree.ElementTree import ElementTree
 import xml.etree.ElementTree
 
 import os
+import copy
+import math
 try:
 	import rsvg
 	#WINDOWS=False
@@ -69,12 +72,114 @@ except ImportError:
 
 
 
+class SVGDocumentCache(object):
+	"""
+	A cache of parsed SVG files, keyed by their file paths. Every L{SVGSprite} loads its file through the cache returned by L{SharedSVGDocumentCache}, so the file is only read and parsed once. A cached document is reparsed if its file has been modified since it was parsed.
+
+	The cached element trees and handles are shared and must not be modified. SVGSprites which load the same file share them until one of the SVGSprites is edited, at which point that SVGSprite makes its own copy of the tree.
+	"""
+	def __init__(self):
+		self._documents = {}	# each key is an absolute path, and each value is [mtime, root, handle]
+
+	def getDocument(self, svgName):
+		"""
+		Returns the parsed root element and C{rsvg.Handle} for an SVG file, parsing the file first if it is not cached or if it has changed on disk.
+
+		@param svgName: The path of the SVG file.
+		@type svgName: C{string}
+		@return: The root element and the handle.
+		@rtype: C{tuple}
+		"""
+		key = os.path.abspath(svgName)
+		mtime = os.path.getmtime(key)
+		entry = self._documents.get(key)
+		if entry is None or entry[0] != mtime:
+			root, handle = parseSVGDocument(key)
+			entry = [mtime, root, handle]
+			self._documents[key] = entry
+		return (entry[1], entry[2])
+
+	def addDocument(self, svgName, root, handle):
+		"""
+		Adds an already-parsed document to the cache (for example, one parsed on another thread) as though it had been loaded by L{getDocument}.
+
+		@param svgName: The path of the SVG file.
+		@type svgName: C{string}
+		@param root: The root element of the document.
+		@type root: C{xml.etree.ElementTree._ElementInterface}
+		@param handle: The handle which renders the document.
+		@type handle: C{rsvg.Handle}
+		"""
+		key = os.path.abspath(svgName)
+		self._documents[key] = [os.path.getmtime(key), root, handle]
+
+	def hasDocument(self, svgName):
+		"""
+		Returns whether or not an SVG file is currently cached (regardless of whether or not its file has since changed).
+
+		@param svgName: The path of the SVG file.
+		@type svgName: C{string}
+		@return: Whether or not the document is cached.
+		@rtype: C{bool}
+		"""
+		return os.path.abspath(svgName) in self._documents
+
+	def removeDocument(self, svgName):
+		"""
+		Removes an SVG file from the cache if it is cached.
+
+		@param svgName: The path of the SVG file.
+		@type svgName: C{string}
+		"""
+		key = os.path.abspath(svgName)
+		if key in self._documents:
+			del self._documents[key]
+
+	def removeAllDocuments(self):
+		"""
+		Removes all SVG files from the cache.
+		"""
+		self._documents = {}
+
+def parseSVGDocument(svgName):
+	"""
+	Parses an SVG file and builds the C{rsvg.Handle} which renders it, without going through the cache. This does not touch any shared state, so it may be called from any thread (see L{AssetLoader}).
+
+	@param svgName: The path of the SVG file.
+	@type svgName: C{string}
+	@return: The root element and the handle.
+	@rtype: C{tuple}
+	"""
+	tree = ElementTree()
+	tree.parse(svgName)
+	return (tree.getroot(), rsvg.Handle(file=svgName))
+
+_sharedSVGDocumentCache = SVGDocumentCache()
+
+def SharedSVGDocumentCache():
+	"""
+	Returns the process-wide L{SVGDocumentCache} used by all L{SVGSprite}C{s}.
+
+	@return: The shared document cache.
+	@rtype: L{SVGDocumentCache}
+	"""
+	return _sharedSVGDocumentCache
+
+
+_MAXIMUM_RASTER_SIZE = 4096	# SVGs which would be rasterized larger than this (in pixels) are always rendered as vectors
+
 class SVGSprite(Node):
 	"""
 	Renders SVG files to the screen. While L{Sprite} can render SVG files, it first renders the SVG file to a pixel buffer, which forces it to be scaled by interpolating the pixels. SVGSprite, on the other hand, does allow scaling without pixel interpolation.
 
-	Note that if the SVG file is large, it is recommended to use L{Sprite} as SVGSprite might slow down the application.
+	Edits to the SVG (e.g. via L{setAttributeById} or L{setStylePropertyValueById}) are applied the next time the SVGSprite is drawn, so any number of edits in one frame only rebuild the SVG once. Elements which are edited every frame (e.g. by an animation) can also be rendered separately (see L{setElementSeparatedById}), so editing them does not rebuild the rest of the SVG.
+
+	By default, SVGSprite renders the SVG into a pixel buffer at the scale at which it appears on the screen (taking into account the scale of all of its parents) and draws that buffer every frame, so the SVG is only re-rendered when it is edited or when its on-screen scale changes by more than L{getRasterTolerance}. In a frame in which the SVG was edited, it is rendered from its vectors instead, and the pixel buffer is re-rendered at the next frame without edits, so an SVG which is edited every frame is never rendered twice per frame. See L{setRasterized} and L{setVectorWhileScaling}.
+
+	The SVGSprite's opacity (see L{Node.setOpacity}) is applied when the SVG is drawn rather than written into the SVG, so fading an SVGSprite never edits or re-renders the SVG. To change the C{"opacity"} attribute of the C{<svg>} tag itself, use L{setSVGAttribute}.
 	"""
+	_isApplyingDrawOpacity = True
+
 	def __init__(self, svgName=None, position=None):
 		"""
 		Initialization method.
@@ -90,7 +195,20 @@ class SVGSprite(Node):
 		self._svg = None
 		self._svgName = None
 		self._root = None
+		self._isDocumentShared = False	# whether self._root belongs to the SVGDocumentCache and must be copied before it is edited
 		self._namespace = None
+		self._isRasterized = True
+		self._rasterTolerance = 0.1
+		self._isVectorWhileScaling = False
+		self._rasterSurface = None	# the SVG rendered at self._rasterScale, or None if it needs to be re-rendered
+		self._rasterScale = None
+		self._lastDrawScale = None	# the on-screen scale at the previous draw, used to detect scale animations
+		self._isSVGDirty = False	# whether the whole SVG must be rebuilt before it is next drawn
+		self._separateElements = []	# each item is of the form [elementId, element, parent, handle], in drawing order
+		self._elementsById = {}	# each key is an id, and each value is the first element in the SVG with that id
+		self._parentsByElement = {}	# each key is an element, and each value is its parent
+		self._styleDictionaries = {}	# each key is an element, and each value is its parsed "style" attribute
+		self._dirtyElementIds = set()	# ids of separate elements which must be rebuilt before they are next drawn
 		if svgName is not None:
 			self.setSVGName(svgName)
 
@@ -111,32 +229,87 @@ class SVGSprite(Node):
 
 	size = property(getSize, setSize)
 
-	def getOpacity(self):
+#{ Rasterization methods.
+	def isRasterized(self):
 		"""
-		Returns the opacity of the SVG. If the SVG tag does not have an opacity attribute (or if the SVG file has not yet been set), then it will return C{1.0}.
+		Returns whether or not the SVG is drawn from a cached pixel buffer rendered at its on-screen scale. Default is C{True}.
 
-		@return: The opacity.
-		@rtype: C{float}
+		@return: Whether or not the SVG is rasterized.
+		@rtype: C{bool}
 		"""
-		if self._root is not None:
-			opacity = self.getSVGAttribute("opacity")
-			if not opacity:
-				return float(opacity)
-			else:
-				return 1.0
-		else:
-			return 1.0
+		return self._isRasterized
+
+	def setRasterized(self, isRasterized):
+		"""
+		Sets whether or not the SVG is drawn from a cached pixel buffer rendered at its on-screen scale. If not, the SVG is rendered from its vectors every frame, which is slower for large SVGs.
+
+		@param isRasterized: Whether or not the SVG is rasterized.
+		@type isRasterized: C{bool}
+		"""
+		self._isRasterized = isRasterized
+		if not isRasterized:
+			self._rasterSurface = None
+
+	rasterized = property(isRasterized, setRasterized, doc="Whether or not the SVG is drawn from a cached pixel buffer.")
+
+	def getRasterTolerance(self):
+		"""
+		Returns how much the on-screen scale may change, as a fraction of the scale at which the SVG was last rendered, before the SVG is re-rendered. Default is C{0.1}.
+
+		@return: The tolerance.
+		@rtype: Non-negative C{float}
+		"""
+		return self._rasterTolerance
 
-	def setOpacity(self, opacity):
+	def setRasterTolerance(self, rasterTolerance):
 		"""
-		Sets the opacity of the SVG. The value should be between C{0.0} and C{1.0}.
+		Sets how much the on-screen scale may change, as a fraction of the scale at which the SVG was last rendered, before the SVG is re-rendered. Larger values re-render less often but show more interpolation when scaled up.
 
-		@param opacity: The SVG's new opacity.
-		@type opacity: C{float}
+		@param rasterTolerance: The tolerance.
+		@type rasterTolerance: Non-negative C{float}
 		"""
-		self.setSVGAttribute("opacity", opacity)
+		self._rasterTolerance = rasterTolerance
 
-	opacity = property(getOpacity, setOpacity)
+	rasterTolerance = property(getRasterTolerance, setRasterTolerance, doc="How much the on-screen scale may change before the SVG is re-rendered.")
+
+	def isVectorWhileScaling(self):
+		"""
+		Returns whether or not the SVG is rendered from its vectors while its on-screen scale is changing (e.g. during a L{ScaleTo} action). Default is C{False}.
+
+		@return: Whether or not the SVG is rendered from its vectors while scaling.
+		@rtype: C{bool}
+		"""
+		return self._isVectorWhileScaling
+
+	def setVectorWhileScaling(self, isVectorWhileScaling):
+		"""
+		Sets whether or not the SVG is rendered from its vectors while its on-screen scale is changing, rather than being re-rendered into a new pixel buffer every time the scale leaves the tolerance. A new pixel buffer is rendered once the scale stops changing.
+
+		@param isVectorWhileScaling: Whether or not the SVG is rendered from its vectors while scaling.
+		@type isVectorWhileScaling: C{bool}
+		"""
+		self._isVectorWhileScaling = isVectorWhileScaling
+
+	vectorWhileScaling = property(isVectorWhileScaling, setVectorWhileScaling, doc="Whether or not the SVG is rendered from its vectors while its on-screen scale is changing.")
+
+	def _rasterize(self, scale):
+		"""
+		Private method. Renders the SVG into a new pixel buffer at the given scale. Returns whether or not it succeeded (it does not if the buffer would be empty or too large).
+		"""
+		self._rasterScale = scale
+		self._rasterSurface = None
+		dimensions = self._svg.get_dimension_data()
+		width = int(math.ceil(dimensions[0]*scale))
+		height = int(math.ceil(dimensions[1]*scale))
+		if width < 1 or height < 1 or width > _MAXIMUM_RASTER_SIZE or height > _MAXIMUM_RASTER_SIZE:
+			return False
+		surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+		context = cairo.Context(surface)
+		context.scale(scale, scale)
+		self._svg.render_cairo(context)
+		self._rasterSurface = surface
+		return True
+#}
 
 #{ SVG methods.
 	def getSVGName(self):
@@ -156,9 +329,8 @@ class SVGSprite(Node):
 		@type svgName: C{string}
 		"""
 		self._svgName = svgName
-		tree = ElementTree()
-		tree.parse(self._svgName)
-		self._setupSVGParsingWithTree(tree)
+		root, handle = SharedSVGDocumentCache().getDocument(self._svgName)
+		self._setupSVGParsingWithRoot(root, handle, True)
 
 	svgName = property(getSVGName, setSVGName, doc="The file path of the SVG file to be rendered.")
 
@@ -177,13 +349,29 @@ class SVGSprite(Node):
 	'''
 
 	def _setupSVGParsingWithTree(self, tree):
-		self._root = tree.getroot()
+		self._setupSVGParsingWithRoot(tree.getroot())
+
+	def _setupSVGParsingWithRoot(self, root, handle=None, isShared=False):
+		"""
+		Private method. Sets up the SVGSprite for a newly-parsed document. If the handle is given, it must render the unmodified document, and it is used instead of rebuilding one from the tree. If the document is shared (i.e. it is in the L{SVGDocumentCache}), it is copied before it is first edited.
+		"""
+		self._root = root
+		self._isDocumentShared = isShared
+		self._separateElements = []
+		self._indexElements()
+		self._dirtyElementIds = set()
 		self._namespace = self.getSVGAttribute("xmlns")
 		width = int(self.getSVGAttribute("width"))	# set the size of the Node to the size of the SVG
 		height = int(self.getSVGAttribute("height"))
 		if width is not None and height is not None:
 			self._size = Size(width, height)
-		self._setSVGFromData()
+			self._transformDidChange()
+		if handle is not None:
+			self._svg = handle
+			self._isSVGDirty = False
+			self._rasterSurface = None
+		else:
+			self._setSVGDirty()
 
 	def getSVGAttribute(self, attribute):
 		"""
@@ -213,8 +401,9 @@ class SVGSprite(Node):
 				attribute = str(attribute)
 			if not isinstance(value, str):
 				value = str(value)
+			self._makeDocumentPrivate()
 			self._root.set(attribute, value)
-			self._setSVGFromData()
+			self._setSVGDirty()
 			return True
 		return False
 
@@ -227,14 +416,59 @@ class SVGSprite(Node):
 		@return: The child.
 		@rtype: C{xml.etree.ElementTree._ElementInterface} (or C{None})
 		"""
-		if self._root is not None:
-			if not isinstance(elementId, str):
-				elementId = str(elementId)
-			allChildren = self._root.findall('.//*')
-			for child in allChildren:
-				if child.get("id") == elementId:
-					return child
-		return None
+		self._makeDocumentPrivate()	# the child may be modified by the caller
+		return self._getElementById(elementId)
+
+	def _getElementById(self, elementId):
+		"""
+		Private method. Returns a child by its id (or C{None}) for reading only, without copying a shared document.
+		"""
+		if not isinstance(elementId, str):
+			elementId = str(elementId)
+		return self._elementsById.get(elementId)
+
+	def addChildElementById(self, parentId, element):
+		"""
+		Adds a new element (along with all of its children) to the SVG.
+
+		@param parentId: The id of the child which the element will be added to, or C{None} to add it to the C{<svg>} tag.
+		@type parentId: C{string} (or C{None})
+		@param element: The new element.
+		@type element: C{xml.etree.ElementTree._ElementInterface}
+		@return: Whether or not adding the element succeeded.
+		@rtype: C{bool}
+		"""
+		if self._root is None:
+			return False
+		self._makeDocumentPrivate()
+		if parentId is None:
+			parent = self._root
+		else:
+			parent = self.getChildElementById(parentId)
+			if parent is None:
+				return False
+		parent.append(element)
+		self._indexElements()
+		self._setSVGDirty()
+		return True
+
+	def removeChildElementById(self, elementId):
+		"""
+		Removes a child (along with all of its children) from the SVG.
+
+		@param elementId: The id of the child.
+		@type elementId: C{string}
+		@return: Whether or not removing the child succeeded.
+		@rtype: C{bool}
+		"""
+		child = self.getChildElementById(elementId)
+		if child is None:
+			return False
+		self._parentsByElement[child].remove(child)
+		self._indexElements()
+		self._separateElements = [separateElement for separateElement in self._separateElements if self._isDescendant(separateElement[1], self._root)]
+		self._setSVGDirty()
+		return True
 
 	def getAttributeById(self, elementId, attribute):
 		"""
@@ -247,7 +481,7 @@ class SVGSprite(Node):
 		"""
 		if not isinstance(attribute, str):
 			attribute = str(attribute)
-		child = self.getChildElementById(elementId)
+		child = self._getElementById(elementId)
 		if child is not None:
 			return child.get(attribute)
 		return None
@@ -272,7 +506,11 @@ class SVGSprite(Node):
 		child = self.getChildElementById(elementId)
 		if child is not None:
 			child.set(attribute, value)
-			self._setSVGFromData()
+			if attribute == "style":
+				self._styleDictionaries.pop(child, None)
+			elif attribute == "id":
+				self._indexElements()
+			self._setElementDirty(elementId)
 			return True
 		return False
 
@@ -285,19 +523,28 @@ class SVGSprite(Node):
 		@return: The dictionary.
 		@rtype: C{dict}
 		"""
-		child = self.getChildElementById(elementId)
-		if child is not None:
-			style = child.get("style")
-			styleList = style.split(";")
+		child = self._getElementById(elementId)
+		if child is None:
+			return {}
+		return self._getStyleDictionary(child).copy()
+
+	def _getStyleDictionary(self, element):
+		"""
+		Private method. Returns the parsed "style" attribute of an element, parsing it only if it has not been parsed since it was last set. The returned dictionary must not be modified.
+		"""
+		styleDict = self._styleDictionaries.get(element)
+		if styleDict is None:
 			styleDict = {}
-			for item in styleList:
-				item = item.strip()
-				if len(item) < 1:
-					continue
-				styleProperty = item.split(":")[0].strip()
-				styleValue = item.split(":")[1].strip()
-				styleDict[styleProperty] = styleValue
-			return styleDict
+			style = element.get("style")
+			if style is not None:
+				for item in style.split(";"):
+					item = item.strip()
+					if len(item) < 1 or ":" not in item:
+						continue
+					styleProperty, styleValue = item.split(":", 1)
+					styleDict[styleProperty.strip()] = styleValue.strip()
+			self._styleDictionaries[element] = styleDict
+		return styleDict
 
 	def setStyleDictionaryById(self, elementId, styleDictionary):
 		"""
@@ -317,7 +564,8 @@ class SVGSprite(Node):
 				styleValue = styleDictionary[styleProperty]
 				styleString += styleProperty + ":" + styleValue + ";"
 			child.set("style", styleString)
-			self._setSVGFromData()
+			self._styleDictionaries[child] = dict(styleDictionary)
+			self._setElementDirty(elementId)
 			return True
 		return False
 
@@ -332,11 +580,9 @@ class SVGSprite(Node):
 		@return: The value for the property.
 		@rtype: C{string} (or C{None})
 		"""
-		styleDict = self.getStyleDictionaryById(elementId)
-		if styleDict != {}:
-			styleProperty = str(styleProperty)
-			if styleProperty in styleDict:
-				return styleDict[styleProperty]
+		child = self._getElementById(elementId)
+		if child is not None:
+			return self._getStyleDictionary(child).get(str(styleProperty))
 		return None
 
 	def setStylePropertyValueById(self, elementId, styleProperty, styleValue):
@@ -352,22 +598,222 @@ class SVGSprite(Node):
 		@return: Whether or not setting the value succeeded.
 		@rtype: C{bool}
 		"""
-		styleDict = self.getStyleDictionaryById(elementId)
-		if styleDict != {}:
-			styleDict[styleProperty] = styleValue
-			return self.setStyleDictionaryById(elementId, styleDict)
+		child = self.getChildElementById(elementId)
+		if child is not None:
+			styleDict = self._getStyleDictionary(child)
+			if styleDict != {}:
+				styleDict = styleDict.copy()
+				styleDict[styleProperty] = styleValue
+				return self.setStyleDictionaryById(elementId, styleDict)
 		return False
 			
 
+	def isElementSeparatedById(self, elementId):
+		"""
+		Returns whether or not a child is rendered separately from the rest of the SVG. Default is C{False}.
+
+		@param elementId: The id of the child.
+		@type elementId: C{string}
+		@return: Whether or not the child is rendered separately.
+		@rtype: C{bool}
+		"""
+		return self._getSeparateElement(str(elementId)) is not None
+
+	def setElementSeparatedById(self, elementId, isSeparated):
+		"""
+		Sets whether or not a child is rendered separately from the rest of the SVG. Editing a separate child only rebuilds that child rather than the whole SVG, which is much faster for children which are animated. Separate children are drawn on top of the rest of the SVG, in the order in which they were separated, and are always rendered from their vectors (see L{setRasterized}).
+
+		@param elementId: The id of the child.
+		@type elementId: C{string}
+		@param isSeparated: Whether or not the child is rendered separately.
+		@type isSeparated: C{bool}
+		@return: Whether or not the child exists.
+		@rtype: C{bool}
+		"""
+		elementId = str(elementId)
+		child = self.getChildElementById(elementId)
+		if child is None:
+			return False
+		separateElement = self._getSeparateElement(elementId)
+		if isSeparated and separateElement is None:
+			self._separateElements.append([elementId, child, self._getParentElement(child), None])
+		elif not isSeparated and separateElement is not None:
+			self._separateElements.remove(separateElement)
+		self._setSVGDirty()
+		return True
+
+	def _getSeparateElement(self, elementId):
+		"""
+		Private method. Returns the [elementId, element, parent, handle] entry for a separate child (or C{None} if it is not separate).
+		"""
+		for separateElement in self._separateElements:
+			if separateElement[0] == elementId:
+				return separateElement
+		return None
+
+	def _getParentElement(self, element):
+		"""
+		Private method. Returns the parent of an element within the SVG (or C{None} if it is not in the SVG).
+		"""
+		return self._parentsByElement.get(element)
+
+	def _makeDocumentPrivate(self):
+		"""
+		Private method called before the SVG is edited. If the SVG is shared with other SVGSprites through the L{SVGDocumentCache}, it is replaced by a private copy.
+		"""
+		if not self._isDocumentShared:
+			return
+		memo = {}	# maps the id of each original element to its copy
+		self._root = copy.deepcopy(self._root, memo)
+		self._isDocumentShared = False
+		self._indexElements()
+		for separateElement in self._separateElements:
+			separateElement[1] = memo[id(separateElement[1])]
+			separateElement[2] = self._getParentElement(separateElement[1])
+
+	def _isDescendant(self, element, ancestor):
+		"""
+		Private method. Returns whether or not an element is within another element.
+		"""
+		parent = self._parentsByElement.get(element)
+		while parent is not None:
+			if parent is ancestor:
+				return True
+			parent = self._parentsByElement.get(parent)
+		return False
+
+	def _indexElements(self):
+		"""
+		Private method called whenever the structure of the SVG changes to rebuild the lookup tables used by L{getChildElementById} and L{_getParentElement}.
+		"""
+		self._elementsById = {}
+		self._parentsByElement = {}
+		self._styleDictionaries = {}
+		if self._root is None:
+			return
+		for element in self._root.getiterator():
+			for child in element:
+				self._parentsByElement[child] = element
+			elementId = element.get("id")
+			if element is not self._root and elementId is not None and elementId not in self._elementsById:
+				self._elementsById[elementId] = element
+
+	def _setSVGDirty(self):
+		"""
+		Private method. Marks the whole SVG as needing to be rebuilt before it is next drawn.
+		"""
+		self._isSVGDirty = True
+		self._rasterSurface = None
+
+	def _setElementDirty(self, elementId):
+		"""
+		Private method. Marks the SVG as needing to be rebuilt after a child has been edited. If the child is separate, only the child is rebuilt.
+		"""
+		if not self._isSVGDirty and self._getSeparateElement(str(elementId)) is not None:
+			self._dirtyElementIds.add(str(elementId))
+		else:
+			self._setSVGDirty()
+
+	def _updateSVG(self):
+		"""
+		Private method called before drawing to rebuild whatever has been edited since the last draw.
+		"""
+		if self._isSVGDirty:
+			self._setSVGFromData()
+		elif len(self._dirtyElementIds) > 0:
+			for separateElement in self._separateElements:
+				if separateElement[0] in self._dirtyElementIds:
+					separateElement[3] = self._makeSeparateHandle(separateElement[1])
+		self._dirtyElementIds = set()
+
 	def _setSVGFromData(self):
 		"""
 		Private method called whenever the SVG's XML is altered to update the display. This method should not usually need to be called manually.
 		"""
 		if self._root is not None:
+			removedElements = []	# separate children are left out of the main handle
+			for separateElement in self._separateElements:
+				element, parent = separateElement[1], separateElement[2]
+				if parent is not None:
+					removedElements.append((parent, list(parent).index(element), element))
+					parent.remove(element)
 			string = xml.etree.ElementTree.tostring(self._root)
+			for parent, index, element in reversed(removedElements):
+				parent.insert(index, element)
 			self._svg = rsvg.Handle(data=string)
+			for separateElement in self._separateElements:
+				separateElement[3] = self._makeSeparateHandle(separateElement[1])
+			self._isSVGDirty = False
+			self._rasterSurface = None
+
+	def _makeSeparateHandle(self, element):
+		"""
+		Private method. Builds a handle which renders only one child, inside copies of the C{<svg>} tag and of the groups containing it (so that their attributes still apply), along with all C{<defs>}.
+		"""
+		root = xml.etree.ElementTree.Element(self._root.tag, self._root.attrib)
+		for child in self._root:
+			if child.tag.endswith("defs"):
+				root.append(child)
+		ancestors = []
+		parent = self._getParentElement(element)
+		while parent is not None and parent is not self._root:
+			ancestors.insert(0, parent)
+			parent = self._getParentElement(parent)
+		container = root
+		for ancestor in ancestors:
+			group = xml.etree.ElementTree.SubElement(container, ancestor.tag, ancestor.attrib)
+			container = group
+		container.append(element)
+		return rsvg.Handle(data=xml.etree.ElementTree.tostring(root))
 #}
 
 	def draw(self, context):
-		if self._svg is not None:
+		isEdited = self._isSVGDirty
+		self._updateSVG()
+		if self._svg is None:
+			return
+		opacity = self._drawOpacity
+		isGrouped = opacity < 1.0 and len(self._separateElements) > 0	# fade the separate children together with the rest, so overlaps do not show through
+		if isGrouped:
+			context.push_group()
+			opacity = 1.0
+		self._drawMainSVG(context, opacity, isEdited)
+		for separateElement in self._separateElements:
+			if separateElement[3] is not None:
+				separateElement[3].render_cairo(context)
+		if isGrouped:
+			context.pop_group_to_source()
+			context.paint_with_alpha(self._drawOpacity)
+
+	def _drawMainSVG(self, context, opacity, isEdited):
+		"""
+		Private method. Draws everything except the separate children, from the cached pixel buffer if possible. The SVG is rendered from its vectors rather than into a new pixel buffer in frames in which it was edited, so that an SVG which is edited every frame is not re-rendered twice per frame.
+		"""
+		if not self._isRasterized:
+			self._renderVectors(context, opacity)
+			return
+		xx, yx, xy, yy, x0, y0 = context.get_matrix()
+		scale = max(math.hypot(xx, yx), math.hypot(xy, yy))
+		isScaling = self._lastDrawScale is not None and scale != self._lastDrawScale
+		self._lastDrawScale = scale
+		if self._rasterSurface is None or abs(scale - self._rasterScale) > self._rasterTolerance * self._rasterScale:
+			if isEdited or (isScaling and self._isVectorWhileScaling) or not self._rasterize(scale):
+				self._renderVectors(context, opacity)
+				return
+		context.save()
+		context.scale(1.0/self._rasterScale, 1.0/self._rasterScale)
+		context.set_source_surface(self._rasterSurface, 0, 0)
+		context.paint_with_alpha(opacity)
+		context.restore()
+
+	def _renderVectors(self, context, opacity):
+		"""
+		Private method. Renders everything except the separate children from the SVG's vectors with the given opacity.
+		"""
+		if opacity < 1.0:
+			context.push_group()
+			self._svg.render_cairo(context)
+			context.pop_group_to_source()
+			context.paint_with_alpha(opacity)
+		else:
 			self._svg.render_cairo(context)
@@ -16,6 +16,7 @@ class Scene(Node):
 		Node.__init__(self)
 		self._isAnchorPointRelative = False
 		self._isSetupComplete = False
+		self._assetNames = []
 
 	def _setDirector(self, director):
 		Node._setDirector(self, director)
@@ -28,3 +29,23 @@ class Scene(Node):
 		Override this method to set up your scene.
 		"""
 		pass
+
+	def getAssetNames(self):
+		"""
+		Returns the filepaths of the images and SVG files which this Scene uses. Default is the empty list.
+
+		@return: The filepaths.
+		@rtype: C{list of strings}
+		"""
+		return self._assetNames[:]
+
+	def setAssetNames(self, assetNames):
+		"""
+		Declares the filepaths of the images and SVG files which this Scene uses (its asset manifest). L{Director.replaceScene} loads them in the background with the L{AssetLoader} before the Scene is set up, and L{Director.preloadScene} may be used to load them ahead of time. This should be set before the Scene is given to the Director (e.g. in the Scene's initialization method).
+
+		@param assetNames: The filepaths.
+		@type assetNames: C{list of strings}
+		"""
+		self._assetNames = list(assetNames)
+
+	assetNames = property(getAssetNames, setAssetNames, doc="The filepaths of the images and SVG files which this Scene uses.")
@@ -2,18 +2,66 @@
 Manages all Timers for the application.
 """
 
+from Timer import *
+
+from collections import OrderedDict
+
 class Scheduler(object):
 	"""
 	Manages all L{Timer}C{s} for the application. It is responsible for updating all Timers whenever it ticks.
 
-	It is owned by the Director. cocosCairo was designed to have one Scheduler per Director (and one Director per application), so this method should be indirectly accessed through the L{Director}.
+	Scheduling and unscheduling a timer take constant time, so activating and deactivating the timers of many L{Node}C{s} at once (e.g. when a Scene is pushed or popped) is cheap.
+
+	Schedulers may be nested: a child Scheduler (see L{addChildScheduler}) is ticked by its parent, with the parent's scaled time, and has its own L{timeScale} and pause state (see L{setPaused}). A L{Node} may own a child Scheduler (see L{Node.setUsingOwnScheduler}) so that all of the timers and L{Action}C{s} in its subtree can be slowed down or paused at once.
+
+	The root Scheduler is owned by the Director. cocosCairo was designed to have one Scheduler per Director (and one Director per application), so this method should be indirectly accessed through the L{Director}.
 	"""
 	def __init__(self):
-		self._scheduledTimers = []
-		self._timersToRemove = []
-		self._timersToAdd = []
+		self._scheduledTimers = OrderedDict()	# each key is a Timer; the values are unused
+		self._timersToRemove = set()
+		self._timersToAdd = OrderedDict()	# each key is a Timer; the values are unused
+		self._isPaused = False
+		self._tickTimer = Timer(self.tick)	# scheduled in the parent Scheduler, if this is a child Scheduler
 		self.timeScale = 1.0	#: Modifies the time scale of all scheduled timers. Setting a value less than the current one will create a "slow motion" effect, while setting a value greater than the current one will create a "fast forward" effect. Default is C{1.0}.
 
+	def isPaused(self):
+		"""
+		Returns whether or not the Scheduler is paused. Default is C{False}.
+
+		@return: Whether or not the Scheduler is paused.
+		@rtype: C{bool}
+		"""
+		return self._isPaused
+
+	def setPaused(self, isPaused):
+		"""
+		Sets whether or not the Scheduler is paused. While paused, ticks are ignored, so none of its timers (including those of any child Schedulers) fire.
+
+		@param isPaused: Whether or not the Scheduler is paused.
+		@type isPaused: C{bool}
+		"""
+		self._isPaused = isPaused
+
+	paused = property(isPaused, setPaused, doc="Whether or not the Scheduler is paused.")
+
+	def addChildScheduler(self, scheduler):
+		"""
+		Nests another Scheduler within this one, so that it ticks whenever this one does (with this one's scaled time).
+
+		@param scheduler: The child Scheduler.
+		@type scheduler: L{Scheduler}
+		"""
+		self.schedule(scheduler._tickTimer)
+
+	def removeChildScheduler(self, scheduler):
+		"""
+		Stops ticking a Scheduler which was nested within this one via L{addChildScheduler}.
+
+		@param scheduler: The child Scheduler.
+		@type scheduler: L{Scheduler}
+		"""
+		self.unschedule(scheduler._tickTimer)
+
 	def schedule(self, timer):
 		"""
 		Registers a timer to be notified when the Scheduler ticks.
@@ -25,7 +73,7 @@ class Scheduler(object):
 			self._timersToRemove.remove(timer)
 			return
 		if timer not in self._timersToAdd and timer not in self._scheduledTimers:
-			self._timersToAdd.append(timer)
+			self._timersToAdd[timer] = None
 
 	def unschedule(self, timer):
 		"""
@@ -35,18 +83,18 @@ class Scheduler(object):
 		@type timer: L{Timer}
 		"""
 		if timer in self._timersToAdd:
-			self._timersToAdd.remove(timer)
+			del self._timersToAdd[timer]
 			return
 		if timer in self._scheduledTimers:
-			self._timersToRemove.append(timer)
+			self._timersToRemove.add(timer)
 
 	def unscheduleAllTimers(self):
 		"""
 		Clears out all timers that have been registered.
 		"""
-		self._scheduledTimers = []
-		self._timersToRemove = []
-		self._timersToAdd = []
+		self._scheduledTimers = OrderedDict()
+		self._timersToRemove = set()
+		self._timersToAdd = OrderedDict()
 
 	def tick(self, dt):
 		"""
@@ -57,13 +105,17 @@ class Scheduler(object):
 		@param dt: The amount of time since the last tick.
 		@type dt: Non-negative C{float}
 		"""
+		if self._isPaused:
+			return
 		if self.timeScale != 1.0:
 			dt *= self.timeScale
 		for timer in self._timersToRemove:
-			self._scheduledTimers.remove(timer)
-		self._timersToRemove = []
+			del self._scheduledTimers[timer]
+		self._timersToRemove = set()
 		for timer in self._timersToAdd:
-			self._scheduledTimers.append(timer)
-		self._timersToAdd = []
-		for timer in self._scheduledTimers:
+			self._scheduledTimers[timer] = None
+		self._timersToAdd = OrderedDict()
+		for timer in self._scheduledTimers.keys():	# a copy, in case a timer is scheduled or unscheduled while firing
 			timer.fire(dt)
+			if timer.isDone():	# a one-shot timer which has fired
+				self.unschedule(timer)
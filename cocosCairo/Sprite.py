@@ -4,12 +4,19 @@ A Node that renders an image such as a JPEG to the screen.
 
 from Node import *
 from Geometry import *
-import gtk
+from ImageCache import *
+
+import cairo
+import math
 
 class Sprite(Node):
 	"""
 	A L{Node} that renders an image (such as a JPEG, PNG, or SVG) to the screen.
+
+	Images are loaded through the shared L{ImageCache}, so Sprites created from the same file share one decoded surface. Sprites which are usually drawn scaled down can be set to use mipmaps (see L{setMipmapped}) so that they do not resample the full-size image every frame.
 	"""
+	_isApplyingDrawOpacity = True
+
 	def __init__(self, imageName=None, position=None):
 		"""
 		Initialization method.
@@ -22,10 +29,34 @@ class Sprite(Node):
 		Node.__init__(self)
 		if position is not None:
 			self.setPosition(position)
-		self._pixbuf = None
-		self._sourcePattern = None
+		self._imageName = None
+		self._surface = None
+		self._sourcePattern = None	# built once per image rather than per draw
+		self._sourceRect = None	# the part of the surface to display, or None to display all of it (see setAtlasImage)
+		self._isMipmapped = False
+		self._mipmapPatterns = None	# patterns for the downscaled copies of the image, built the first time they are needed
 		self.setImageName(imageName)
 
+	def isMipmapped(self):
+		"""
+		Returns whether or not the Sprite draws from a downscaled copy of its image when it is drawn scaled down. Default is C{False}.
+
+		@return: Whether or not the Sprite uses mipmaps.
+		@rtype: C{bool}
+		"""
+		return self._isMipmapped
+
+	def setMipmapped(self, isMipmapped):
+		"""
+		Sets whether or not the Sprite draws from a downscaled copy of its image when it is drawn scaled down (taking into account the scale of all of its parents). The copies are generated once and shared through the L{ImageCache}. This has no effect on Sprites set with L{setAtlasImage}.
+
+		@param isMipmapped: Whether or not the Sprite uses mipmaps.
+		@type isMipmapped: C{bool}
+		"""
+		self._isMipmapped = isMipmapped
+
+	mipmapped = property(isMipmapped, setMipmapped, doc="Whether or not the Sprite draws from a downscaled copy of its image when scaled down.")
+
 	def setImageName(self, imageName):
 		"""
 		Sets a new image by its filepath.
@@ -34,17 +65,69 @@ class Sprite(Node):
 		@type imageName: C{string}
 		"""
 		if imageName is not None:
-			self._sourcePattern = None
-			self._pixbuf = gtk.gdk.pixbuf_new_from_file(imageName)
-			self.setSize(Size(self._pixbuf.get_width(), self._pixbuf.get_height()))
+			self._imageName = imageName
+			self._surface = SharedImageCache().getSurface(imageName)
+			self._sourcePattern = cairo.SurfacePattern(self._surface)
+			self._sourceRect = None
+			self._mipmapPatterns = None
+			self.setSize(Size(self._surface.get_width(), self._surface.get_height()))
+
+	def setAtlasImage(self, atlas, imageName):
+		"""
+		Sets a new image from one that has been packed into a L{TextureAtlas}.
+
+		@param atlas: The atlas containing the image.
+		@type atlas: L{TextureAtlas}
+		@param imageName: The filepath of the image that was packed into the atlas.
+		@type imageName: C{string}
+		"""
+		rect = atlas.getRectForImage(imageName)
+		if rect is None:
+			return
+		self._imageName = None
+		self._surface = atlas.getSurface()
+		self._sourcePattern = cairo.SurfacePattern(self._surface)
+		self._sourcePattern.set_matrix(cairo.Matrix(x0=rect.point.x, y0=rect.point.y))	# offset to the image within the atlas
+		self._sourceRect = rect
+		self._mipmapPatterns = None
+		self.setSize(rect.size)
+
+	def _getMipmapPattern(self, context):
+		"""
+		Private method. Returns the pattern for the smallest copy of the image that is still at least as large as the image will appear on the screen.
+		"""
+		xx, yx, xy, yy, x0, y0 = context.get_matrix()
+		scale = max(math.hypot(xx, yx), math.hypot(xy, yy))
+		if scale >= 1.0 or scale <= 0.0:
+			return self._sourcePattern
+		if self._mipmapPatterns is None:
+			width = float(self._surface.get_width())
+			height = float(self._surface.get_height())
+			self._mipmapPatterns = []
+			for level in SharedImageCache().getMipmaps(self._imageName):
+				pattern = cairo.SurfacePattern(level)
+				pattern.set_matrix(cairo.Matrix(xx=level.get_width()/width, yy=level.get_height()/height))	# map the full-size coordinates onto the copy
+				self._mipmapPatterns.append(pattern)
+		index = min(int(math.floor(math.log(1.0/scale, 2))), len(self._mipmapPatterns))
+		if index < 1:
+			return self._sourcePattern
+		return self._mipmapPatterns[index-1]
 
 	def draw(self, context):
-		if not self._sourcePattern:
-			context.set_source_pixbuf(self._pixbuf, 0, 0)
-			self._sourcePattern = context.get_source()
-		else:
-			context.set_source(self._sourcePattern)
-		context.paint_with_alpha(self.getOpacity())
+		if self._sourcePattern is None:
+			return
+		rect = self._sourceRect
+		sourcePattern = self._sourcePattern
+		if rect is not None:
+			context.save()	# the clip must not apply to this Sprite's children
+			context.rectangle(0, 0, rect.size.width, rect.size.height)
+			context.clip()
+		elif self._isMipmapped:
+			sourcePattern = self._getMipmapPattern(context)
+		context.set_source(sourcePattern)
+		context.paint_with_alpha(self._drawOpacity)
 		if self._color.a > 0.0:
-			context.set_source_rgba(self._color.r, self._color.g, self._color.b, self._color.a)
-			context.mask(self._sourcePattern)
+			context.set_source_rgba(self._color.r, self._color.g, self._color.b, self._color.a*self._drawOpacity)
+			context.mask(sourcePattern)
+		if rect is not None:
+			context.restore()
@@ -5,8 +5,12 @@ Calls a given callback every given seconds.
 class Timer(object):
 	"""
 	Calls a callback every given seconds.
+
+	By default, the callback is passed the time which has elapsed since it was last called, and any time in excess of the interval is discarded, so a Timer with a non-zero interval slowly drifts and fires at most once per tick. A drift-free Timer (see L{setDriftFree}) instead keeps the excess, so it fires on average exactly once per interval, and after a long tick it fires once for every interval which has passed (up to L{getMaximumCatchUp} times).
+
+	A one-shot Timer (see L{setOneShot}) fires only once, after which the L{Scheduler} unschedules it automatically.
 	"""
-	def __init__(self, callback, interval=0.0):
+	def __init__(self, callback, interval=0.0, isDriftFree=False, isOneShot=False):
 		"""
 		Initialization method.
 
@@ -14,10 +18,19 @@ class Timer(object):
 		@type callback: C{callback}
 		@param interval: How often the callback should be called.
 		@type interval: Non-negative C{float}
+		@param isDriftFree: Whether or not the Timer is drift-free (see L{setDriftFree}). Default is C{False}.
+		@type isDriftFree: C{bool}
+		@param isOneShot: Whether or not the Timer only fires once (see L{setOneShot}). Default is C{False}.
+		@type isOneShot: C{bool}
 		"""
 		self._callback = callback
 		self._interval = interval
 		self._elapsed = -1.0
+		self._isDriftFree = isDriftFree
+		self._maximumCatchUp = 5
+		self._missedCount = 0	# the number of firings skipped at the last fire because of the catch-up limit
+		self._isOneShot = isOneShot
+		self._isDone = False
 
 	def getInterval(self):
 		"""
@@ -39,6 +52,86 @@ class Timer(object):
 
 	interval = property(getInterval, setInterval, doc="How often the callback will be called.")
 
+	def isDriftFree(self):
+		"""
+		Returns whether or not the Timer keeps the time in excess of its interval. Default is C{False}.
+
+		@return: Whether or not the Timer is drift-free.
+		@rtype: C{bool}
+		"""
+		return self._isDriftFree
+
+	def setDriftFree(self, isDriftFree):
+		"""
+		Sets whether or not the Timer keeps the time in excess of its interval. If so, the interval is subtracted from the elapsed time each time the callback is called (rather than the elapsed time being reset), and the callback is passed the interval rather than the elapsed time. If several intervals have passed since the last tick, the callback is called once for each of them, up to L{getMaximumCatchUp} times; any further intervals are skipped and counted by L{getMissedCount}. This has no effect on Timers whose interval is C{0}.
+
+		@param isDriftFree: Whether or not the Timer is drift-free.
+		@type isDriftFree: C{bool}
+		"""
+		self._isDriftFree = isDriftFree
+
+	driftFree = property(isDriftFree, setDriftFree, doc="Whether or not the Timer keeps the time in excess of its interval.")
+
+	def getMaximumCatchUp(self):
+		"""
+		Returns the maximum number of times a drift-free Timer calls its callback in a single tick. Default is C{5}.
+
+		@return: The maximum number of calls per tick.
+		@rtype: C{int}
+		"""
+		return self._maximumCatchUp
+
+	def setMaximumCatchUp(self, maximumCatchUp):
+		"""
+		Sets the maximum number of times a drift-free Timer calls its callback in a single tick, which keeps a long frame from causing a burst of calls. Setting this to C{1} makes the Timer fire at most once per tick while still reporting how many intervals were skipped via L{getMissedCount}.
+
+		@param maximumCatchUp: The maximum number of calls per tick.
+		@type maximumCatchUp: Positive C{int}
+		"""
+		self._maximumCatchUp = max(1, maximumCatchUp)
+
+	maximumCatchUp = property(getMaximumCatchUp, setMaximumCatchUp, doc="The maximum number of times a drift-free Timer calls its callback in a single tick.")
+
+	def getMissedCount(self):
+		"""
+		Returns the number of intervals which a drift-free Timer skipped the last time it was fired, because more than L{getMaximumCatchUp} intervals had passed. This may be checked from within the callback.
+
+		@return: The number of skipped intervals.
+		@rtype: C{int}
+		"""
+		return self._missedCount
+
+	missedCount = property(getMissedCount, doc="Read-only access to the number of intervals skipped the last time the Timer was fired.")
+
+	def isOneShot(self):
+		"""
+		Returns whether or not the Timer only fires once. Default is C{False}.
+
+		@return: Whether or not the Timer only fires once.
+		@rtype: C{bool}
+		"""
+		return self._isOneShot
+
+	def setOneShot(self, isOneShot):
+		"""
+		Sets whether or not the Timer only fires once. If so, it calls its callback once its interval has passed and is then done (see L{isDone}), at which point the L{Scheduler} unschedules it.
+
+		@param isOneShot: Whether or not the Timer only fires once.
+		@type isOneShot: C{bool}
+		"""
+		self._isOneShot = isOneShot
+
+	oneShot = property(isOneShot, setOneShot, doc="Whether or not the Timer only fires once.")
+
+	def isDone(self):
+		"""
+		Returns whether or not a one-shot Timer has fired. A Timer which is done never calls its callback again.
+
+		@return: Whether or not the Timer is done.
+		@rtype: C{bool}
+		"""
+		return self._isDone
+
 	def fire(self, dt):
 		"""
 		Causes the timer to call the callback.
@@ -46,10 +139,23 @@ class Timer(object):
 		@param dt: The amount of time that has elapsed since the last time it was fired.
 		@type dt: Non-negative C{float}
 		"""
+		if self._isDone:
+			return
 		if self._elapsed == -1.0:
 			self._elapsed = 0.0
 		else:
 			self._elapsed += dt
-		if self._elapsed >= self._interval:
+		if self._elapsed < self._interval:
+			return
+		if self._isOneShot:
+			self._isDone = True
+			self._callback(self._elapsed)
+		elif self._isDriftFree and self._interval > 0.0:
+			count = int(self._elapsed / self._interval)
+			self._elapsed -= count * self._interval
+			self._missedCount = max(0, count - self._maximumCatchUp)
+			for i in xrange(count - self._missedCount):
+				self._callback(self._interval)
+		else:
 			self._callback(self._elapsed)
 			self._elapsed = 0.0
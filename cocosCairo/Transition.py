@@ -34,6 +34,15 @@ class AbstractTransition(Scene):
 		self._isDstSceneOnTop = True
 		self._sceneOrder()
 
+	def getAssetNames(self):
+		"""
+		Returns the filepaths of the images and SVG files which the Transition's destination L{Scene} uses (along with any declared by the Transition itself), so that L{Director.replaceScene} loads them before the Transition, and thus the destination Scene, is set up.
+
+		@return: The filepaths.
+		@rtype: C{list of strings}
+		"""
+		return Scene.getAssetNames(self) + self._dstScene.getAssetNames()
+
 #{ Subclass methods.
 	def _sceneOrder(self):
 		"""
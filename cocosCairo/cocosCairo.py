@@ -10,15 +10,19 @@ from GTKWindow import *
 from Color import *
 
 from Sprite import *
+from ImageCache import *
 from SVGSprite import *
+from AssetLoader import *
 from Label import *
 from PangoLabel import *
+from BitmapFontLabel import *
 from Primitive import *
 from ColorNode import *
 from ParallaxNode import *
 
 from GestureDispatch import *
 from GestureEvent import *
+from GestureRecording import *
 from GestureListener import *
 
 from IntervalAction import *
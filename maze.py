@@ -121,11 +121,6 @@ class MazePathNode(Node):
 		self._tileSize = 50
 		self.anchorPoint = Point(0.5, 0.5)
 
-	def setOpacity(self, opacity):
-		Node.setOpacity(self, opacity)
-		for child in self.children:
-			child.opacity = opacity
-
 	def onModelChange(self, model):
 		if not model:
 			return